@@ -1,11 +1,20 @@
 name = "AutoDiff"
 import numpy as np
 from .forwardNode import ForwardNode
-from .reverseNode import ReverseNode
+from .reverseNode import ReverseNode, reverse_jacobian
+from .tensorNode import TensorNode, tensor_gradient
+from .tape import Tape
+from .sparseTrace import SparseTrace
+from .dtypes import get_default_dtype, set_default_dtype
+from .primitive import primitive, CustomPrimitive
+from .expression import Expression
 from .utils import *
 from .ad import *
+from .profiler import profile, Profile
 
-__all__ = ['ForwardNode', 'ReverseNode', 'sin', 'cos', 'log', 'exp', 'sqrt', 'tan',
+__all__ = ['ForwardNode', 'ReverseNode', 'reverse_jacobian', 'TensorNode', 'tensor_gradient', 'Tape', 'SparseTrace', 'get_default_dtype', 'set_default_dtype', 'primitive', 'CustomPrimitive', 'sin', 'cos', 'log', 'exp', 'sqrt', 'tan',
            'arctan', 'arcsin', 'arccos', 'tanh', 'sinh', 'cosh', 'log_base', 'cot', 'sec', 'csc',
-           'init_trace', 'create_node', 'gradientF', 'gradientR',
-           'forward_auto_diff', 'reverse_auto_diff', 'auto_diff']
+           'Expression', 'init_trace', 'create_node', 'compile_functions', 'gradientF', 'gradientR',
+           'forward_auto_diff', 'reverse_auto_diff', 'select_mode', 'auto_diff',
+           'jacobian', 'JacobianResult', 'hessian', 'hvp', 'jvp', 'vjp', 'TapedFunction', 'SparseJacobian', 'sparse_jacobian', 'auto_diff_batch',
+           'auto_diff_stream', 'auto_diff_to_file', 'profile', 'Profile']
@@ -1,18 +1,37 @@
 import numpy as np
+import ast
+import collections
+import contextlib
 import inspect
+import itertools
+import multiprocessing
+import os
+import pickle
 import re
+import textwrap
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from AutoDiff.forwardNode import ForwardNode
-from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.reverseNode import ReverseNode, reverse_jacobian, _topological_order
+from AutoDiff.sparseTrace import SparseTrace
+from AutoDiff.tape import Tape, no_tape
+from AutoDiff.tensorNode import TensorNode, tensor_gradient
+from AutoDiff.expression import Expression
+from AutoDiff.dtypes import resolve_dtype
+from AutoDiff.coloring import sparsity_pattern, color_columns, color_rows
 from AutoDiff.utils import *
 
 
-def init_trace(var, variables):
+def init_trace(var, variables, sparse=False, dtype=None):
     '''
     Initialize the trace for ForwardNode objects given all variables in function
 
     Input:
     var - str, name of variable to initialize the trace
     variables - list, names for all variables in function
+    sparse - bool, store only the nonzero entries of the trace, default to False
+    dtype - str/type/np.dtype, floating point type of the trace, default to None, which uses the default dtype
 
     Output:
     Initilized trace for ForwardNode object var
@@ -20,20 +39,29 @@ def init_trace(var, variables):
     Examples:
     >>> init_trace(var="x1", variables=["x1", "x2", "x3"])
     [1.0, 0.0, 0.0]
+
+    >>> init_trace(var="x2", variables=["x1", "x2", "x3"], sparse=True)
+    SparseTrace Size: 3, Index: [1], Data: [1.]
     '''
-    trc = np.zeros(len(variables))
+    dtype = resolve_dtype(dtype)
+    if sparse:
+        return SparseTrace([variables.index(var)], np.ones(1, dtype=dtype), len(variables))
+    trc = np.zeros(len(variables), dtype=dtype)
     trc[variables.index(var)] = 1
     return trc
 
 
-def create_node(var, value, variables):
+def create_node(var, value, variables, sparse=False, dtype=None):
     '''
     Create a new ForwardNode object ForwardNode objects
 
     Input:
     var - str, name of the new ForwardNode variable
-    value - int/float, value of the ForwardNode variable
+    value - int/float/np.array, value of the ForwardNode variable, or an array of its values at a batch of points
     variables - list, names for all variables in function
+    sparse - bool, use a sparse trace, which pays off when there are many variables and each
+             intermediate depends on only a few of them, default to False
+    dtype - str/type/np.dtype, floating point type of the value and trace, default to None, which uses the default dtype
 
     Output:
     A new ForwardNode variable
@@ -41,11 +69,49 @@ def create_node(var, value, variables):
     Examples:
     >>> create_node(var="x1", value=5.0, variables=["x1", "x2", "x3"])
     ForwardNode Variable: ['x1', 'x2', 'x3'],  Value: 5.0, Trace: [1. 0. 0.]
+
+    >>> x1 = create_node(var="x1", value=np.array([1.0, 2.0]), variables=["x1", "x2"])
+    >>> x1.trace
+    array([[1., 0.],
+           [1., 0.]])
+    '''
+    dtype = resolve_dtype(dtype)
+    return ForwardNode(value, init_trace(var, variables, sparse, dtype), variables, dtype)
+
+
+def compile_functions(functions, variables):
+    '''
+    Compile the functions once for the given variables, reusing an already compiled Expression
+
+    Input:
+    functions - str/list/function/Expression, the functions output we are caculating
+    variables - list, names for all variables in function
+
+    Output:
+    An Expression object compiled for variables in the given order
+
+    Examples:
+    >>> expression = compile_functions(["x1 * x2", "exp(x1) * x2"], ["x1", "x2"])
+    >>> gradientR(expression, {"x1": 1, "x2": 2})
+    array([[2.        , 1.        ],
+           [5.43656366, 2.71828183]])
+
     '''
-    return ForwardNode(value, init_trace(var,variables), variables)
+    if isinstance(functions, Expression):
+        if functions.variables == list(variables):
+            return functions
+        functions = functions.functions
+    return Expression(functions, variables)
 
 
-def gradientF(y, variables, target=None):
+def _trace_column(trace, index):
+    '''
+    Get the derivative(s) with respect to one variable from a trace of shape (n,) or a batched trace of shape (B, n)
+    '''
+    return trace[:, index] if trace.ndim == 2 else trace[index]
+
+
+def gradientF(y, variables, target=None, sparse=False):
     '''
     Calculate the graident using forward mode methods
 
@@ -53,6 +119,7 @@ def gradientF(y, variables, target=None):
     y - ForwardNode, the functions output we a{re caculating
     variables - list, names for all variables in function
     target - list, name of our target variable(s) to calculate the gradient
+    sparse - bool, return the gradient / jacobian as a scipy.sparse CSR matrix, default to False
 
     Output:
     The derivative / partial derivative / gradient / jacobian of input function and target variable
@@ -66,12 +133,20 @@ def gradientF(y, variables, target=None):
     -0.3890560989306504
 
     '''
+    if sparse and not target:
+        ys = [y] if isinstance(y, ForwardNode) else y
+        if not all([isinstance(yi, ForwardNode) and yi.trace.ndim == 1 for yi in ys]):
+            raise TypeError("Invalid Input!")
+        return _sparse_jacobian(ys, variables)
     if isinstance(y, ForwardNode):
         if target:
             if target not in variables:
                 raise AttributeError("This is not a variable used! No gradient available!")
             # derivative dy/dxi or partial derivatives dely/delxi
-            return y.trace[variables.index(target)]
+            return _trace_column(y.trace, variables.index(target))
+        elif y.trace.ndim == 2:
+            # gradients at every point [[dely/delx1, ..., dely/delxn], ...]
+            return y.trace[:, [variables.index(var) for var in variables]]
         else:
             # gradient [dely/delx1, ..., dely/delxn]
             return [y.trace[variables.index(var)] for var in variables]
@@ -80,23 +155,56 @@ def gradientF(y, variables, target=None):
             if target not in variables:
                 raise AttributeError("This is not a variable used! No gradient available!")
             # derivatives [dy1/dxi, ..., dym/dxi]
-            return [yi.trace[variables.index(target)] for yi in y]
+            return [_trace_column(yi.trace, variables.index(target)) for yi in y]
         else:
             # jacobian [[dely1/delx1, ..., dely1/delxn], ..., [delym/delx1, ..., delym/delxn]]
-            jcb = [[yi.trace[variables.index(var)] for yi in y] for var in variables]
+            # for a batch of B points, an array of shape (B, m, n)
+            jcb = [[_trace_column(yi.trace, variables.index(var)) for yi in y] for var in variables]
             return np.array(jcb).T
     else:
         raise TypeError("Invalid Input!")
 
 
-def gradientR(functions, var_dict, target=None):
+def _sparse_matrix(data, rows, cols, shape, format="csr"):
+    '''
+    Build a scipy.sparse matrix in CSR or COO format from its nonzero entries
+    '''
+    try:
+        from scipy import sparse
+    except ImportError:
+        raise ImportError("scipy is required for sparse output, install it with 'pip install scipy'")
+    if format not in ("csr", "coo"):
+        raise ValueError("Invalid format: please choose between csr and coo")
+    matrix = sparse.coo_matrix((data, (rows, cols)), shape=shape)
+    return matrix.tocsr() if format == "csr" else matrix
+
+
+def _sparse_jacobian(ys, variables):
+    '''
+    Assemble the traces of the outputs into a scipy.sparse CSR matrix with one row per output
+    '''
+    rows, cols, data = [], [], []
+    for i, yi in enumerate(ys):
+        if isinstance(yi.trace, SparseTrace):
+            index, values = yi.trace.index, yi.trace.data
+        else:
+            index = np.flatnonzero(yi.trace)
+            values = yi.trace[index]
+        rows.append(np.full(len(index), i))
+        cols.append(index)
+        data.append(values)
+    return _sparse_matrix(np.concatenate(data), np.concatenate(rows), np.concatenate(cols), (len(ys), len(variables)))
+
+
+def gradientR(functions, var_dict, target=None, tape=False):
     '''
     Calculate the graident using reverse mode methods
 
     Input:
-    functions - str, the functions output we a{re caculating
+    functions - str/list/Expression, the functions output we a{re caculating
     var_dict - dictionary, name and value pair of all variables in function
     target - list, name of our target variable(s) to calculate the gradient
+    tape - bool, record the graph on an array-backed Tape instead of per-node children lists, default to False
 
     Output:
     The derivative / partial derivative / gradient / jacobian of input function and target variable
@@ -109,42 +217,523 @@ def gradientR(functions, var_dict, target=None):
     [[-0.3890560989306504]]
 
     '''
-    res = []
     variables = list(var_dict.keys())
     if not target:
         target = variables
-    nodes = []
-    functions = [functions] if isinstance(functions, str) else functions
-
-    for var in variables:
-        value = var_dict[var]
-        exec(f'{var} = ReverseNode(value=value)')
-        exec(f'nodes.append((var, {var}))')
-
-    for f in functions:
-        grads = []
-        for name, node in nodes:
-            node.gradient_reset()
-        y = eval(f)
-        for name, node in nodes:
-            if name in target:
-                g = node.gradient()
-                grads.append(g)
-        res.append(grads)
+    expression = compile_functions(functions, variables)
+    targets = [target] if isinstance(target, str) else target
+    wrt = [i for i, var in enumerate(variables) if var in targets]
+
+    # evaluate all functions once on shared input nodes, then sweep backwards once per function
+    with Tape() if tape else contextlib.nullcontext():
+        nodes = [ReverseNode(value=var_dict[var]) for var in variables]
+        outputs = expression(*nodes)
+    res = reverse_jacobian(outputs, [nodes[i] for i in wrt])
 
     if isinstance(target, str):
-        res = [item for sublist in res for item in sublist]
-    return np.array(res)
+        res = res.ravel()
+    return res
+
+
+JacobianResult = collections.namedtuple('JacobianResult', ['value', 'jacobian', 'mode'])
+JacobianResult.__doc__ = '''
+    Result of jacobian()
+
+    value - np.ndarray of shape (m,), the value of every function
+    jacobian - np.ndarray of shape (m, k), the derivatives of every function with respect to every target
+    mode - str, the mode used, "forward" or "reverse"
+    '''
+
+
+def jacobian(functions, var_dict, target=None, mode="forward", dtype=None):
+    '''
+    Calculate the function values and the jacobian without printing, for use in hot loops
+
+    Input:
+    functions - str/list/Expression, the functions output we are caculating
+    var_dict - dictionary, name and value pair of all variables in function
+    target - list, name of our target variable(s) to calculate the gradient, default to all variables
+    mode - str, forward, reverse or auto
+    dtype - str/type/np.dtype, floating point type of the traces, adjoints and results, default to None,
+            which uses the default dtype
+
+    Output:
+    A JacobianResult with the values of shape (m,), the jacobian of shape (m, k) with columns
+    in the order of target, and the mode used
+
+    Examples:
+    >>> res = jacobian(["x1 + sin(x2) * 5", "exp(x1) - log(2 * x2)"], {"x1": 5, "x2": 2}, ["x2", "x1"])
+    >>> res.jacobian
+    array([[ -2.08073418,   1.        ],
+           [ -0.5       , 148.4131591 ]])
+    >>> res.value
+    array([  9.54648713, 147.02686472])
+
+    '''
+    variables = list(var_dict.keys())
+    target = variables if not target else [target] if isinstance(target, str) else list(target)
+    if not all([t in variables for t in target]):
+        raise ValueError('Invalid target value: target must be in the variable dictionary')
+    expression = compile_functions(functions, variables)
+    if mode == "auto":
+        mode = select_mode(expression, var_dict, target)
+    dtype = resolve_dtype(dtype)
+
+    if mode == "forward":
+        # only the targets are seeded, so the trace width is the number of targets
+        outputs = expression.forward(var_dict, wrt=target, dtype=dtype)
+        value, jcb = np.empty(len(outputs), dtype=dtype), np.empty((len(outputs), len(target)), dtype=dtype)
+        for i, y in enumerate(outputs):
+            if isinstance(y, ForwardNode):
+                value[i] = y.value
+                jcb[i] = np.asarray(y.trace)
+            else:
+                value[i] = y
+                jcb[i] = 0.0
+    elif mode == "reverse":
+        nodes = [ReverseNode(var_dict[var], dtype) for var in variables]
+        outputs = expression(*nodes)
+        jcb = reverse_jacobian(outputs, [nodes[variables.index(t)] for t in target], dtype)
+        value = np.empty(len(outputs), dtype=dtype)
+        for i, y in enumerate(outputs):
+            value[i] = y.value if isinstance(y, ReverseNode) else y
+    else:
+        raise ValueError("Invalid mode: please choose between forward, reverse and auto mode")
+    return JacobianResult(value, jcb, mode)
+
+
+class TapedFunction():
+    def __init__(self, functions, var_dict):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a TapedFunction object
+        functions - str/list/Expression, the functions output we are caculating
+        var_dict - dictionary, name and value pair of all variables in function, the point to record at
+
+        Output:
+        a TapedFunction object, recording the operations of the functions on a Tape once so that values and
+        jacobians at new points are computed by replaying the tape, without re-tracing the functions
+        Functions that compare variables may take different operations at other points, so they are
+        re-traced at every call instead, with a warning
+
+        Example:
+        >>> f = TapedFunction(["x1 * x2", "sin(x1)"], {"x1": 1.0, "x2": 2.0})
+        >>> f({"x1": 0.0, "x2": 3.0})
+        JacobianResult(value=array([0., 0.]), jacobian=array([[3., 0.],
+               [1., 0.]]), mode='reverse')
+
+        '''
+        self.variables = list(var_dict.keys())
+        self.expression = compile_functions(functions, self.variables)
+        with Tape(record_ops=True) as tape:
+            self.inputs = [ReverseNode(value) for value in self.expression.values(var_dict)]
+            self.outputs = self.expression(*self.inputs)
+        self.tape = tape
+        if tape.comparisons:
+            warnings.warn("The functions compare variables, so the recorded operations may not hold at other points. "
+                          "They will be traced again at every call")
+
+    def __call__(self, var_dict):
+        '''
+        Calculate the function values and the jacobian at a new point
+
+        Input:
+        self - a TapedFunction object
+        var_dict - dictionary, name and value pair of all variables in function
+
+        Output:
+        A JacobianResult with the values of shape (m,) and the jacobian of shape (m, n)
+
+        '''
+        if self.tape.comparisons:
+            return jacobian(self.expression, var_dict, mode="reverse")
+        values = self.tape.replay({x.index: value for x, value in zip(self.inputs, self.expression.values(var_dict))})
+        m, n = len(self.outputs), len(self.inputs)
+        value, jcb = np.empty(m), np.zeros((m, n))
+        index = [x.index for x in self.inputs]
+        for i, y in enumerate(self.outputs):
+            # outputs that are not ReverseNode objects are constants with zero derivatives
+            if isinstance(y, ReverseNode):
+                value[i] = values[y.index]
+                jcb[i] = self.tape.adjoints({y.index: 1.0})[index]
+            else:
+                value[i] = y
+        return JacobianResult(value, jcb, "reverse")
+
+    def __repr__(self):
+        return f'TapedFunction Functions: {self.expression.functions}, Variables: {self.variables}, Tape: {self.tape}'
+
+
+class SparseJacobian():
+    def __init__(self, functions, var_dict, mode="auto"):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a SparseJacobian object
+        functions - str/list/Expression, the functions output we are caculating
+        var_dict - dictionary, name and value pair of all variables in function, the point to detect the pattern at
+        mode - str, forward, reverse or auto, default to auto, which picks the mode needing fewer colors
+
+        Output:
+        a SparseJacobian object, holding the sparsity pattern of the jacobian, detected once from the recorded
+        operations, and a coloring of its columns (forward mode) or rows (reverse mode)
+        Columns of one color share a seed vector, so a call costs one forward evaluation with a trace per color,
+        or one reverse sweep per color, instead of one per variable or function
+        Functions that compare variables may depend on other variables at other points, with a warning
+
+        Example:
+        >>> f = SparseJacobian(["x1 * x2", "x2 * x3", "x3 * x4"], {"x1": 1, "x2": 2, "x3": 3, "x4": 4})
+        >>> f.n_colors
+        2
+        >>> f({"x1": 1, "x2": 2, "x3": 3, "x4": 4}).toarray()
+        array([[2., 1., 0., 0.],
+               [0., 3., 2., 0.],
+               [0., 0., 4., 3.]])
+
+        '''
+        if mode not in ("forward", "reverse", "auto"):
+            raise ValueError("Invalid mode: please choose between forward, reverse and auto mode")
+        self.variables = list(var_dict.keys())
+        self.expression = compile_functions(functions, self.variables)
+        with Tape(record_ops=True) as tape:
+            inputs = [ReverseNode(value) for value in self.expression.values(var_dict)]
+            outputs = self.expression(*inputs)
+        if tape.comparisons:
+            warnings.warn("The functions compare variables, so the sparsity pattern may not hold at other points")
+        self.shape = (len(outputs), len(inputs))
+        self.rows, self.cols = sparsity_pattern(outputs, inputs, tape)
+        if mode == "auto":
+            columns, rows = color_columns(self.rows, self.cols, self.shape), color_rows(self.rows, self.cols, self.shape)
+            mode = "forward" if columns.max(initial=-1) <= rows.max(initial=-1) else "reverse"
+            self.colors = columns if mode == "forward" else rows
+        elif mode == "forward":
+            self.colors = color_columns(self.rows, self.cols, self.shape)
+        else:
+            self.colors = color_rows(self.rows, self.cols, self.shape)
+        self.mode = mode
+        self.n_colors = int(self.colors.max(initial=-1)) + 1
+
+    def __call__(self, var_dict, format="csr"):
+        '''
+        Calculate the jacobian at a point
+
+        Input:
+        self - a SparseJacobian object
+        var_dict - dictionary, name and value pair of all variables in function
+        format - str, csr or coo, the scipy.sparse format of the result, default to csr
+
+        Output:
+        A scipy.sparse matrix of shape (m, n) with the derivatives of every function with respect to every variable
+
+        '''
+        values = self.expression.values(var_dict)
+        if self.mode == "forward":
+            seeds = np.identity(self.n_colors)[self.colors]
+            directions = [f"c{c}" for c in range(self.n_colors)]
+            outputs = self.expression(*[ForwardNode(value, seed, directions) for value, seed in zip(values, seeds)])
+            compressed = np.zeros((self.shape[0], self.n_colors))
+            for i, y in enumerate(outputs):
+                if isinstance(y, ForwardNode):
+                    compressed[i] = np.asarray(y.trace)
+            # every nonzero is the only one of its row in the compressed column of its color
+            data = compressed[self.rows, self.colors[self.cols]]
+        else:
+            with Tape() as tape:
+                inputs = [ReverseNode(value) for value in values]
+                outputs = self.expression(*inputs)
+            index = np.array([x.index for x in inputs], dtype=np.int64)
+            data = np.empty(len(self.rows))
+            row_colors = self.colors[self.rows]
+            for c in range(self.n_colors):
+                # the functions of one color share no variable, so one sweep seeded at all of them separates them
+                seeds = {outputs[i].index: 1.0 for i in np.flatnonzero(self.colors == c).tolist()
+                         if isinstance(outputs[i], ReverseNode)}
+                selected = row_colors == c
+                data[selected] = tape.adjoints(seeds)[index[self.cols[selected]]]
+        return _sparse_matrix(data, self.rows, self.cols, self.shape, format)
+
+    def __repr__(self):
+        return (f'SparseJacobian Functions: {self.expression.functions}, Variables: {self.variables}, '
+                f'Nonzeros: {len(self.rows)}, Mode: {self.mode}, Colors: {self.n_colors}')
+
+
+def sparse_jacobian(functions, var_dict, mode="auto", format="csr"):
+    '''
+    Calculate a sparse jacobian, detecting its sparsity pattern and coloring its columns or rows so that
+    the cost scales with the number of colors rather than with the number of variables or functions
+    To evaluate the same functions at many points, create a SparseJacobian once and call it instead
+
+    Input:
+    functions - str/list/Expression, the functions output we are caculating
+    var_dict - dictionary, name and value pair of all variables in function
+    mode - str, forward, reverse or auto, default to auto
+    format - str, csr or coo, the scipy.sparse format of the result, default to csr
+
+    Output:
+    A scipy.sparse matrix of shape (m, n) with the derivatives of every function with respect to every variable
+
+    Examples:
+    >>> sparse_jacobian(["x1 ** 2", "x1 * x2", "exp(x3)"], {"x1": 1, "x2": 2, "x3": 0}).toarray()
+    array([[2., 0., 0.],
+           [2., 1., 0.],
+           [0., 0., 1.]])
+
+    '''
+    return SparseJacobian(functions, var_dict, mode)(var_dict, format)
 
 
-def forward_auto_diff(functions, var_dict, target=None):
+def _forward_over_reverse(functions, var_dict, tangents, dtype=None):
+    '''
+    Differentiate the gradient of a scalar function along the given tangent directions
+
+    Input:
+    functions - str/list/Expression, a single scalar function
+    var_dict - dictionary, name and value pair of all variables in function
+    tangents - np.ndarray of shape (n, k), the tangent of every variable along k directions
+    dtype - str/type/np.dtype, floating point type of the values, derivatives and result, default to None,
+            which uses the default dtype
+
+    Output:
+    np.ndarray of shape (n, k), the second derivatives of the function along every direction
+
+    '''
+    dtype = resolve_dtype(dtype)
+    variables = list(var_dict.keys())
+    expression = compile_functions(functions, variables)
+    tangents = tangents.astype(dtype, copy=False)
+    n, k = tangents.shape
+    directions = [f"v{j}" for j in range(k)]
+    # every ReverseNode value is a ForwardNode dual number, so the local partials and the adjoints
+    # carry their derivatives along the tangents through the reverse sweep, which walks the children
+    # lists since a tape only stores plain partials
+    with no_tape():
+        nodes = [ReverseNode(ForwardNode(value, tangents[i], directions, dtype))
+                 for i, value in enumerate(expression.values(var_dict))]
+        outputs = expression(*nodes)
+    if len(outputs) != 1:
+        raise ValueError('Invalid input: second derivatives are only supported for a single scalar function')
+    y = outputs[0]
+    res = np.zeros((n, k), dtype=dtype)
+    if not isinstance(y, ReverseNode):
+        return res
+    for node in _topological_order(nodes):
+        node.adjoint = 1.0 if node is y else 0.0
+        for der, child in node.children:
+            node.adjoint = node.adjoint + der * child.adjoint
+    for i, x in enumerate(nodes):
+        if isinstance(x.adjoint, ForwardNode):
+            res[i] = x.adjoint.trace
+    return res
+
+
+def hessian(functions, var_dict, dtype=None):
+    '''
+    Calculate the exact hessian of a scalar function with forward mode nested inside reverse mode
+
+    Input:
+    functions - str/list/Expression, a single scalar function
+    var_dict - dictionary, name and value pair of all variables in function
+    dtype - str/type/np.dtype, floating point type of the values, derivatives and result, default to None,
+            which uses the default dtype
+
+    Output:
+    np.ndarray of shape (n, n), the second derivatives with respect to every pair of variables
+
+    Examples:
+    >>> hessian("x1 ** 2 * x2 + exp(x2)", {"x1": 1, "x2": 2})
+    array([[4.       , 2.       ],
+           [2.       , 7.3890561]])
+
+    '''
+    n = len(var_dict)
+    # one reverse sweep carrying n tangents does the work of n hessian-vector products
+    return _forward_over_reverse(functions, var_dict, np.identity(n), dtype)
+
+
+def hvp(functions, var_dict, vector, dtype=None):
+    '''
+    Calculate the product of the hessian of a scalar function with a vector in one reverse sweep,
+    without forming the hessian
+
+    Input:
+    functions - str/list/Expression, a single scalar function
+    var_dict - dictionary, name and value pair of all variables in function
+    vector - dictionary/list/np.ndarray, the vector as name and value pairs, or in the order of var_dict
+    dtype - str/type/np.dtype, floating point type of the values, derivatives and result, default to None,
+            which uses the default dtype
+
+    Output:
+    np.ndarray of shape (n,), the hessian-vector product
+
+    Examples:
+    >>> hvp("x1 ** 2 * x2 + exp(x2)", {"x1": 1, "x2": 2}, [1, 0])
+    array([4., 2.])
+
+    '''
+    if isinstance(vector, dict):
+        vector = [vector.get(var, 0.0) for var in var_dict]
+    vector = np.asarray(vector, dtype=resolve_dtype(dtype))
+    if vector.shape != (len(var_dict),):
+        raise ValueError('Invalid input: the vector must have one entry per variable')
+    return _forward_over_reverse(functions, var_dict, vector.reshape(-1, 1), dtype).ravel()
+
+
+def _seed_matrix(seeds, size, name, dtype):
+    '''
+    Check a seed vector of shape (size,) or seed matrix of shape (size, p), returning it as a matrix of the given dtype
+    '''
+    seeds = np.asarray(seeds, dtype=dtype)
+    if seeds.ndim not in (1, 2) or seeds.shape[0] != size:
+        raise ValueError(f'Invalid input: {name} must have one row per {"variable" if name == "V" else "function"}')
+    return seeds.reshape(size, -1)
+
+
+def jvp(functions, var_dict, V, dtype=None):
+    '''
+    Calculate the products of the jacobian with p tangent directions in a single forward pass,
+    without forming the jacobian
+
+    Input:
+    functions - str/list/Expression, the functions output we are caculating
+    var_dict - dictionary, name and value pair of all variables in function
+    V - list/np.ndarray of shape (n,) or (n, p), the tangent directions, one row per variable in the order of var_dict
+    dtype - str/type/np.dtype, floating point type of the values, derivatives and result, default to None,
+            which uses the default dtype
+
+    Output:
+    np.ndarray of shape (m,) or (m, p), the jacobian-vector products J @ V
+
+    Examples:
+    >>> jvp(["x1 * x2", "sin(x1)"], {"x1": 0, "x2": 2}, [[1, 0], [1, 1]])
+    array([[2., 0.],
+           [1., 0.]])
+
+    '''
+    variables = list(var_dict.keys())
+    expression = compile_functions(functions, variables)
+    dtype = resolve_dtype(dtype)
+    tangents = _seed_matrix(V, len(variables), "V", dtype)
+    # the trace of every variable is its row of V, so every trace entry follows one direction
+    directions = [f"v{j}" for j in range(tangents.shape[1])]
+    outputs = expression(*[ForwardNode(value, tangents[i], directions, dtype)
+                           for i, value in enumerate(expression.values(var_dict))])
+    res = np.zeros((len(outputs), tangents.shape[1]), dtype=dtype)
+    for i, y in enumerate(outputs):
+        if isinstance(y, ForwardNode):
+            res[i] = np.asarray(y.trace)
+    return res.ravel() if np.ndim(V) == 1 else res
+
+
+def vjp(functions, var_dict, U, dtype=None):
+    '''
+    Calculate the products of q adjoint directions with the jacobian in a single reverse sweep,
+    without forming the jacobian
+
+    Input:
+    functions - str/list/Expression, the functions output we are caculating
+    var_dict - dictionary, name and value pair of all variables in function
+    U - list/np.ndarray of shape (m,) or (m, q), the adjoint directions, one row per function
+    dtype - str/type/np.dtype, floating point type of the values, derivatives and result, default to None,
+            which uses the default dtype
+
+    Output:
+    np.ndarray of shape (n,) or (q, n), the vector-jacobian products U.T @ J
+
+    Examples:
+    >>> vjp(["x1 * x2", "sin(x1)"], {"x1": 0, "x2": 2}, [1, 1])
+    array([3., 0.])
+
+    '''
+    dtype = resolve_dtype(dtype)
+    variables = list(var_dict.keys())
+    expression = compile_functions(functions, variables)
+    # the sweep carries vector adjoints through the children lists, which nodes on a tape do not keep
+    with no_tape():
+        nodes = [ReverseNode(value, dtype) for value in expression.values(var_dict)]
+        outputs = expression(*nodes)
+    adjoints = _seed_matrix(U, len(outputs), "U", dtype)
+    q = adjoints.shape[1]
+    seeds = {}
+    for i, y in enumerate(outputs):
+        # outputs that are not ReverseNode objects are constants with zero derivatives
+        if isinstance(y, ReverseNode):
+            seeds[id(y)] = seeds.get(id(y), 0.0) + adjoints[i]
+    # every adjoint is a vector of q entries, so one sweep carries all directions
+    for node in _topological_order(nodes):
+        node.adjoint = seeds.get(id(node), np.zeros(q, dtype=dtype))
+        for der, child in node.children:
+            node.adjoint = node.adjoint + der * child.adjoint
+    res = np.array([x.adjoint for x in nodes], dtype=dtype).reshape(len(nodes), q).T
+    return res.ravel() if np.ndim(U) == 1 else res
+
+
+def _describe(functions):
+    '''
+    Get a description of the functions for the verbose output: lambdas are shown by their source when it is
+    available, other Python functions by their qualified name and arguments, strings as written
+
+    Examples:
+    >>> _describe(lambda x1, x2: x1 * sin(x2))
+    'lambda x1, x2: x1 * sin(x2)'
+    >>> _describe(sin)
+    'sin(node)'
+
+    '''
+    if not callable(functions) or isinstance(functions, Expression):
+        return functions
+    name = getattr(functions, '__qualname__', type(functions).__name__)
+    try:
+        parameters = inspect.signature(functions).parameters
+    except (TypeError, ValueError):
+        return name
+    if getattr(functions, '__name__', None) == '<lambda>':
+        try:
+            source = textwrap.dedent(inspect.getsource(functions))
+            tree = ast.parse(source)
+        except (OSError, TypeError, SyntaxError):
+            tree = None
+        # the source holds the whole lines, so pick the lambda with the same arguments
+        for node in ast.walk(tree) if tree is not None else []:
+            if isinstance(node, ast.Lambda) and [arg.arg for arg in _lambda_arguments(node.args)] == list(parameters):
+                return ast.get_source_segment(source, node)
+    return f"{name}({', '.join(parameters)})"
+
+
+def _lambda_arguments(args):
+    '''
+    Get the arguments of a lambda node in the order of its signature
+    '''
+    return (getattr(args, 'posonlyargs', []) + args.args + ([args.vararg] if args.vararg else []) + args.kwonlyargs
+            + ([args.kwarg] if args.kwarg else []))
+
+
+def _report(functions, var_dict, target, res, full):
+    '''
+    Print the result of forward_auto_diff() and reverse_auto_diff()
+    '''
+    m = len(res) if full else len(res[0])
+    functions = _describe(functions)
+    if full:
+        name = "Jacobian" if m > 1 else "Derivative"
+        print(f"Functions: {functions}\nVariables: {var_dict}\n------------------------------\n{name}:\n {res}")
+    else:
+        name = "Gradient" if m > 1 else "Partial derivative"
+        s = "".join([f"{name} with respect to {t}: {der}\n" for t, der in zip(target, res)])
+        print(f"Functions: {functions}\nVariables: {var_dict}\n------------------------------\n" + s)
+
+
+def forward_auto_diff(functions, var_dict, target=None, verbose=False):
     '''
     Perform forward mode automatic differentiation
 
     Input:
-    functions - str, the functions output we a{re caculating
+    functions - str/list/function/Expression, the functions output we a{re caculating
     var_dict - dictionary, name and value pair of all variables in function
     target - list, name of our target variable(s) to calculate the gradient
+    verbose - bool, print the functions, variables and result, default to False
 
     Output:
     The derivative / partial derivative / gradient / jacobian of input function and target variable
@@ -161,42 +750,30 @@ def forward_auto_diff(functions, var_dict, target=None):
     variables = list(var_dict.keys())
     if not target:
         target = variables
-    funcs = []
-    res = []
-    functions = [functions] if isinstance(functions, str) else functions
-
-    for var in variables:
-        value = var_dict[var]
-        exec(f'{var} = create_node(var=var, value=value, variables=variables)')
-
-    for f in functions:
-        y = eval(f)
-        funcs.append(y)
+    if isinstance(target, str):
+        target = [target]
+    expression = compile_functions(functions, variables)
+    full = len(variables) == len(target)
 
-    if isinstance(target, list) and len(variables) == len(target):
-        res = gradientF(funcs, variables)
-        name = "Jacobian" if len(funcs) > 1 else "Derivative"
-        print(f"Functions: {functions}\nVariables: {var_dict}\n------------------------------\n{name}:\n {res}")
+    if full:
+        res = jacobian(expression, var_dict, variables, mode="forward").jacobian
     else:
-        name = "Gradient" if len(funcs) > 1 else "Partial derivative"
-        s = ""
-        for t in target:
-            der = gradientF(funcs, variables, target=t)
-            res.append(der)
-            s += f"{name} with respect to {t}: {der}\n"
-        print(f"Functions: {functions}\nVariables: {var_dict}\n------------------------------\n" + s)
-
+        jcb = jacobian(expression, var_dict, target, mode="forward").jacobian
+        res = [list(jcb[:, j]) for j in range(len(target))]
+    if verbose:
+        _report(expression.functions, var_dict, target, res, full)
     return res
 
 
-def reverse_auto_diff(functions, var_dict, target=None):
+def reverse_auto_diff(functions, var_dict, target=None, verbose=False):
     '''
     Perform reverse mode automatic differentiation
 
     Input:
-    functions - str, the functions output we a{re caculating
+    functions - str/list/function/Expression, the functions output we a{re caculating
     var_dict - dictionary, name and value pair of all variables in function
     target - list, name of our target variable(s) to calculate the gradient
+    verbose - bool, print the functions, variables and result, default to False
 
     Output:
     The derivative / partial derivative / gradient / jacobian of input function and target variable
@@ -210,32 +787,29 @@ def reverse_auto_diff(functions, var_dict, target=None):
     [[1.0, 148.4131591025766]]
 
     '''
-
     variables = list(var_dict.keys())
     if not target:
         target = variables
-    res = []
-    functions = [functions] if isinstance(functions, str) else functions
+    if isinstance(target, str):
+        target = [target]
+    expression = compile_functions(functions, variables)
+    full = len(variables) == len(target)
 
-    if isinstance(target, list) and len(variables) == len(target):
-        res = gradientR(functions, var_dict, variables)
-        name = "Jacobian" if len(functions) > 1 else "Derivative"
-        print(f"Functions: {functions}\nVariables: {var_dict}\n------------------------------\n{name}:\n {res}")
+    # a single forward evaluation and one backward sweep per function gives every target at once
+    if full:
+        res = jacobian(expression, var_dict, variables, mode="reverse").jacobian
     else:
-        name = "Gradient" if len(functions) > 1 else "Partial Derivative"
-        s = ""
-        for t in target:
-            der = gradientR(functions, var_dict, target=t)
-            res.append(der)
-            s += f"{name} with respect to {t}: {der}\n"
-        print(f"Functions: {functions}\nVariables: {var_dict}\n------------------------------\n" + s)
-
+        jcb = jacobian(expression, var_dict, target, mode="reverse").jacobian
+        res = [jcb[:, j] for j in range(len(target))]
+    if verbose:
+        _report(expression.functions, var_dict, target, res, full)
     return res
 
 
 def translate(lambda_func):
     '''
     Translate lambda function input to string representation of function
+    auto_diff() no longer needs it, since functions are now called directly with ForwardNode or ReverseNode arguments
 
     Input:
     lambda_func - function, lambda function(s) that the user want to perform automatic differentiation
@@ -260,18 +834,91 @@ def translate(lambda_func):
     return functions
 
 
-def auto_diff(functions, var_dict, target=None, mode="forward"):
+# cost of the parts of jacobian() in each mode, relative to one forward operation, measured by the mode suite of
+# benchmarks/run.py: forward mode carries one tangent per target through every variable and operation in a
+# single pass, reverse mode records every operation once and then sweeps the whole graph once per output
+FORWARD_VARIABLE_COST = 1.5
+FORWARD_SEED_COST = 0.02
+FORWARD_OP_COST = 1.0
+FORWARD_TARGET_COST = 0.0003
+REVERSE_VARIABLE_COST = 0.7
+REVERSE_OP_COST = 1.05
+REVERSE_SWEEP_COST = 0.11
+# number of operations assumed per function when the graph is not probed
+OPS_PER_FUNCTION = 10
+
+
+def _graph_size(expression, var_dict):
+    '''
+    Evaluate the functions once in reverse mode to count their outputs and the operations of their shared graph
+    '''
+    with no_tape():
+        nodes = [ReverseNode(value) for value in expression.values(var_dict)]
+        outputs = expression(*nodes)
+    return len(outputs), len(_topological_order(nodes)) - len(nodes)
+
+
+def select_mode(functions, var_dict, target=None, probe=False):
+    '''
+    Choose the cheaper automatic differentiation mode for the given functions and variables
+
+    Input:
+    functions - str/list/Expression, the functions output we are caculating
+    var_dict - dictionary, name and value pair of all variables in function
+    target - list, name of our target variable(s) to calculate the gradient
+    probe - bool, evaluate the functions once to count the operations of their graph, instead of assuming
+            OPS_PER_FUNCTION operations per function, default to False
+
+    Output:
+    str, "forward" or "reverse"
+
+    Examples:
+    >>> select_mode("x1 * x2 + sin(x3)", {"x1": 1, "x2": 2, "x3": 3})
+    'reverse'
+
+    >>> select_mode(["x1 * %d" % i for i in range(50)], {"x1": 1})
+    'forward'
+
+    >>> var_dict = {f"x{i}": i for i in range(30)}
+    >>> select_mode(["x0 * x1"] * 20, var_dict)
+    'forward'
+    >>> select_mode(["x0 * x1"] * 20, var_dict, probe=True)
+    'reverse'
+
+    '''
+    if probe:
+        expression = functions if isinstance(functions, Expression) else compile_functions(functions, list(var_dict))
+        m, size = _graph_size(expression, var_dict)
+    else:
+        if isinstance(functions, Expression):
+            m = functions.n_outputs(var_dict)
+        elif callable(functions):
+            m = Expression(functions, list(var_dict.keys())).n_outputs(var_dict)
+        else:
+            m = 1 if isinstance(functions, str) else len(functions)
+        size = OPS_PER_FUNCTION * m
+    n = len(var_dict)
+    k = len([target] if isinstance(target, str) else target) if target else n
+    forward_cost = n * (FORWARD_VARIABLE_COST + FORWARD_SEED_COST * k) + size * (FORWARD_OP_COST + FORWARD_TARGET_COST * k)
+    reverse_cost = n * REVERSE_VARIABLE_COST + size * (REVERSE_OP_COST + REVERSE_SWEEP_COST * (m - 1))
+    return "reverse" if reverse_cost < forward_cost else "forward"
+
+
+def auto_diff(functions, var_dict, target=None, mode="forward", verbose=False):
     '''
     Wrap function for automatic differentiation
 
     Input:
-    functions - str, the functions output we are caculating
+    functions - str/list/function/Expression, the functions output we are caculating
     var_dict - dictionary, name and value pair of all variables in function
     target - list, name of our target variable(s) to calculate the gradient
-    mode - str, either forward or reverse model
+    mode - str, either forward or reverse model, or auto to pick the cheaper one with select_mode()
+    verbose - bool, print the functions, variables, mode and result, default to False
 
     Output:
     The derivative / partial derivative / gradient / jacobian of input function and target variable
+    The result does not say which mode auto picked: it is only printed when verbose is set. jacobian() is the
+    only function that reports it, in the mode field of its result, and takes the same arguments
 
     Examples:
     >>> functions = ["tanh(x1) + cosh(x2 * 3) - sec(x3)", "x1 / x2 * cos(x3)", "sin(x1 / 2) + x2 * x3"]
@@ -280,14 +927,15 @@ def auto_diff(functions, var_dict, target=None, mode="forward"):
     >>> gradient
     [[0.15883159318006335, 1.0, 0.3535533905932738], [30.053624782229708, -1.5707963267948966, 0.0]]
 
-    >>> jacobian = auto_diff(functions, var_dict, ["x1", "x2", "x3"], mode="reverse")
-    >>> jacobian
+    >>> jcb = auto_diff(functions, var_dict, ["x1", "x2", "x3"], mode="reverse")
+    >>> jcb
     [[0.15883159318006335, 30.053624782229708, 0.0], [1.0, -1.5707963267948966, 0.0], [0.3535533905932738, 0.0, 1.0]]
 
+    >>> jacobian(functions, var_dict, ["x1", "x2"], mode="auto").mode
+    'forward'
+
     '''
-    if (not isinstance(functions, (str, list))) and functions.__name__ == "<lambda>":
-        functions = translate(functions)
-    if not (isinstance(functions, str) or all([isinstance(f, str) for f in functions])):
+    if not (isinstance(functions, (str, Expression)) or callable(functions) or all([isinstance(f, str) for f in functions])):
         raise TypeError('Invalid input type: each function should be a string or lambda function')
     if not isinstance(var_dict, dict):
         raise TypeError('Invalid input type: input variables should be dictionary')
@@ -295,18 +943,304 @@ def auto_diff(functions, var_dict, target=None, mode="forward"):
         if not (isinstance(target, str) or all([t in var_dict.keys() for t in target])):
             raise ValueError('Invalid target value: target must be in the variable dictionary')
 
+    if mode == "auto":
+        mode = select_mode(functions, var_dict, target)
+        if verbose:
+            print(f"Mode: auto, using {mode} mode")
     if mode == "forward":
-        return forward_auto_diff(functions, var_dict, target)
+        return forward_auto_diff(functions, var_dict, target, verbose)
     elif mode == "reverse":
-        return reverse_auto_diff(functions, var_dict, target)
+        return reverse_auto_diff(functions, var_dict, target, verbose)
+    else:
+        raise ValueError("Invalid mode: please choose between forward, reverse and auto mode")
+
+
+def _batch_points(points, variables=None, dtype=np.float64):
+    '''
+    Convert a batch of evaluation points into one column of values per variable
+
+    Input:
+    points - list of dictionaries / dictionary of arrays / 2-D np.ndarray, the evaluation points
+    variables - list, names of the columns of a 2-D np.ndarray, not needed for a structured array
+    dtype - np.dtype, floating point type of the columns, default to float64
+
+    Output:
+    A dictionary with a np.ndarray of shape (N,) for every variable
+
+    Examples:
+    >>> _batch_points([{"x1": 1, "x2": 2}, {"x1": 3, "x2": 4}])
+    {'x1': array([1., 3.]), 'x2': array([2., 4.])}
+
+    '''
+    if isinstance(points, dict):
+        columns = {var: np.asarray(value, dtype=dtype).ravel() for var, value in points.items()}
+    elif isinstance(points, np.ndarray) and points.dtype.names is not None:
+        columns = {var: np.asarray(points[var], dtype=dtype).ravel() for var in points.dtype.names}
+    elif isinstance(points, np.ndarray):
+        if points.ndim != 2 or variables is None or len(variables) != points.shape[1]:
+            raise ValueError('Invalid input: a 2-D array of points needs one variable name per column')
+        values = points.astype(dtype, copy=False)
+        columns = {var: values[:, j] for j, var in enumerate(variables)}
     else:
-        raise ValueError("Invalid mode: please choose between forward and reverse mode")
+        points = list(points)
+        if not all([isinstance(point, dict) for point in points]):
+            raise TypeError('Invalid input type: points should be a list of dictionaries, a dictionary of arrays or a 2-D array')
+        names = list(points[0].keys()) if points else list(variables or [])
+        try:
+            values = np.array([[point[var] for var in names] for point in points], dtype=dtype)
+        except KeyError as e:
+            raise ValueError(f'Invalid input: no value given for variable {e} in every point')
+        columns = {var: values[:, j] if len(points) else np.empty(0, dtype=dtype) for j, var in enumerate(names)}
+    if len({len(column) for column in columns.values()}) > 1:
+        raise ValueError('Invalid input: every variable must have the same number of points')
+    return columns
+
+
+def _batch_jacobian(expression, columns, target, out, mode="forward"):
+    '''
+    Fill out with the jacobian at a batch of points, evaluated once with batched ForwardNode variables,
+    or in reverse mode with TensorNode variables and one sweep per function
+
+    Input:
+    expression - Expression, the compiled functions
+    columns - dictionary, a np.ndarray of shape (N,) for every variable
+    target - list, name of the target variables
+    out - np.ndarray of shape (N, m, k), filled in place
+    mode - str, forward or reverse
+
+    '''
+    out[:] = 0.0
+    if mode == "reverse":
+        inputs = [TensorNode(column) for column in expression.values(columns)]
+        wrt = [inputs[expression.variables.index(t)] for t in target]
+        for i, y in enumerate(expression(*inputs)):
+            if isinstance(y, TensorNode):
+                # the points are independent, so the gradient of the sum over the batch is the derivative at every point
+                out[:, i, :] = np.stack(tensor_gradient(y.sum(), wrt), axis=-1)
+        return
+    for i, y in enumerate(expression.forward(columns, wrt=target, dtype=out.dtype)):
+        # outputs that are not ForwardNode objects are constants with zero derivatives
+        if isinstance(y, ForwardNode):
+            out[:, i, :] = y.trace
+
+
+# state of a worker process of auto_diff_batch(), set once per worker by _init_worker()
+_worker = {}
+
+
+def _init_worker(functions, variables, target, shm_name, shape, dtype, mode="forward"):
+    '''
+    Compile the functions and attach the shared output array once per worker process
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker.update(expression=compile_functions(functions, variables), target=target, shm=shm,
+                   out=np.ndarray(shape, dtype=dtype, buffer=shm.buf), mode=mode)
+
+
+def _run_worker(start, columns):
+    '''
+    Write the jacobian at a shard of points into the shared output array, starting at row start
+    '''
+    n_points = len(next(iter(columns.values())))
+    _batch_jacobian(_worker['expression'], columns, _worker['target'], _worker['out'][start:start + n_points],
+                    _worker['mode'])
+
+
+def _picklable(functions):
+    '''
+    Check whether functions can be sent to worker processes started without fork, which pickle their arguments
+    '''
+    try:
+        pickle.dumps(functions)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def auto_diff_batch(functions, points, target=None, variables=None, n_workers=None, dtype=None, mode="forward"):
+    '''
+    Calculate the jacobian at a batch of points at once, carrying one value per point through every operation
+    instead of looping over the points
+
+    Input:
+    functions - str/list/function/Expression, the functions output we are caculating
+    points - list of dictionaries / dictionary of arrays / 2-D np.ndarray, the evaluation points
+    target - list, name of our target variable(s) to calculate the gradient, default to all variables
+    variables - list, names of the columns of a 2-D np.ndarray of points
+    n_workers - int, number of processes to shard the points across, default to None which uses this process only
+                each worker compiles the functions once and writes its rows into a shared memory output array
+                lambdas and functions defined inside other functions can not be pickled, so unless worker processes
+                are started with fork, they are evaluated in this process with a RuntimeWarning
+    dtype - str/type/np.dtype, floating point type of the values, traces and result, default to None, which uses
+            the default dtype, float32 halves the memory of the traces
+    mode - str, forward, reverse or auto, reverse mode sweeps each function once for the whole batch,
+           auto picks the mode with select_mode() at the first point, default to forward
+
+    Output:
+    np.ndarray of shape (N, m, k), the jacobian at every point, with columns in the order of target
+
+    Examples:
+    >>> auto_diff_batch(["x1 * x2", "sin(x1)"], {"x1": [0, 1], "x2": [2, 3]})
+    array([[[2.        , 0.        ],
+            [1.        , 0.        ]],
+    <BLANKLINE>
+           [[3.        , 1.        ],
+            [0.54030231, 0.        ]]])
+
+    '''
+    if n_workers is not None and (not isinstance(n_workers, int) or n_workers < 1):
+        raise ValueError('Invalid n_workers: n_workers must be a positive integer')
+    dtype = resolve_dtype(dtype)
+    columns = _batch_points(points, variables, dtype)
+    names = list(columns.keys())
+    target = names if not target else [target] if isinstance(target, str) else list(target)
+    if not all([t in names for t in target]):
+        raise ValueError('Invalid target value: target must be in the variables of the points')
+    expression = compile_functions(functions, names)
+    n_points = len(next(iter(columns.values()))) if columns else 0
+    if n_points == 0:
+        return np.zeros((0, len(expression.functions) if expression.shared else 0, len(target)), dtype=dtype)
+    first = {var: float(column[0]) for var, column in columns.items()}
+    shape = (n_points, expression.n_outputs(first), len(target))
+    if mode == "auto":
+        mode = select_mode(expression, first, target)
+    if mode not in ("forward", "reverse"):
+        raise ValueError("Invalid mode: please choose between forward, reverse and auto mode")
+
+    parallel = n_workers is not None and n_workers > 1 and n_points > 1
+    if parallel and multiprocessing.get_start_method() != 'fork' and not _picklable(expression.functions):
+        warnings.warn(f"The functions can not be pickled for worker processes started with "
+                      f"{multiprocessing.get_start_method()}, so they are evaluated in this process", RuntimeWarning)
+        parallel = False
+    if not parallel:
+        jcb = np.empty(shape, dtype=dtype)
+        _batch_jacobian(expression, columns, target, jcb, mode)
+        return jcb
+
+    # the workers write their rows straight into shared memory, so only the points are pickled
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    try:
+        bounds = np.linspace(0, n_points, min(n_workers, n_points) + 1).astype(int)
+        initargs = (expression.functions, names, target, shm.name, shape, dtype, mode)
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=initargs) as executor:
+            futures = [executor.submit(_run_worker, int(start), {var: column[start:stop] for var, column in columns.items()})
+                       for start, stop in zip(bounds[:-1], bounds[1:])]
+            for future in futures:
+                future.result()
+        jcb = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return jcb
+
+
+def _iter_chunks(source, variables=None, chunk_size=65536):
+    '''
+    Read evaluation points from a file in chunks, so that only one chunk is in memory at a time
+
+    Input:
+    source - str/np.ndarray, path to a .npy file (read through a memory map) or a .csv file with a header row
+             of variable names, or an array such as a np.memmap
+    variables - list, names of the columns of a 2-D .npy file or array, not needed for structured arrays
+    chunk_size - int, number of points per chunk
+
+    Output:
+    A generator of dictionaries with a np.ndarray of shape (chunk_size,) or less for every variable
+
+    '''
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError('Invalid chunk_size: chunk_size must be a positive integer')
+    if isinstance(source, (str, os.PathLike)) and str(source).endswith('.csv'):
+        with open(source) as f:
+            names = [name.strip() for name in f.readline().split(',')]
+            while True:
+                lines = list(itertools.islice(f, chunk_size))
+                if not lines:
+                    return
+                values = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+                yield _batch_points(values, variables or names)
+    else:
+        points = np.load(source, mmap_mode='r') if isinstance(source, (str, os.PathLike)) else source
+        for start in range(0, len(points), chunk_size):
+            yield _batch_points(np.asarray(points[start:start + chunk_size]), variables)
+
+
+def _count_points(source):
+    '''
+    Count the evaluation points in a .npy or .csv file without loading it
+    '''
+    if isinstance(source, (str, os.PathLike)) and str(source).endswith('.csv'):
+        with open(source) as f:
+            return sum(1 for line in f if line.strip()) - 1
+    points = np.load(source, mmap_mode='r') if isinstance(source, (str, os.PathLike)) else source
+    return len(points)
+
+
+def auto_diff_stream(functions, source, target=None, variables=None, chunk_size=65536, mode="forward",
+                     n_workers=None, dtype=None):
+    '''
+    Calculate the jacobian at every point of a large point set chunk by chunk, keeping memory bounded by the chunk size
+
+    Input:
+    functions - str/list/function/Expression, the functions output we are caculating
+    source - str/np.ndarray, path to a .npy or .csv file of points, or an array such as a np.memmap, see _iter_chunks()
+    target - list, name of our target variable(s) to calculate the gradient, default to all variables
+    variables - list, names of the columns of a 2-D .npy file or array
+    chunk_size - int, number of points evaluated at once
+    mode - str, forward, reverse or auto, see auto_diff_batch()
+    n_workers - int, number of processes to shard every chunk across, see auto_diff_batch()
+    dtype - str/type/np.dtype, floating point type of the result, see auto_diff_batch()
+
+    Output:
+    A generator of np.ndarray of shape (chunk_size, m, k), the jacobians of consecutive chunks of points
+
+    Examples:
+    >>> total = 0
+    >>> for jcb in auto_diff_stream("x1 * x2", "points.csv", chunk_size=100000):
+    ...     total += jcb.sum(axis=0)
+
+    '''
+    for columns in _iter_chunks(source, variables, chunk_size):
+        yield auto_diff_batch(functions, columns, target, n_workers=n_workers, dtype=dtype, mode=mode)
+
+
+def auto_diff_to_file(functions, source, out, target=None, variables=None, chunk_size=65536, mode="forward",
+                      n_workers=None, dtype=None):
+    '''
+    Calculate the jacobian at every point of a large point set chunk by chunk, writing it to a memory mapped .npy file
+
+    Input:
+    functions - str/list/function/Expression, the functions output we are caculating
+    source - str/np.ndarray, path to a .npy or .csv file of points, or an array such as a np.memmap, see _iter_chunks()
+    out - str, path of the .npy file to write
+    target - list, name of our target variable(s) to calculate the gradient, default to all variables
+    variables - list, names of the columns of a 2-D .npy file or array
+    chunk_size - int, number of points evaluated at once
+    mode - str, forward, reverse or auto, see auto_diff_batch()
+    n_workers - int, number of processes to shard every chunk across, see auto_diff_batch()
+    dtype - str/type/np.dtype, floating point type of the result and of the out file, see auto_diff_batch()
+
+    Output:
+    np.memmap of shape (N, m, k), the jacobian at every point, backed by the out file
+
+    '''
+    jcb = None
+    start = 0
+    for chunk in auto_diff_stream(functions, source, target, variables, chunk_size, mode, n_workers, dtype):
+        if jcb is None:
+            jcb = np.lib.format.open_memmap(out, mode='w+', dtype=chunk.dtype, shape=(_count_points(source),) + chunk.shape[1:])
+        jcb[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    if jcb is None:
+        raise ValueError('Invalid input: the source has no points')
+    jcb.flush()
+    return jcb
 
 
 def main():
     functions = lambda x1, x2: [exp(x1) + log(x2) - 5, sin(x1) + cos(x2)]
     var_dict = {"x1": 3, "x2": 5}
-    auto_diff(functions, var_dict, ["x1", "x2"], "reverse")
+    auto_diff(functions, var_dict, ["x1", "x2"], "reverse", verbose=True)
 
 
 if __name__ == "__main__":
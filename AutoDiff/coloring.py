@@ -0,0 +1,96 @@
+import numpy as np
+
+
+def sparsity_pattern(outputs, inputs, tape):
+    '''
+    Detect which inputs every output depends on from the operations recorded on a tape
+    The pattern is structural: an operation links its result to its operands whatever their values,
+    so derivatives that happen to be zero at the recorded point are still part of the pattern
+
+    Input:
+    outputs - list, ReverseNode objects (or constants) for the function outputs
+    inputs - list, ReverseNode objects for the input variables, recorded on tape
+    tape - Tape, the tape the functions were recorded on, with record_ops
+
+    Output:
+    A tuple (rows, cols) of np.ndarray, the output and input index of every structural nonzero, sorted by row
+
+    Examples:
+    >>> with Tape(record_ops=True) as tape:
+    ...     x = [ReverseNode(1.0) for _ in range(3)]
+    ...     y = [x[0] * x[1], x[2] * 0, 2.0]
+    >>> sparsity_pattern(y, x, tape)
+    (array([0, 0, 1]), array([0, 1, 2]))
+
+    '''
+    if not tape.record_ops:
+        raise ValueError("Invalid tape: the sparsity pattern is detected from a Tape(record_ops=True)")
+    deps = [frozenset()] * tape.n_nodes
+    for j, x in enumerate(inputs):
+        deps[x.index] = frozenset([j])
+    # operations are recorded in the order they were executed, so the operands are always done first
+    for index, _, operands, _ in tape.ops:
+        deps[index] = frozenset().union(*[deps[i] for i in operands])
+    rows, cols = [], []
+    for i, y in enumerate(outputs):
+        # outputs that are not recorded nodes are constants without any nonzero
+        if getattr(y, 'tape', None) is tape:
+            found = sorted(deps[y.index])
+            rows.extend([i] * len(found))
+            cols.extend(found)
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def color_columns(rows, cols, shape):
+    '''
+    Color the columns of a sparsity pattern so that no two columns of the same color have a nonzero in the same row
+    The columns of one color can then share a single seed vector, and every nonzero is recovered from the
+    compressed jacobian without cancellation
+
+    Input:
+    rows, cols - np.ndarray, the row and column index of every nonzero
+    shape - tuple, the shape (m, n) of the jacobian
+
+    Output:
+    np.ndarray of shape (n,), the color of every column, numbered from 0
+
+    Examples:
+    >>> color_columns(np.array([0, 0, 1, 1, 2, 2]), np.array([0, 1, 1, 2, 2, 3]), (3, 4))
+    array([1, 0, 1, 0])
+
+    '''
+    m, n = shape
+    row_cols = [[] for _ in range(m)]
+    col_rows = [[] for _ in range(n)]
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        row_cols[i].append(j)
+        col_rows[j].append(i)
+    colors = np.full(n, -1, dtype=np.int64)
+    # greedy distance-2 coloring, largest columns first since they are the hardest to place
+    for j in sorted(range(n), key=lambda j: -len(col_rows[j])):
+        forbidden = {colors[k] for i in col_rows[j] for k in row_cols[i]}
+        color = 0
+        while color in forbidden:
+            color += 1
+        colors[j] = color
+    return colors
+
+
+def color_rows(rows, cols, shape):
+    '''
+    Color the rows of a sparsity pattern so that no two rows of the same color have a nonzero in the same column,
+    the rows of one color can then share a single reverse sweep
+
+    Input:
+    rows, cols - np.ndarray, the row and column index of every nonzero
+    shape - tuple, the shape (m, n) of the jacobian
+
+    Output:
+    np.ndarray of shape (m,), the color of every row, numbered from 0
+
+    Examples:
+    >>> color_rows(np.array([0, 1, 2]), np.array([0, 1, 1]), (3, 2))
+    array([0, 0, 1])
+
+    '''
+    return color_columns(cols, rows, shape[::-1])
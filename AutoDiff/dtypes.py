@@ -0,0 +1,73 @@
+import numpy as np
+
+# scalar types accepted as numbers by the nodes and the elementary functions
+SCALAR_TYPES = (int, float, np.integer, np.floating)
+
+# floating point type of the traces, partials and adjoints created by this package
+_default_dtype = np.dtype(np.float64)
+
+
+def resolve_dtype(dtype=None):
+    '''
+    Get the floating point type to use for a call
+
+    Input:
+    dtype - str/type/np.dtype, a floating point type such as np.float32 or "float64", default to None,
+            which uses the default set with set_default_dtype()
+
+    Output:
+    np.dtype, the floating point type
+
+    Examples:
+    >>> resolve_dtype("float32")
+    dtype('float32')
+
+    '''
+    if dtype is None:
+        return _default_dtype
+    try:
+        dtype = np.dtype(dtype)
+    except TypeError:
+        raise TypeError("Invalid dtype: please choose a floating point type such as float32 or float64")
+    if not np.issubdtype(dtype, np.floating):
+        raise TypeError("Invalid dtype: please choose a floating point type such as float32 or float64")
+    return dtype
+
+
+def get_default_dtype():
+    '''
+    Get the floating point type used when no dtype is given
+
+    Output:
+    np.dtype, float64 unless changed with set_default_dtype()
+
+    '''
+    return _default_dtype
+
+
+def set_default_dtype(dtype):
+    '''
+    Set the floating point type of the traces, partials and adjoints created when no dtype is given
+    Operations keep the type of their operands, Python numbers do not widen a float32 result,
+    and mixing float32 with float64 values gives float64, following the NumPy promotion rules
+    Before NumPy 2, Python numbers still widen float32 scalar values to float64, while traces, adjoints
+    and results keep the type
+
+    Input:
+    dtype - str/type/np.dtype, a floating point type such as np.float32 or "float64"
+
+    Output:
+    np.dtype, the previous default, so that it can be restored
+
+    Examples:
+    >>> previous = set_default_dtype(np.float32)
+    >>> init_trace(var="x1", variables=["x1", "x2"]).dtype
+    dtype('float32')
+    >>> set_default_dtype(previous)
+    dtype('float32')
+
+    '''
+    global _default_dtype
+    previous = _default_dtype
+    _default_dtype = resolve_dtype(dtype)
+    return previous
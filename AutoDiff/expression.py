@@ -0,0 +1,480 @@
+import ast
+import sys
+import functools
+import numpy as np
+from AutoDiff import utils
+from AutoDiff.dtypes import resolve_dtype
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.primitive import Primitive
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tensorNode import TensorNode
+from AutoDiff.sparseTrace import SparseTrace
+
+# names that can be used inside string functions
+_NAMESPACE = {name: getattr(utils, name) for name in utils.__all__}
+_NAMESPACE.update({'np': np, 'ForwardNode': ForwardNode, 'ReverseNode': ReverseNode, 'TensorNode': TensorNode})
+
+CACHE_SIZE = 256
+
+# NumPy constants that are folded into numbers
+_NUMPY_CONSTANTS = {'pi': np.pi, 'e': np.e}
+
+
+def _number(node):
+    '''
+    Get the value of a numeric constant node, or None if the node is not one
+    '''
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    return None
+
+
+def _postorder(tree, skip=()):
+    '''
+    List the nodes of an expression tree with every node after its children, without recursion so that long
+    generated expressions do not reach the recursion limit, the descendants of nodes of the skip types are left out
+    '''
+    order, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if not isinstance(node, skip):
+            stack.extend(ast.iter_child_nodes(node))
+    return order[::-1]
+
+
+def _transform(tree, visit, skip=()):
+    '''
+    Rewrite an expression tree bottom up like ast.NodeTransformer, calling visit on every node once its children
+    have been replaced by their rewritten versions, the nodes of the skip types are visited but not their children
+    '''
+    rewritten = {}
+    for node in _postorder(tree, skip):
+        if not isinstance(node, skip):
+            for field, value in ast.iter_fields(node):
+                if isinstance(value, ast.AST):
+                    setattr(node, field, rewritten[id(value)])
+                elif isinstance(value, list):
+                    value[:] = [rewritten[id(item)] if isinstance(item, ast.AST) else item for item in value]
+        rewritten[id(node)] = visit(node)
+    return rewritten[id(tree)]
+
+
+def _number_structures(tree, numbers, structures):
+    '''
+    Number every node of an expression tree by its structure, so that equal subtrees get equal numbers
+    Each node is keyed by its type, its plain fields and the numbers of its children, which takes linear time
+    where comparing ast.dump strings would take quadratic time on long expressions
+    '''
+    for node in _postorder(tree):
+        key = [node.__class__]
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST):
+                key.append(numbers[id(value)])
+            elif isinstance(value, list):
+                key.append(tuple([numbers[id(item)] if isinstance(item, ast.AST) else repr(item) for item in value]))
+            else:
+                # repr keeps 1, 1.0, True and -0.0 apart
+                key.append(repr(value))
+        numbers[id(node)] = structures.setdefault(tuple(key), len(structures))
+
+
+def _compile_tree(tree, mode):
+    '''
+    Compile an ast tree, giving source positions to the nodes built by the rewrite passes
+    '''
+    depth = {}
+    for node in _postorder(tree):
+        depth[id(node)] = 1 + max([depth[id(child)] for child in ast.iter_child_nodes(node)], default=0)
+        if 'lineno' in node._attributes and getattr(node, 'lineno', None) is None:
+            node.lineno, node.col_offset, node.end_lineno, node.end_col_offset = 1, 0, 1, 0
+    # compile checks the depth of ast objects against the recursion limit, while compiling the same text does not
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, depth[id(tree)] + 100))
+    try:
+        return compile(tree, '<AutoDiff>', mode)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+class _Simplify():
+    '''
+    Fold constant subexpressions and remove identity operations (x * 1, x + 0, x - 0, x / 1, x ** 1, --x, +x),
+    bottom up so that the folded children of an operation can make it foldable in turn
+    '''
+    _IDENTITIES = {ast.Add: (0, 0), ast.Sub: (None, 0), ast.Mult: (1, 1), ast.Div: (None, 1), ast.Pow: (None, 1)}
+
+    def __init__(self, variables):
+        self.variables = set(variables)
+
+    def visit(self, node):
+        # the children are already simplified by _transform
+        method = getattr(self, 'visit_' + node.__class__.__name__, None)
+        return node if method is None else method(node)
+
+    def _fold(self, node, compute):
+        try:
+            value = compute()
+        except (ArithmeticError, ValueError, TypeError, OverflowError):
+            # leave the operation to raise its usual error at evaluation time
+            return node
+        if isinstance(value, (np.integer, np.floating)):
+            value = value.item()
+        if type(value) not in (int, float):
+            return node
+        # kind is set like on parsed constants, so that the folded tree compares equal to the parsed one
+        return ast.copy_location(ast.Constant(value=value, kind=None), node)
+
+    def visit_Attribute(self, node):
+        if (isinstance(node.value, ast.Name) and node.value.id == 'np' and 'np' not in self.variables
+                and node.attr in _NUMPY_CONSTANTS):
+            return ast.copy_location(ast.Constant(value=_NUMPY_CONSTANTS[node.attr], kind=None), node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        operand = _number(node.operand)
+        if operand is not None and isinstance(node.op, (ast.USub, ast.UAdd)):
+            return self._fold(node, lambda: -operand if isinstance(node.op, ast.USub) else operand)
+        if isinstance(node.op, ast.UAdd):
+            return node.operand
+        if isinstance(node.op, ast.USub) and isinstance(node.operand, ast.UnaryOp) and isinstance(node.operand.op, ast.USub):
+            return node.operand.operand
+        return node
+
+    def visit_BinOp(self, node):
+        left, right = _number(node.left), _number(node.right)
+        if left is not None and right is not None:
+            operation = ast.Expression(body=ast.BinOp(left=ast.Constant(value=left), op=node.op,
+                                                      right=ast.Constant(value=right)))
+            code = _compile_tree(operation, 'eval')
+            return self._fold(node, lambda: eval(code, {}))
+        identity = self._IDENTITIES.get(type(node.op))
+        if identity is None:
+            return node
+        if right is not None and right == identity[1]:
+            return node.left
+        if left is not None and left == identity[0]:
+            return node.right
+        if left is not None and left == 0 and isinstance(node.op, ast.Sub):
+            return ast.copy_location(ast.UnaryOp(op=ast.USub(), operand=node.right), node)
+        return node
+
+    def visit_Call(self, node):
+        if (isinstance(node.func, ast.Name) and node.func.id in utils.__all__ and node.func.id not in self.variables
+                and not node.keywords and node.args and all([_number(arg) is not None for arg in node.args])):
+            function, args = _NAMESPACE[node.func.id], [_number(arg) for arg in node.args]
+            return self._fold(node, lambda: function(*args))
+        return node
+
+
+def _parse(function, variables):
+    '''
+    Parse a string function into a simplified expression tree
+
+    Input:
+    function - str, the function to parse
+    variables - tuple, names for all variables in function
+
+    Output:
+    An ast expression node, with constant subexpressions folded and identity operations removed
+
+    Examples:
+    >>> ast.unparse(_parse("x1 * 1 + np.pi / 2 * 0 - sin(0)", ("x1",)))
+    'x1'
+
+    '''
+    return _transform(ast.parse(function, mode='eval').body, _Simplify(variables).visit)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _compile(function, variables):
+    '''
+    Compile a string function into a Python function of the variables, taking them as positional arguments
+
+    Input:
+    function - str, the function to compile
+    variables - tuple, names for all variables in function, in the order of the positional arguments
+
+    Output:
+    A Python function evaluating the simplified string function, cached by function text and variable order
+
+    Examples:
+    >>> f = _compile("x1 * exp(x2)", ("x1", "x2"))
+    >>> f(2, 0)
+    2.0
+
+    '''
+    # parse a template lambda, so the node fields match the running Python version
+    expression = ast.parse(f"lambda {', '.join(variables)}: None", mode='eval')
+    expression.body.body = _parse(function, variables)
+    return eval(_compile_tree(expression, 'eval'), _NAMESPACE)
+
+
+# subexpressions inside these nodes are only evaluated on some paths, so they are never shared
+_CONDITIONAL = (ast.IfExp, ast.BoolOp, ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def _pure_call(node):
+    '''
+    Check if a call node calls a function of this package or a primitive, whose value only depends on its inputs
+    '''
+    if not isinstance(node.func, ast.Name):
+        return False
+    return node.func.id in utils.__all__ or isinstance(_NAMESPACE.get(node.func.id), Primitive)
+
+
+def _impure(tree):
+    '''
+    Find the nodes of an expression tree that may have a different value every time they are evaluated:
+    calls of anything but the functions of this package and the primitives, such as np.random.rand(),
+    and every node containing one
+    '''
+    impure = set()
+    for node in _postorder(tree):
+        if (isinstance(node, ast.Call) and not _pure_call(node)) or \
+                any([id(child) in impure for child in ast.iter_child_nodes(node)]):
+            impure.add(id(node))
+    return impure
+
+
+def _count_subexpressions(tree, numbers, counts):
+    '''
+    Count every compound subexpression of an expression tree by its structure number, leaving out the impure ones
+    so that they are evaluated every time they appear
+    '''
+    impure = _impure(tree)
+    for node in _postorder(tree, _CONDITIONAL):
+        if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call)) and id(node) not in impure:
+            key = numbers[id(node)]
+            counts[key] = counts.get(key, 0) + 1
+
+
+class _Hoist():
+    '''
+    Replace every subexpression counted more than once by a temporary variable assigned once
+    '''
+    def __init__(self, numbers, counts, prefix):
+        self.numbers = numbers
+        self.counts = counts
+        self.prefix = prefix
+        self.names = {}
+        self.assignments = []
+
+    def visit(self, node):
+        if not isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call)) or self.counts.get(self.numbers[id(node)], 0) < 2:
+            return node
+        key = self.numbers[id(node)]
+        if key not in self.names:
+            # children are hoisted first, so every temporary is assigned after the ones it uses
+            self.names[key] = f'{self.prefix}{len(self.names)}'
+            self.assignments.append(ast.Assign(targets=[ast.Name(id=self.names[key], ctx=ast.Store())], value=node))
+        return ast.Name(id=self.names[key], ctx=ast.Load())
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _compile_all(functions, variables):
+    '''
+    Compile string functions into one Python function of the variables returning the list of all outputs,
+    in which every subexpression shared by several functions (or repeated in one) is evaluated only once
+
+    Input:
+    functions - tuple, the string functions to compile
+    variables - tuple, names for all variables in function, in the order of the positional arguments
+
+    Output:
+    A Python function evaluating all string functions, cached by function texts and variable order
+
+    Examples:
+    >>> f = _compile_all(("exp(x1) * x2", "exp(x1) + 1"), ("x1", "x2"))
+    >>> f(0, 2)
+    [2.0, 2.0]
+
+    '''
+    trees = [_parse(f, variables) for f in functions]
+    numbers, structures, counts = {}, {}, {}
+    for tree in trees:
+        _number_structures(tree, numbers, structures)
+        _count_subexpressions(tree, numbers, counts)
+    prefix = '_cse'
+    while any([var.startswith(prefix) for var in variables]):
+        prefix = '_' + prefix
+    hoist = _Hoist(numbers, counts, prefix)
+    outputs = [_transform(tree, hoist.visit, _CONDITIONAL) for tree in trees]
+    # parse a template definition, so the node fields match the running Python version
+    module = ast.parse(f"def _functions({', '.join(variables)}):\n    return []")
+    definition = module.body[0]
+    definition.body = hoist.assignments + [ast.Return(value=ast.List(elts=outputs, ctx=ast.Load()))]
+    namespace = {}
+    exec(_compile_tree(module, 'exec'), _NAMESPACE, namespace)
+    return namespace['_functions']
+
+
+class Expression():
+    def __init__(self, functions, variables):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - an Expression object
+        functions - str/list/function, the function or list of functions to compile, or a Python function
+                    (such as a lambda) taking the variables as positional arguments and returning a value or a list of values
+        variables - list, names for all variables in function, in the order used for the trace and for the positional arguments
+
+        Output:
+        an Expression object, holding the functions compiled once so that they can be evaluated
+        repeatedly at new points in forward and reverse mode
+        Subexpressions shared by several string functions are evaluated once per call and reused by every function
+        A Python function is called directly with ForwardNode or ReverseNode arguments, so it must use the
+        functions of this package (sin, exp, ...) rather than NumPy ones
+
+        Example:
+        >>> f = Expression(["x1 + sin(x2) * 5", "exp(x1) - log(2 * x2)"], ["x1", "x2"])
+        >>> f.evaluate({"x1": 5, "x2": 2})
+        [9.546487134128409, 147.02686472201664]
+
+        >>> f = Expression(lambda x1, x2: [x1 * x2, x1 + x2], ["x1", "x2"])
+        >>> f.evaluate({"x1": 3, "x2": 4})
+        [12, 7]
+
+        '''
+        if not all([isinstance(var, str) and var.isidentifier() for var in variables]):
+            raise TypeError('Invalid input type: each variable should be a valid Python name')
+        self.variables = list(variables)
+        if callable(functions):
+            self.functions = functions
+            self.shared = None
+            return
+        functions = [functions] if isinstance(functions, str) else list(functions)
+        if not all([isinstance(f, str) for f in functions]):
+            raise TypeError('Invalid input type: each function should be a string')
+        self.functions = functions
+        self.shared = _compile_all(tuple(self.functions), tuple(self.variables))
+        self._compiled = None
+
+    @property
+    def compiled(self):
+        '''
+        The string functions compiled one by one, or None for a Python function
+        They are only compiled on first use, since calls evaluate the shared compilation of all functions
+        '''
+        if self.shared is None:
+            return None
+        if self._compiled is None:
+            self._compiled = [_compile(f, tuple(self.variables)) for f in self.functions]
+        return self._compiled
+
+    def __call__(self, *args):
+        '''
+        Evaluate all functions with the variables given as positional arguments
+
+        Input:
+        self - an Expression object
+        args - int/float/ForwardNode/ReverseNode, one value per variable, in the order of self.variables
+
+        Output:
+        A list with the output of every function
+
+        Examples:
+        >>> f = Expression("x1 * x2", ["x1", "x2"])
+        >>> f(3, 4)
+        [12]
+
+        '''
+        if self.shared is None:
+            outputs = self.functions(*args)
+            return list(outputs) if isinstance(outputs, (list, tuple)) else [outputs]
+        return self.shared(*args)
+
+    def n_outputs(self, var_dict):
+        '''
+        Get the number of functions, evaluating a Python function once at var_dict to count its outputs
+
+        Input:
+        self - an Expression object
+        var_dict - dictionary, name and value pair of all variables in function
+
+        Output:
+        int, the number of functions
+
+        '''
+        if self.shared is None:
+            return len(self.evaluate(var_dict))
+        return len(self.functions)
+
+    def values(self, var_dict):
+        '''
+        Get the values of the variables in the order of self.variables
+
+        Input:
+        self - an Expression object
+        var_dict - dictionary, name and value pair of all variables in function
+
+        Output:
+        A list of variable values
+
+        '''
+        missing = [var for var in self.variables if var not in var_dict]
+        if missing:
+            raise ValueError(f'Invalid input: no value given for variable(s) {missing}')
+        return [var_dict[var] for var in self.variables]
+
+    def evaluate(self, var_dict):
+        '''
+        Evaluate all functions at a point
+
+        Input:
+        self - an Expression object
+        var_dict - dictionary, name and value pair of all variables in function
+
+        Output:
+        A list with the value of every function
+
+        Examples:
+        >>> f = Expression("x1 * x2", ["x1", "x2"])
+        >>> f.evaluate({"x1": 3, "x2": 4})
+        [12]
+
+        '''
+        return self(*self.values(var_dict))
+
+    def forward(self, var_dict, sparse=False, wrt=None, dtype=None):
+        '''
+        Evaluate all functions at a point with ForwardNode variables
+
+        Input:
+        self - an Expression object
+        var_dict - dictionary, name and value pair of all variables in function
+        sparse - bool, use sparse traces for the input variables, default to False
+        wrt - list, names of the variables the traces are taken with respect to, default to all variables
+        dtype - str/type/np.dtype, floating point type of the values and traces, default to None,
+                which uses the default dtype
+
+        Output:
+        A list with the ForwardNode output of every function, with one trace entry per variable in wrt
+
+        Examples:
+        >>> f = Expression("x1 * x2", ["x1", "x2"])
+        >>> f.forward({"x1": 3, "x2": 4})
+        [ForwardNode Variable: ['x1', 'x2'],  Value: 12, Trace: [4. 3.]]
+        >>> f.forward({"x1": 3, "x2": 4}, wrt=["x2"])
+        [ForwardNode Variable: ['x2'],  Value: 12, Trace: [3.]]
+
+        '''
+        wrt = self.variables if wrt is None else list(wrt)
+        k = len(wrt)
+        dtype = resolve_dtype(dtype)
+        if sparse:
+            seeds = [SparseTrace([j], np.ones(1, dtype=dtype), k) for j in range(k)]
+            zero = SparseTrace([], np.zeros(0, dtype=dtype), k)
+        else:
+            seeds = np.identity(k, dtype=dtype)
+            zero = np.zeros(k, dtype=dtype)
+        nodes = []
+        for var, value in zip(self.variables, self.values(var_dict)):
+            # variables outside wrt are carried with a zero trace
+            seed = seeds[wrt.index(var)] if var in wrt else zero
+            nodes.append(ForwardNode(value, seed, wrt, dtype))
+        return self(*nodes)
+
+    def __repr__(self):
+        return f'Expression Functions: {self.functions}, Variables: {self.variables}'
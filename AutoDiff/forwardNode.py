@@ -1,16 +1,47 @@
 import numpy as np
+from AutoDiff.dtypes import SCALAR_TYPES, resolve_dtype
+from AutoDiff.sparseTrace import SparseTrace
+
+
+def _chain(trace, der):
+    '''
+    Apply the chain rule to a trace, scaling the trace of every evaluation point by its local derivative
+
+    Input:
+    trace - np.array, trace of shape (n,) for a single point or (B, n) for a batch of B points
+    der - int/float/np.array, local derivative, a scalar or an array of shape (B,)
+
+    Output:
+    The trace multiplied by the local derivative
+
+    Examples:
+    >>> _chain(np.array([[1.0, 0.0], [0.0, 1.0]]), np.array([2.0, 3.0]))
+    array([[2., 0.],
+           [0., 3.]])
+
+    '''
+    # checking the type is much cheaper than np.ndim for the common scalar derivatives
+    if not isinstance(der, np.ndarray) or der.ndim == 0:
+        return trace * der
+    return trace * der.reshape(-1, 1)
 
 
 class ForwardNode():
-    def __init__(self, value, trace=1.0, var='x1'):
+    __slots__ = ('value', 'trace', 'var')
+
+    def __init__(self, value, trace=1.0, var='x1', dtype=None):
         '''
         Constructor
         ===========
         Input:
         self - a ForwardNode variable
-        value - int/flot, specifying the value of the current variable
-        trace - int/float/np.array, derivative(s) of the current variable with respect to the input variable(s), default to be 1
+        value - int/flot/np.array, specifying the value of the current variable, or an array of shape (B,)
+                with its values at a batch of B evaluation points
+        trace - int/float/np.array/SparseTrace, derivative(s) of the current variable with respect to the input variable(s), default to be 1
+                for a batch, an array of shape (B, n), or of shape (n,) shared by all points
         var - str, initialize the name of the ForwardNode variable, defaut as "x1"
+        dtype - str/type/np.dtype, floating point type to convert the value and trace to, such as np.float32,
+                default to None, which keeps them as given
 
         Output:
         a ForwardNode object, containing the value and trace of this variable
@@ -19,21 +50,46 @@ class ForwardNode():
         >>> x = ForwardNode(5, [0, 1], "x1, x2")
         ForwardNode Variable: ['x1, x2'],  Value: 5, Trace: [0 1]
 
+        >>> x = ForwardNode(np.array([1.0, 2.0, 3.0]), np.array([1.0, 0.0]), ["x1", "x2"])
+        >>> x.trace.shape
+        (3, 2)
+
         '''
-        if isinstance(value, (int, float)):
+        if isinstance(value, SCALAR_TYPES):
+            self.value = value
+        elif isinstance(value, np.ndarray) and value.ndim == 1 and np.issubdtype(value.dtype, np.number):
             self.value = value
         else:
             raise TypeError("Invalid Input!")
 
-        if isinstance(trace, (int, float)):
+        if isinstance(value, np.ndarray):
+            # batched node: one row of trace per evaluation point
+            if not (isinstance(trace, np.ndarray) and np.issubdtype(trace.dtype, np.number) and trace.ndim in (1, 2)):
+                raise TypeError("Invalid Input!")
+            if trace.ndim == 1:
+                trace = np.broadcast_to(trace, (len(value), len(trace)))
+            if trace.shape[0] != len(value):
+                raise ValueError("Invalid Input: trace must have one row per evaluation point!")
+            self.trace = trace
+        elif isinstance(trace, SCALAR_TYPES):
             self.trace = np.array([trace])
-        elif isinstance(trace, list) and all([isinstance(num, (int, float)) for num in trace]):
+        elif isinstance(trace, list) and all([isinstance(num, SCALAR_TYPES) for num in trace]):
             self.trace = np.array(trace)
-        elif isinstance(trace, np.ndarray) and all([isinstance(num, (np.int64, np.float64)) for num in trace]):
+        elif isinstance(trace, np.ndarray) and trace.ndim == 1 and np.issubdtype(trace.dtype, np.number):
+            self.trace = trace
+        elif isinstance(trace, SparseTrace):
             self.trace = trace
         else:
             raise TypeError("Invalid Input!")
 
+        if dtype is not None:
+            dtype = resolve_dtype(dtype)
+            self.value = self.value.astype(dtype, copy=False) if isinstance(value, np.ndarray) else dtype.type(value)
+            if isinstance(self.trace, SparseTrace):
+                self.trace = SparseTrace._make(self.trace.index, self.trace.data.astype(dtype), self.trace.size)
+            else:
+                self.trace = self.trace.astype(dtype, copy=False)
+
         if isinstance(var, str):
             self.var = [var]
         elif isinstance(var, list) and all([isinstance(varname, str) for varname in var]):
@@ -41,6 +97,31 @@ class ForwardNode():
         else:
             raise TypeError("Invalid Input!")
 
+    @classmethod
+    def _make(cls, value, trace, var):
+        '''
+        Trusted constructor used for the results of operations, skipping the input validation of __init__
+
+        Input:
+        cls - the ForwardNode class
+        value - int/float/np.array, value of the new variable
+        trace - np.array, trace of the new variable
+        var - list, names for all variables in function
+
+        Output:
+        a ForwardNode object, containing the value and trace of this variable
+
+        Examples:
+        >>> ForwardNode._make(2.0, np.array([1.0, 0.0]), ['x1', 'x2'])
+        ForwardNode Variable: ['x1', 'x2'],  Value: 2.0, Trace: [1. 0.]
+
+        '''
+        node = object.__new__(cls)
+        node.value = value
+        node.trace = trace
+        node.var = var
+        return node
+
     def __add__(self, other):
         '''
         Dunder method to add another ForwardNode variable, scalar and vector
@@ -63,12 +144,12 @@ class ForwardNode():
         ForwardNode(7, [1,1], ['x1','x2'])
 
         '''
-        if isinstance(other, (int, float)):
+        if isinstance(other, SCALAR_TYPES):
             # v = y + c; dv/dx1 = dy/dx1, dv/dx2 = dy/dx2, ...
-            return ForwardNode(self.value + other, self.trace, self.var)
+            return ForwardNode._make(self.value + other, self.trace, self.var)
         elif isinstance(other, ForwardNode):
             # v = y + z; dv/dx1 = dy/dx1 + dz/dx1, dv/dx2 = dy/dx2 + dz/dx2, ...
-            return ForwardNode(self.value + other.value, self.trace + other.trace, self.var)
+            return ForwardNode._make(self.value + other.value, self.trace + other.trace, self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -118,12 +199,12 @@ class ForwardNode():
         ForwardNode(-1, [1, -1], ['x1', 'x2'])
 
         '''
-        if isinstance(other, (int, float)):
+        if isinstance(other, SCALAR_TYPES):
             # v = y - c; dv/dx1 = dy/dx1, dv/dx2 = dy/dx2, ...
-            return ForwardNode(self.value - other, self.trace, self.var)
+            return ForwardNode._make(self.value - other, self.trace, self.var)
         elif isinstance(other, ForwardNode):
             # v = y - z; dv/dx1 = dy/dx1 - dz/dx1, dv/dx2 = dy/dx2 - dz/dx2, ...
-            return ForwardNode(self.value - other.value, self.trace - other.trace, self.var)
+            return ForwardNode._make(self.value - other.value, self.trace - other.trace, self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -173,12 +254,13 @@ class ForwardNode():
         ForwardNode(12, [4, 3], ['x1', 'x2'])
 
         '''
-        if isinstance(other, (int, float)):
+        if isinstance(other, SCALAR_TYPES):
             # v = y * c; dv/dx1 = dy/dx1 * c, dv/dx2 = dy/dx2 * c, ...
-            return ForwardNode(self.value * other, self.trace * other, self.var)
+            return ForwardNode._make(self.value * other, self.trace * other, self.var)
         elif isinstance(other, ForwardNode):
             # v = y * z; dv/dx1 = dy/dx1 * z + y * dz/dx1, dv/dx2 = dy/dx2 * z + y * dz/dx2, ...
-            return ForwardNode(self.value * other.value, self.trace * other.value + self.value * other.trace, self.var)
+            return ForwardNode._make(self.value * other.value,
+                                     _chain(self.trace, other.value) + _chain(other.trace, self.value), self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -228,13 +310,14 @@ class ForwardNode():
         ForwardNode(3, [0.25, -0.75], ['x1', 'x2'])
 
         '''
-        if isinstance(other, (int, float)):
+        if isinstance(other, SCALAR_TYPES):
             # v = y / c; dv/dx1 = dy/dx1 / c, dv/dx2 = dy/dx2 / c, ...
-            return ForwardNode(self.value / other, self.trace / other, self.var)
+            return ForwardNode._make(self.value / other, self.trace / other, self.var)
         elif isinstance(other, ForwardNode):
             # v = y / z; dv/dx1 = (z * dy/dx1 - y * dz/dx1) / (z**2), dv/dx2 = (z * dy/dx2 - y * dz/dx2) / (z**2), ...
-            return ForwardNode(self.value / other.value,
-                               (other.value * self.trace - self.value * other.trace) / (other.value ** 2), self.var)
+            return ForwardNode._make(self.value / other.value,
+                                     _chain(self.trace, 1 / other.value) - _chain(other.trace, self.value / other.value ** 2),
+                                     self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -261,9 +344,9 @@ class ForwardNode():
 
         '''
         if isinstance(self, ForwardNode):
-            if not isinstance(other, (int,float)):
+            if not isinstance(other, SCALAR_TYPES):
                 raise AttributeError("Invalid Input!")
-            return ForwardNode(other / self.value, self.trace * (-1 * other) / (self.value ** 2), self.var)
+            return ForwardNode._make(other / self.value, _chain(self.trace, -1 * other / self.value ** 2), self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -289,17 +372,17 @@ class ForwardNode():
         ForwardNode(16, [8, 22.18070978], ['x1', 'x2'])
 
         '''
-        if isinstance(other, (int, float)):
-            if (self.value < 0) and abs(other) < 1:
+        if isinstance(other, SCALAR_TYPES):
+            if np.any(self.value < 0) and abs(other) < 1:
                 raise ValueError("Derivatives of variables with negative values to a power between -1 and 1 are not supported!")
             # v = y ** c; dv/dx1 = c * (y ** (c-1)) * dy/dx1, dv/dx2 = c * (y ** (c-1)) * dy/dx2, ...
-            new_trace = other * (self.value ** (other - 1)) * self.trace
-            return ForwardNode(self.value ** other, new_trace, self.var)
+            new_trace = _chain(self.trace, other * self.value ** (other - 1))
+            return ForwardNode._make(self.value ** other, new_trace, self.var)
         elif isinstance(other, ForwardNode):
             # v = y ** z; dv/dx1 = z * (y ** (z-1)) * dy/dx1 + (y ** z) * log(y) * dz/dx1, ...
-            new_trace = other.value * (self.value ** (other.value - 1)) * self.trace + (
-                        self.value ** other.value) * np.log(self.value) * other.trace
-            return ForwardNode(self.value ** other.value, new_trace, self.var)
+            new_trace = _chain(self.trace, other.value * self.value ** (other.value - 1)) + _chain(
+                        other.trace, self.value ** other.value * np.log(self.value))
+            return ForwardNode._make(self.value ** other.value, new_trace, self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -326,12 +409,12 @@ class ForwardNode():
 
         '''
         if isinstance(self, ForwardNode):
-            if not isinstance(other, (int,float)):
+            if not isinstance(other, SCALAR_TYPES):
                 raise AttributeError("Invalid Input!")
-            if (self.value < 0) and abs(other) < 1:
+            if np.any(self.value < 0) and abs(other) < 1:
                 raise ValueError("Derivatives of negative values to a power variable between -1 and 1 are not supported!")
-            new_trace = (other ** self.value) * np.log(other) * self.trace
-            return ForwardNode(other ** self.value, new_trace, self.var)
+            new_trace = _chain(self.trace, other ** self.value * float(np.log(other)))
+            return ForwardNode._make(other ** self.value, new_trace, self.var)
         else:
             raise AttributeError("Invalid Input!")
 
@@ -350,7 +433,7 @@ class ForwardNode():
         >>> -x
         ForwardNode(-3, trace=-1, var=['x'])
         '''
-        return ForwardNode(-1 * self.value, -1 * self.trace, self.var)
+        return ForwardNode._make(-1 * self.value, -1 * self.trace, self.var)
 
     def __lt__(self, other):
         '''
@@ -374,7 +457,7 @@ class ForwardNode():
         True
 
         '''
-        if isinstance(other, (int, float)):
+        if isinstance(other, SCALAR_TYPES):
             return self.value < other
         elif isinstance(other, ForwardNode):
             return self.value < other.value
@@ -403,7 +486,7 @@ class ForwardNode():
         False
 
         '''
-        if isinstance(other, (int, float)):
+        if isinstance(other, SCALAR_TYPES):
             return self.value > other
         elif isinstance(other, ForwardNode):
             return other.__lt__(self)
@@ -438,12 +521,12 @@ class ForwardNode():
         #    elif isinstance(other, ForwardNode):
         #        return self <= other.value
         if isinstance(self, ForwardNode):
-            if isinstance(other, (int, float)):
+            if isinstance(other, SCALAR_TYPES):
                 return self.value <= other
             elif isinstance(other, ForwardNode):
                 return self.value <= other.value
         elif isinstance(other, ForwardNode):
-            if isinstance(self, (int, float)):
+            if isinstance(self, SCALAR_TYPES):
                 return self <= other.value
         raise AttributeError("Invalid Input!")
 
@@ -493,13 +576,13 @@ class ForwardNode():
         True
 
         '''
-        if isinstance(self, (int, float)):
-            if isinstance(other, (int, float)):
+        if isinstance(self, SCALAR_TYPES):
+            if isinstance(other, SCALAR_TYPES):
                 return self == other
             elif isinstance(other, ForwardNode):
                 return self == other.value
         elif isinstance(self, ForwardNode):
-            if isinstance(other, (int, float)):
+            if isinstance(other, SCALAR_TYPES):
                 return self.value == other
             elif isinstance(other, ForwardNode):
                 return self.value == other.value
@@ -0,0 +1,389 @@
+import functools
+import numpy as np
+from AutoDiff.dtypes import SCALAR_TYPES
+from AutoDiff.forwardNode import ForwardNode, _chain
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tensorNode import TensorNode, _unbroadcast
+
+
+def _primal(value):
+    '''
+    Get the plain value of a ReverseNode value, which is a ForwardNode dual number when
+    computing second derivatives
+    '''
+    return value.value if isinstance(value, ForwardNode) else value
+
+
+def domain(condition, message):
+    '''
+    Build a domain check for a Primitive
+
+    Input:
+    condition - function, mapping a plain input and the extra parameters to a boolean (array) that is True outside the domain
+    message - str, error message, formatted with the input and the extra parameters
+
+    Output:
+    A function raising ValueError when the condition holds for any entry of a plain input
+
+    Examples:
+    >>> check = domain(lambda a: a <= 0, "Invalid input: cannot take log of {0}")
+    >>> check(-1.0)
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid input: cannot take log of -1.0
+
+    '''
+    def check(a, *params):
+        outside = condition(a, *params)
+        # np.any is much slower than the truth value of a single boolean
+        if outside.any() if isinstance(outside, np.ndarray) else outside:
+            raise ValueError(message.format(a, *params))
+    return check
+
+
+# exact classes of the plain values, evaluated without dispatching
+_VALUE_CLASSES = frozenset([int, float, np.float64, np.float32, np.int64, np.ndarray])
+_PLAIN_TYPES = SCALAR_TYPES + (np.ndarray,)
+
+
+class Primitive():
+    def __init__(self, function, derivative, domain=None, derivative_domain=None):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a Primitive object
+        function - function, computing the value on a plain number or np.array, with any extra parameters after the input
+        derivative - function, mapping the input, the value and the extra parameters to the local derivative
+                     it is written with the functions of this package and arithmetic, so that it also holds for the
+                     ForwardNode dual numbers of second derivatives, and reuses the value instead of computing it again
+        domain - function, raising ValueError for plain inputs outside the domain, default to None
+        derivative_domain - function, raising ValueError for node inputs where the derivative does not exist,
+                            default to None, which uses domain
+
+        Output:
+        a Primitive object, declaring the value and derivative rules of an elementary function once,
+        and evaluated on every input type registered with evaluate()
+
+        Example:
+        >>> square = Primitive(lambda a: a ** 2, lambda a, value: 2 * a)
+        >>> square(ForwardNode(3.0, 1.0, "x"))
+        ForwardNode Variable: ['x'],  Value: 9.0, Trace: [6.]
+
+        '''
+        functools.update_wrapper(self, function)
+        self.function = function
+        self.derivative = derivative
+        self.domain = domain
+        self.derivative_domain = derivative_domain if derivative_domain is not None else domain
+
+    def __call__(self, node, *params):
+        if node.__class__ in _VALUE_CLASSES:
+            # plain values are the most frequent inputs, since the derivative rules evaluate primitives on them
+            if self.domain is not None:
+                self.domain(node, *params)
+            return self.function(node, *params)
+        # look up the implementation directly, skipping the argument handling of the singledispatch wrapper
+        return evaluate.dispatch(node.__class__)(node, self, params)
+
+    def check(self, a, params, derivative=False):
+        '''
+        Check that a plain input is in the domain of the primitive, or of its derivative
+        '''
+        check = self.derivative_domain if derivative else self.domain
+        if check is not None:
+            check(a, *params)
+
+    def rule(self, params):
+        '''
+        Get the ReverseNode rule of the primitive, mapping an input value to the value and the local partial
+        The value is computed by the primitive itself, so that the rule also holds for ForwardNode dual numbers
+        '''
+        def rule(a):
+            value = self(a, *params)
+            return value, (self.derivative(a, value, *params),)
+        return rule
+
+    def __reduce__(self):
+        # pickle by reference, like a module level function
+        return self.__qualname__
+
+    def __repr__(self):
+        return f'Primitive {self.__name__}'
+
+
+@functools.singledispatch
+def evaluate(node, primitive, params):
+    '''
+    Evaluate a primitive, dispatched on the type of the input
+    Other node types are supported by registering an implementation with @evaluate.register(cls)
+
+    Input:
+    node - int/float/np.array/ForwardNode/ReverseNode/TensorNode, the input of the primitive
+    primitive - Primitive, the primitive to evaluate
+    params - tuple, the extra parameters of the primitive
+
+    Output:
+    The value of the primitive, of the same type as the input
+
+    Examples:
+    >>> evaluate(ForwardNode(0.0, 1.0, "x"), sin, ())
+    ForwardNode Variable: ['x'],  Value: 0.0, Trace: [1.]
+
+    '''
+    raise AttributeError("Invalid Input!")
+
+
+def _evaluate_value(node, primitive, params):
+    primitive.check(node, params)
+    return primitive.function(node, *params)
+
+
+for _cls in _PLAIN_TYPES:
+    evaluate.register(_cls, _evaluate_value)
+
+
+@evaluate.register(ForwardNode)
+def _evaluate_forward(node, primitive, params):
+    primitive.check(node.value, params, derivative=True)
+    value = primitive.function(node.value, *params)
+    der = primitive.derivative(node.value, value, *params)
+    return ForwardNode._make(value, _chain(node.trace, der), node.var)
+
+
+@evaluate.register(ReverseNode)
+def _evaluate_reverse(node, primitive, params):
+    primitive.check(_primal(node.value), params, derivative=True)
+    value = primitive(node.value, *params)
+    new = ReverseNode._result(value, (node, primitive.derivative(node.value, value, *params)))
+    return new._record(primitive.rule(params), node) if new._records() else new
+
+
+@evaluate.register(TensorNode)
+def _evaluate_tensor(node, primitive, params):
+    primitive.check(node.value, params, derivative=True)
+    value = primitive.function(node.value, *params)
+    return node._elementwise(value, primitive.derivative(node.value, value, *params))
+
+
+def elementary(derivative, domain=None, derivative_domain=None):
+    '''
+    Declare a function on plain values as a Primitive with the given rules, see Primitive
+
+    Examples:
+    >>> @elementary(derivative=lambda a, value: 2 * a)
+    ... def square(a):
+    ...     return a ** 2
+    >>> square(3)
+    9
+
+    '''
+    def decorate(function):
+        return Primitive(function, derivative, domain, derivative_domain)
+    return decorate
+
+
+def _plain(arg):
+    '''
+    Get the plain value of an input of a user primitive, constants are their own value
+    '''
+    return arg.value if isinstance(arg, (ForwardNode, ReverseNode, TensorNode)) else arg
+
+
+class CustomPrimitive(Primitive):
+    def __init__(self, function, derivative=None, jvp=None, vjp=None, domain=None):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a CustomPrimitive object
+        function - function, computing the value from plain numbers or np.arrays, one positional argument per input
+        derivative - function, mapping the inputs and the value to the local partial derivatives, one per input
+                     (a single partial for a function of one input), default to None
+        jvp - function, mapping the inputs, the value and the tangents of the inputs to the tangent of the value,
+              default to None
+        vjp - function, mapping the inputs, the value and the adjoint of the value to the adjoint contributions
+              of the inputs, one per input, default to None
+        domain - function, raising ValueError for plain inputs outside the domain, default to None
+
+        Output:
+        a CustomPrimitive object, evaluated as a single operation on ForwardNode, ReverseNode and TensorNode inputs
+        At least one of derivative, jvp and vjp is needed, the missing rules are derived from the given ones:
+        forward mode uses jvp, then derivative; reverse mode uses derivative, then vjp or jvp on unit seeds,
+        which assumes a scalar or elementwise function; TensorNode inputs use vjp, then the partials
+
+        Example:
+        >>> hypot = CustomPrimitive(np.hypot, derivative=lambda x, y, value: (x / value, y / value))
+        >>> hypot(ForwardNode(3.0, 1.0, "x"), 4.0)
+        ForwardNode Variable: ['x'],  Value: 5.0, Trace: [0.6]
+
+        '''
+        if derivative is None and jvp is None and vjp is None:
+            raise ValueError("Invalid primitive: please give a derivative, jvp or vjp rule")
+        super().__init__(function, derivative, domain)
+        self.jvp = jvp
+        self.vjp = vjp
+
+    def __call__(self, *args):
+        for arg in args:
+            if arg.__class__ not in _VALUE_CLASSES and not isinstance(arg, _PLAIN_TYPES):
+                return evaluate_fused.dispatch(arg.__class__)(arg, self, args)
+        if self.domain is not None:
+            self.domain(*args)
+        return self.function(*args)
+
+    @staticmethod
+    def per_input(result, values):
+        '''
+        Get the partials or adjoint contributions of a rule as a tuple with one entry per input
+        '''
+        return tuple(result) if len(values) > 1 else (result,)
+
+    def partials(self, values, value):
+        '''
+        Get the local partial derivatives of the value with respect to every input
+        '''
+        if self.derivative is not None:
+            return self.per_input(self.derivative(*values, value), values)
+        if self.vjp is not None:
+            return self.per_input(self.vjp(*values, value, 1.0), values)
+        return tuple([self.jvp(*values, value, *[1.0 if i == k else 0.0 for i in range(len(values))])
+                      for k in range(len(values))])
+
+    def rule(self, args, positions):
+        '''
+        Get the ReverseNode rule of the primitive, mapping the values of the node inputs at the given positions
+        to the value and their local partials, the other inputs are kept as constants
+        '''
+        def rule(*operands):
+            values = list(args)
+            for i, operand in zip(positions, operands):
+                values[i] = operand
+            value = self(*values)
+            partials = self.partials(values, value)
+            return value, tuple([partials[i] for i in positions])
+        return rule
+
+
+@functools.singledispatch
+def evaluate_fused(node, primitive, args):
+    '''
+    Evaluate a user primitive as a single operation, dispatched on the type of its first node input
+    Other node types are supported by registering an implementation with @evaluate_fused.register(cls)
+
+    Input:
+    node - ForwardNode/ReverseNode/TensorNode, the first node input of the primitive
+    primitive - CustomPrimitive, the primitive to evaluate
+    args - tuple, all inputs of the primitive, nodes of the type of node or constants
+
+    Output:
+    The value of the primitive, of the same type as node
+
+    '''
+    raise AttributeError("Invalid Input!")
+
+
+def _node_positions(args, cls):
+    '''
+    Get the positions of the node inputs of a user primitive, which must all be of the given node class
+    '''
+    positions = []
+    for i, arg in enumerate(args):
+        if isinstance(arg, cls):
+            positions.append(i)
+        elif not isinstance(arg, _PLAIN_TYPES):
+            raise AttributeError("Invalid Input!")
+    return positions
+
+
+@evaluate_fused.register(ForwardNode)
+def _fused_forward(node, primitive, args):
+    positions = _node_positions(args, ForwardNode)
+    values = [_plain(arg) for arg in args]
+    if primitive.domain is not None:
+        primitive.domain(*values)
+    value = primitive.function(*values)
+    if primitive.jvp is not None:
+        trace = primitive.jvp(*values, value, *[arg.trace if isinstance(arg, ForwardNode) else 0.0 for arg in args])
+    else:
+        partials = primitive.partials(values, value)
+        trace = _chain(node.trace, partials[positions[0]])
+        for i in positions[1:]:
+            trace = trace + _chain(args[i].trace, partials[i])
+    return ForwardNode._make(value, trace, node.var)
+
+
+@evaluate_fused.register(ReverseNode)
+def _fused_reverse(node, primitive, args):
+    positions = _node_positions(args, ReverseNode)
+    if primitive.domain is not None:
+        primitive.domain(*[_primal(_plain(arg)) for arg in args])
+    values = [arg.value if isinstance(arg, ReverseNode) else arg for arg in args]
+    value = primitive(*values)
+    partials = primitive.partials(values, value)
+    new = ReverseNode._result(value, *[(args[i], partials[i]) for i in positions])
+    return new._record(primitive.rule(args, positions), *[args[i] for i in positions]) if new._records() else new
+
+
+@evaluate_fused.register(TensorNode)
+def _fused_tensor(node, primitive, args):
+    positions = _node_positions(args, TensorNode)
+    values = [_plain(arg) for arg in args]
+    if primitive.domain is not None:
+        primitive.domain(*values)
+    value = primitive.function(*values)
+    new = TensorNode(value)
+    if primitive.vjp is not None:
+        # the vjp gives the contributions of all inputs at once, so it is computed once per adjoint
+        cache = {}
+
+        def contribution(i):
+            def vjp(grad):
+                if cache.get('grad') is not grad:
+                    cache['grad'], cache['result'] = grad, primitive.per_input(primitive.vjp(*values, value, grad), values)
+                return _unbroadcast(cache['result'][i], args[i].shape)
+            return vjp
+    else:
+        partials = primitive.partials(values, value)
+
+        def contribution(i):
+            return lambda grad: _unbroadcast(grad * partials[i], args[i].shape)
+    for i in positions:
+        args[i]._link(contribution(i), new)
+    return new
+
+
+def primitive(derivative=None, jvp=None, vjp=None, domain=None):
+    '''
+    Declare a function on plain values as a user primitive with its own derivative rules, evaluated as a single
+    operation on ForwardNode, ReverseNode and TensorNode inputs and callable by name in string functions
+    The rules are written for plain values, see CustomPrimitive; for hessian() they must also hold for ForwardNode
+    dual numbers, which is the case when they only use arithmetic and the functions of this package
+
+    Input:
+    derivative - function, mapping the inputs and the value to the local partial derivatives, one per input
+    jvp - function, mapping the inputs, the value and the tangents of the inputs to the tangent of the value
+    vjp - function, mapping the inputs, the value and the adjoint of the value to the adjoint of every input
+    domain - function, raising ValueError for plain inputs outside the domain, see domain()
+
+    Output:
+    A decorator returning the CustomPrimitive of a function
+
+    Examples:
+    >>> @primitive(derivative=lambda x, y, value: (y * value / x, value * log(x)))
+    ... def power(x, y):
+    ...     return x ** y
+    >>> auto_diff("power(x1, 2) + x1", {"x1": 3.0})
+    array([[7.]])
+
+    '''
+    def decorate(function):
+        # string functions are evaluated in the namespace of the expression module, which imports this one
+        from AutoDiff.expression import _NAMESPACE
+        existing = _NAMESPACE.get(function.__name__)
+        if existing is not None and not isinstance(existing, CustomPrimitive):
+            raise ValueError(f"Invalid primitive: the name {function.__name__} is already used in string functions")
+        custom = CustomPrimitive(function, derivative, jvp, vjp, domain)
+        _NAMESPACE[function.__name__] = custom
+        return custom
+    return decorate
@@ -0,0 +1,270 @@
+import sys
+import time
+import contextlib
+from AutoDiff import utils
+from AutoDiff import expression as _expression
+from AutoDiff import reverseNode as _reverseNode
+from AutoDiff import tensorNode as _tensorNode
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tensorNode import TensorNode
+from AutoDiff.tape import Tape
+from AutoDiff.primitive import CustomPrimitive
+
+# arithmetic methods of the node classes that are counted as primitives
+_DUNDERS = ['__add__', '__radd__', '__sub__', '__rsub__', '__mul__', '__rmul__', '__truediv__', '__rtruediv__',
+            '__pow__', '__rpow__', '__neg__', '__matmul__', '__rmatmul__', 'dot', 'sum']
+_NODE_CLASSES = [ForwardNode, ReverseNode, TensorNode]
+
+# the Profile object that is currently recording, only one can be active at a time
+_active = None
+
+
+class Profile():
+    def __init__(self):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a Profile object
+
+        Output:
+        a Profile object, holding the counters filled in by profile()
+        calls - dict, number of calls of every primitive, such as "sin" or "ReverseNode.__mul__"
+        times - dict, wall time in seconds spent in every primitive, including the operations it calls
+        nodes - int, number of ForwardNode, ReverseNode and TensorNode objects allocated
+        edges - int, number of edges recorded for reverse mode
+        peak_live_nodes - int, largest number of nodes allocated in the block that were alive at the same time
+        forward_time - float, wall time in seconds spent in primitives
+        backward_time - float, wall time in seconds spent in reverse sweeps
+
+        '''
+        self.calls = {}
+        self.times = {}
+        self.nodes = 0
+        self.edges = 0
+        self.peak_live_nodes = 0
+        self.forward_time = 0.0
+        self.backward_time = 0.0
+        self._live = set()
+        self._depth = 0
+
+    def as_dict(self):
+        '''
+        Export the counters as a dictionary
+
+        Input:
+        self - a Profile object
+
+        Output:
+        A dictionary with the calls and time of every primitive, and the node, edge and timing totals
+
+        '''
+        return {'primitives': {name: {'calls': self.calls[name], 'time': self.times[name]} for name in self.calls},
+                'nodes': self.nodes, 'edges': self.edges, 'peak_live_nodes': self.peak_live_nodes,
+                'forward_time': self.forward_time, 'backward_time': self.backward_time}
+
+    def table(self, sort='time'):
+        '''
+        Format the counters as a table in the style of pstats
+
+        Input:
+        self - a Profile object
+        sort - str, "time" or "calls", the column to sort the primitives by
+
+        Output:
+        str, one row per primitive with its number of calls, total time and time per call
+
+        Examples:
+        >>> with profile() as p:
+        ...     x = ReverseNode(2.0)
+        ...     y = sin(x) * x
+        >>> print(p.table())
+        3 nodes, 3 edges, peak 3 live nodes, forward 0.000012 s, backward 0.000000 s
+        <BLANKLINE>
+           ncalls    tottime    percall  primitive
+                1   0.000008   0.000008  sin
+                1   0.000004   0.000004  ReverseNode.__mul__
+
+        '''
+        if sort not in ('time', 'calls'):
+            raise ValueError("Invalid sort: please choose between time and calls")
+        key = self.times if sort == 'time' else self.calls
+        lines = [f'{self.nodes} nodes, {self.edges} edges, peak {self.peak_live_nodes} live nodes, '
+                 f'forward {self.forward_time:.6f} s, backward {self.backward_time:.6f} s', '',
+                 f'{"ncalls":>9} {"tottime":>10} {"percall":>10}  primitive']
+        for name in sorted(self.calls, key=lambda name: key[name], reverse=True):
+            calls, total = self.calls[name], self.times[name]
+            lines.append(f'{calls:>9} {total:>10.6f} {total / calls:>10.6f}  {name}')
+        return '\n'.join(lines)
+
+    def print_stats(self, sort='time'):
+        print(self.table(sort))
+
+    def __repr__(self):
+        return (f'Profile Primitives: {sum(self.calls.values())}, Nodes: {self.nodes}, Edges: {self.edges}, '
+                f'Peak live nodes: {self.peak_live_nodes}')
+
+
+def _primitive(name, function):
+    '''
+    Wrap a primitive to count its calls and time, only the outermost primitive of nested calls is recorded
+    '''
+    def wrapper(*args, **kwargs):
+        p = _active
+        if p._depth:
+            return function(*args, **kwargs)
+        p._depth += 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            p._depth -= 1
+            p.calls[name] = p.calls.get(name, 0) + 1
+            p.times[name] = p.times.get(name, 0.0) + elapsed
+            p.forward_time += elapsed
+    return wrapper
+
+
+def _sweep(function):
+    '''
+    Wrap a reverse sweep to time it, operations inside the sweep are not counted as primitives
+    '''
+    def wrapper(*args, **kwargs):
+        p = _active
+        if p._depth:
+            return function(*args, **kwargs)
+        p._depth += 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            p._depth -= 1
+            p.backward_time += time.perf_counter() - start
+    return wrapper
+
+
+def _allocation(function):
+    '''
+    Wrap a node constructor to count allocated and live nodes
+    '''
+    def wrapper(self, *args, **kwargs):
+        function(self, *args, **kwargs)
+        p = _active
+        p.nodes += 1
+        p._live.add(id(self))
+        p.peak_live_nodes = max(p.peak_live_nodes, len(p._live))
+    return wrapper
+
+
+def _make(cls, value, trace, var):
+    node = _original_make(cls, value, trace, var)
+    p = _active
+    p.nodes += 1
+    p._live.add(id(node))
+    p.peak_live_nodes = max(p.peak_live_nodes, len(p._live))
+    return node
+
+
+def _link(function):
+    '''
+    Wrap _link to count recorded edges
+    '''
+    def wrapper(self, der, new):
+        _active.edges += 1
+        return function(self, der, new)
+    return wrapper
+
+
+def _release(self):
+    p = _active
+    if p is not None:
+        p._live.discard(id(self))
+
+
+_original_make = ForwardNode.__dict__['_make'].__func__
+
+
+def _swap_references(replacements):
+    '''
+    Replace every module level reference to the given functions, including names imported with from ... import *,
+    so that user code calling a function by any name reaches its replacement
+
+    Input:
+    replacements - dict, original function and replacement pairs
+
+    Output:
+    A list of (namespace, name, original) triples for restoring the references
+
+    '''
+    swapped = []
+    # compare by identity, since some callables found in modules are not hashable
+    replacements = {id(original): replacement for original, replacement in replacements.items()}
+    namespaces = [getattr(module, '__dict__', None) for module in list(sys.modules.values())]
+    for namespace in [ns for ns in namespaces if isinstance(ns, dict)] + [_expression._NAMESPACE]:
+        for name, value in list(namespace.items()):
+            if id(value) in replacements:
+                namespace[name] = replacements[id(value)]
+                swapped.append((namespace, name, value))
+    return swapped
+
+
+@contextlib.contextmanager
+def profile():
+    '''
+    Count the primitives, nodes and edges of the automatic differentiation run inside the block, and time the
+    forward operations and the reverse sweeps
+    The counting wrappers are only installed while the block runs, so there is no overhead outside of it
+
+    Output:
+    A Profile object, filled in when the block exits
+
+    Examples:
+    >>> with profile() as p:
+    ...     auto_diff("x1 * x2 + sin(x1)", {"x1": 1, "x2": 2}, mode="reverse")
+    >>> p.calls
+    {'ReverseNode.__mul__': 1, 'sin': 1, 'ReverseNode.__add__': 1}
+
+    '''
+    global _active
+    if _active is not None:
+        raise RuntimeError("Invalid use: profile() blocks cannot be nested")
+    p = Profile()
+    restore = []
+
+    def patch(owner, name, replacement):
+        restore.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, replacement)
+
+    _active = p
+    try:
+        replacements = {getattr(utils, name): _primitive(name, getattr(utils, name)) for name in utils.__all__}
+        replacements.update({function: _primitive(name, function) for name, function in _expression._NAMESPACE.items()
+                             if isinstance(function, CustomPrimitive)})
+        replacements[_reverseNode.reverse_jacobian] = _sweep(_reverseNode.reverse_jacobian)
+        replacements[_tensorNode.tensor_gradient] = _sweep(_tensorNode.tensor_gradient)
+        restore.extend(_swap_references(replacements))
+        for cls in _NODE_CLASSES:
+            for name in _DUNDERS:
+                if name in cls.__dict__:
+                    patch(cls, name, _primitive(f'{cls.__name__}.{name}', cls.__dict__[name]))
+            patch(cls, '__init__', _allocation(cls.__dict__['__init__']))
+            cls.__del__ = _release
+        patch(ForwardNode, '_make', classmethod(_make))
+        for cls in [ReverseNode, TensorNode]:
+            patch(cls, '_link', _link(cls.__dict__['_link']))
+            patch(cls, 'gradient', _sweep(cls.__dict__['gradient']))
+        patch(Tape, 'adjoints', _sweep(Tape.__dict__['adjoints']))
+        yield p
+    finally:
+        for owner, name, original in reversed(restore):
+            if isinstance(owner, dict):
+                owner[name] = original
+            else:
+                setattr(owner, name, original)
+        for cls in _NODE_CLASSES:
+            if '__del__' in cls.__dict__:
+                del cls.__del__
+        p._live = set()
+        _active = None
@@ -1,37 +1,227 @@
 import numpy as np
+from AutoDiff.dtypes import SCALAR_TYPES, resolve_dtype
+from AutoDiff.forwardNode import ForwardNode, _chain
+from AutoDiff.tape import _active_tapes
+
+
+def _log(value):
+    '''
+    Natural log of a node value, which is a ForwardNode dual number when computing second derivatives
+    '''
+    if isinstance(value, ForwardNode):
+        return ForwardNode._make(np.log(value.value), _chain(value.trace, 1 / value.value), value.var)
+    return np.log(value)
+
+
+def _topological_order(roots):
+    '''
+    Order all nodes reachable from the roots so that every node comes after its children
+
+    Input:
+    roots - list, ReverseNode objects to start the traversal from
+
+    Output:
+    A list of ReverseNode objects in which each node appears exactly once, after all of its children
+
+    Examples:
+    >>> x = ReverseNode(3)
+    >>> y = x * 2
+    >>> [node.value for node in _topological_order([x])]
+    [6, 3]
+
+    '''
+    order = []
+    visited = set()
+    for root in roots:
+        if id(root) in visited:
+            continue
+        visited.add(id(root))
+        # iterative depth-first search, so deep graphs do not hit the recursion limit
+        stack = [(root, iter(root.children))]
+        while stack:
+            node, children = stack[-1]
+            for _, child in children:
+                if id(child) not in visited:
+                    visited.add(id(child))
+                    stack.append((child, iter(child.children)))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    return order
+
+
+# rules of the operations, mapping the operand values to the result value and the local partials,
+# recorded on tapes that replay operations and also used to compute the operations that need a domain check
+def _add_rule(a, b):
+    return a + b, (1.0, 1.0)
+
+
+def _sub_rule(a, b):
+    return a - b, (1.0, -1.0)
+
+
+def _mul_rule(a, b):
+    return a * b, (b, a)
+
+
+def _div_rule(a, b):
+    return a / b, (1 / b, -a / b ** 2)
+
+
+def _pow_rule(a, other):
+    if (a < 0) and abs(other) < 1:
+        raise ValueError("Derivatives of variables with negative values to a power between -1 and 1 are not supported!")
+    return a ** other, (other * a ** (other - 1),)
+
+
+def _pow_node_rule(a, b):
+    return a ** b, (b * a ** (b - 1), _log(a) * a ** b)
+
+
+def _rpow_rule(a, other):
+    if (a < 0) and abs(other) < 1:
+        raise ValueError("Derivatives of negative values to a power variable between -1 and 1 are not supported!")
+    return other ** a, (float(np.log(other)) * other ** a,)
+
+
+def _neg_rule(a):
+    return -a, (-1.0,)
 
 
 class ReverseNode():
-    def __init__(self, value):
+    __slots__ = ('value', 'children', 'adjoint', 'tape', 'index')
+
+    def __init__(self, value, dtype=None):
         '''
         Constructor
         ===========
         Input:
         self - a ReverseNode variable
-        value - int/flot, specifying the value of the current variable
+        value - int/flot, specifying the value of the current variable, or a ForwardNode dual number
+                to carry tangents through the reverse sweep for second derivatives
+        dtype - str/type/np.dtype, floating point type to convert a number value to, such as np.float32,
+                default to None, which keeps the value as given
 
         Output:
         a ReverseNode object, containing the value and trace of this variable
+        When a Tape is active, the node is recorded on the tape instead of keeping a list of children
 
         Example:
         '''
-        if isinstance(value, (int, float)):
+        if dtype is not None and isinstance(value, SCALAR_TYPES):
+            value = resolve_dtype(dtype).type(value)
+        if isinstance(value, SCALAR_TYPES + (ForwardNode,)):
             self.value = value
 
-        self.children = []
         self.adjoint = 1.0
+        # the innermost active tape, looked up inline since a node is created for every operation
+        self.tape = _active_tapes[-1] if _active_tapes else None
+        if self.tape is None:
+            self.children = []
+            self.index = None
+        else:
+            self.children = ()
+            self.index = self.tape.add_node(value)
 
     def gradient(self):
-        if len(self.children) > 0:
-            self.adjoint = sum(der * child.gradient() for der, child in self.children)
+        '''
+        Compute the adjoint of the current variable with a single reverse sweep over the graph
+
+        Input:
+        self - a ReverseNode variable
+
+        Output:
+        The derivative of the output node(s) with respect to this variable
+
+        Examples:
+        >>> x = ReverseNode(3)
+        >>> y = x * x + x
+        >>> x.gradient()
+        7.0
+
+        '''
+        if self.tape is not None:
+            self.adjoint = self.tape.adjoints()[self.index]
+            return self.adjoint
+        # children are visited before their parents, so every adjoint is accumulated exactly once
+        for node in _topological_order([self]):
+            if len(node.children) > 0:
+                node.adjoint = sum(der * child.adjoint for der, child in node.children)
         return self.adjoint
 
     def gradient_reset(self, value=None):
-        if value:
+        if value is not None:
             self.value = value
-        self.children = []
+        if self.tape is None:
+            self.children = []
         self.adjoint = 1.0
 
+    @staticmethod
+    def _result(value, *links):
+        '''
+        Create the node of the result of an operation, and link it to its operands
+
+        Input:
+        value - int/float, value of the result
+        links - tuples (operand, partial), with each ReverseNode operand and the local partial derivative
+                of the result with respect to it
+
+        Output:
+        a ReverseNode object, result of the operation
+
+        Examples:
+        >>> x = ReverseNode(3)
+        >>> ReverseNode._result(9, (x, 6))
+        ReverseNode Variable Value: 9, Adjoint: 1.0, Chidren: []
+
+        '''
+        new = ReverseNode(value)
+        for x, der in links:
+            x._link(der, new)
+        return new
+
+    def _records(self):
+        '''
+        Check if the node is on a Tape recording operations, so that the rule of the operation that created it
+        is only built when the tape can be replayed
+        '''
+        return self.tape is not None and self.tape.record_ops
+
+    def _record(self, rule, *operands):
+        '''
+        Record the rule of the operation that created the node on its Tape, see _records
+
+        Input:
+        self - a ReverseNode variable, result of the operation
+        rule - function, mapping the operand values to the result value and a tuple with the local
+               partial derivative with respect to each operand
+        operands - ReverseNode variables, the operands of the operation
+
+        Output:
+        self, the result of the operation
+
+        '''
+        self.tape.add_op(self.index, rule, [x.index for x in operands])
+        return self
+
+    def _link(self, der, new):
+        '''
+        Record the local partial derivative d(new)/d(self) of an operation
+
+        Input:
+        self - a ReverseNode variable, operand of the operation
+        der - int/float, local partial derivative of the result with respect to self
+        new - a ReverseNode variable, result of the operation
+
+        '''
+        if self.tape is not new.tape:
+            raise ValueError("Invalid Input: ReverseNode objects recorded on different tapes cannot be combined!")
+        if self.tape is None:
+            self.children.append((der, new))
+        else:
+            self.tape.add_edge(self.index, new.index, der)
+
     def __add__(self, other):
         '''
         Dunder method to add another ReverseNode variable, scalar and vector
@@ -54,15 +244,12 @@ class ReverseNode():
         ReverseNode(7)
 
         '''
-        if isinstance(other, (int, float)):
-            new = ReverseNode(self.value + other)
-            self.children.append((1.0, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            new = ReverseNode._result(self.value + other, (self, 1.0))
+            return new._record(lambda a: (a + other, (1.0,)), self) if new._records() else new
         elif isinstance(other, ReverseNode):
-            new = ReverseNode(self.value + other.value)
-            self.children.append((1.0, new))
-            other.children.append((1.0, new))
-            return new
+            new = ReverseNode._result(self.value + other.value, (self, 1.0), (other, 1.0))
+            return new._record(_add_rule, self, other) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -112,15 +299,12 @@ class ReverseNode():
         ReverseNode(-1)
 
         '''
-        if isinstance(other, (int, float)):
-            new = ReverseNode(self.value - other)
-            self.children.append((1.0, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            new = ReverseNode._result(self.value - other, (self, 1.0))
+            return new._record(lambda a: (a - other, (1.0,)), self) if new._records() else new
         elif isinstance(other, ReverseNode):
-            new = ReverseNode(self.value - other.value)
-            self.children.append((1.0, new))
-            other.children.append((-1.0, new))
-            return new
+            new = ReverseNode._result(self.value - other.value, (self, 1.0), (other, -1.0))
+            return new._record(_sub_rule, self, other) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -146,10 +330,9 @@ class ReverseNode():
         ReverseNode(1)
 
         '''
-        if isinstance(other, (int, float)):
-            new = ReverseNode(other - self.value)
-            self.children.append((-1.0, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            new = ReverseNode._result(other - self.value, (self, -1.0))
+            return new._record(lambda a: (other - a, (-1.0,)), self) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -175,15 +358,12 @@ class ReverseNode():
         ReverseNode(12)
 
         '''
-        if isinstance(other, (int, float)):
-            new = ReverseNode(self.value * other)
-            self.children.append((other, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            new = ReverseNode._result(self.value * other, (self, other))
+            return new._record(lambda a: (a * other, (other,)), self) if new._records() else new
         elif isinstance(other, ReverseNode):
-            new = ReverseNode(self.value * other.value)
-            self.children.append((other.value, new))
-            other.children.append((self.value, new))
-            return new
+            new = ReverseNode._result(self.value * other.value, (self, other.value), (other, self.value))
+            return new._record(_mul_rule, self, other) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -233,15 +413,13 @@ class ReverseNode():
         ReverseNode(0.75)
 
         '''
-        if isinstance(other, (int, float)):
-            new = ReverseNode(self.value / other)
-            self.children.append((1 / other, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            new = ReverseNode._result(self.value / other, (self, 1 / other))
+            return new._record(lambda a: (a / other, (1 / other,)), self) if new._records() else new
         elif isinstance(other, ReverseNode):
-            new = ReverseNode(self.value / other.value)
-            self.children.append((1 / other.value, new))
-            other.children.append((-self.value / other.value ** 2, new))
-            return new
+            value, (der_a, der_b) = _div_rule(self.value, other.value)
+            new = ReverseNode._result(value, (self, der_a), (other, der_b))
+            return new._record(_div_rule, self, other) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -267,10 +445,9 @@ class ReverseNode():
         ReverseNode(0.5)
 
         '''
-        if isinstance(other, (int, float)):
-            new = ReverseNode(other / self.value)
-            self.children.append((-other / self.value ** 2, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            new = ReverseNode._result(other / self.value, (self, -other / self.value ** 2))
+            return new._record(lambda a: (other / a, (-other / a ** 2,)), self) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -296,17 +473,15 @@ class ReverseNode():
         ReverseNode(16)
 
         '''
-        if isinstance(other, (int, float)):
-            if (self.value < 0) and abs(other) < 1:
-                raise ValueError("Derivatives of variables with negative values to a power between -1 and 1 are not supported!")
-            new = ReverseNode(self.value ** other)
-            self.children.append((other * self.value ** (other - 1), new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            value, (der,) = _pow_rule(self.value, other)
+            new = ReverseNode._result(value, (self, der))
+            # the rule checks the domain, so that replaying a tape at new inputs checks again
+            return new._record(lambda a: _pow_rule(a, other), self) if new._records() else new
         elif isinstance(other, ReverseNode):
-            new = ReverseNode(self.value ** other.value)
-            self.children.append((other.value * (self.value) ** (other.value - 1), new))
-            other.children.append((np.log(self.value) * self.value ** other.value, new))
-            return new
+            value, (der_a, der_b) = _pow_node_rule(self.value, other.value)
+            new = ReverseNode._result(value, (self, der_a), (other, der_b))
+            return new._record(_pow_node_rule, self, other) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -332,12 +507,10 @@ class ReverseNode():
         ReverseNode(16)
 
         '''
-        if isinstance(other, (int, float)):
-            if (self.value < 0) and abs(other) < 1:
-                raise ValueError("Derivatives of negative values to a power variable between -1 and 1 are not supported!")
-            new = ReverseNode(other ** self.value)
-            self.children.append((np.log(other) * other ** self.value, new))
-            return new
+        if isinstance(other, SCALAR_TYPES):
+            value, (der,) = _rpow_rule(self.value, other)
+            new = ReverseNode._result(value, (self, der))
+            return new._record(lambda a: _rpow_rule(a, other), self) if new._records() else new
         else:
             raise AttributeError("Invalid Input!")
 
@@ -356,10 +529,18 @@ class ReverseNode():
         >>> -x
         ReverseNode(-3)
         '''
-        new = ReverseNode(-self.value)
-        self.children.append((-1.0, new))
-        return new
+        new = ReverseNode._result(-self.value, (self, -1.0))
+        return new._record(_neg_rule, self) if new._records() else new
     
+    def _flag_comparison(self, other):
+        '''
+        Count a comparison on the tape of the compared nodes, since control flow that depends on it
+        can not be replayed at new inputs
+        '''
+        for node in (self, other):
+            if isinstance(node, ReverseNode) and node.tape is not None:
+                node.tape.comparisons += 1
+
     def __lt__(self, other):
         '''
         Dunder method to compare if the value of a ReverseNode variable is less than another ReverseNode variable, scalar or vector
@@ -382,7 +563,8 @@ class ReverseNode():
         True
 
         '''
-        if isinstance(other, (int, float)):
+        self._flag_comparison(other)
+        if isinstance(other, SCALAR_TYPES):
             return self.value < other
         elif isinstance(other, ReverseNode):
             return self.value < other.value
@@ -411,7 +593,8 @@ class ReverseNode():
         False
 
         '''
-        if isinstance(other, (int, float)):
+        self._flag_comparison(other)
+        if isinstance(other, SCALAR_TYPES):
             return self.value > other
         elif isinstance(other, ReverseNode):
             return other.__lt__(self)
@@ -440,7 +623,8 @@ class ReverseNode():
         False
 
         '''
-        if isinstance(other, (int, float)):
+        self._flag_comparison(other)
+        if isinstance(other, SCALAR_TYPES):
             return self.value <= other
         elif isinstance(other, ReverseNode):
             return self.value <= other.value
@@ -469,7 +653,8 @@ class ReverseNode():
         False
 
         '''
-        if isinstance(other, (int, float)):
+        self._flag_comparison(other)
+        if isinstance(other, SCALAR_TYPES):
             return self.value >= other
         elif isinstance(other, ReverseNode):
             return self.value >= other.value
@@ -498,13 +683,14 @@ class ReverseNode():
         True
 
         '''
-        if isinstance(self, (int, float)):
-            if isinstance(other, (int, float)):
+        self._flag_comparison(other)
+        if isinstance(self, SCALAR_TYPES):
+            if isinstance(other, SCALAR_TYPES):
                 return self == other
             elif isinstance(other, ReverseNode):
                 return self == other.value
         elif isinstance(self, ReverseNode):
-            if isinstance(other, (int, float)):
+            if isinstance(other, SCALAR_TYPES):
                 return self.value == other
             elif isinstance(other, ReverseNode):
                 return self.value == other.value
@@ -570,3 +756,47 @@ class ReverseNode():
         '''
         return f'ReverseNode Variable Value: {self.value}, Adjoint: {self.adjoint}, Chidren: {self.children}'
 
+
+
+def reverse_jacobian(outputs, inputs, dtype=None):
+    '''
+    Calculate the derivatives of several outputs sharing one graph, with one reverse sweep per output
+
+    Input:
+    outputs - list, ReverseNode objects (or constants) for the function outputs
+    inputs - list, ReverseNode objects for the input variables
+    dtype - str/type/np.dtype, floating point type of the jacobian, default to None, which uses the default dtype
+
+    Output:
+    np.ndarray of shape (len(outputs), len(inputs)), the jacobian of the outputs with respect to the inputs
+
+    Examples:
+    >>> x1 = ReverseNode(2)
+    >>> x2 = ReverseNode(3)
+    >>> reverse_jacobian([x1 * x2, x1 + 1], [x1, x2])
+    array([[3., 2.],
+           [1., 0.]])
+
+    '''
+    jcb = np.zeros((len(outputs), len(inputs)), dtype=resolve_dtype(dtype))
+    tapes = {id(node.tape) for node in inputs}
+    if len(tapes) > 1:
+        raise ValueError("Invalid Input: ReverseNode objects recorded on different tapes cannot be combined!")
+    tape = inputs[0].tape if inputs else None
+    order = None if tape is not None else _topological_order(inputs)
+
+    for i, y in enumerate(outputs):
+        # outputs that are not ReverseNode objects are constants with zero derivatives
+        if not isinstance(y, ReverseNode):
+            continue
+        if tape is not None:
+            adjoint = tape.adjoints({y.index: 1.0})
+            jcb[i] = [adjoint[x.index] for x in inputs]
+            continue
+        # seed only this output, so nodes of the other outputs sharing the graph contribute nothing
+        for node in order:
+            node.adjoint = 1.0 if node is y else 0.0
+            for der, child in node.children:
+                node.adjoint += der * child.adjoint
+        jcb[i] = [x.adjoint for x in inputs]
+    return jcb
@@ -0,0 +1,222 @@
+import numpy as np
+
+# a sparse trace is converted to a dense np.array once more than this fraction of its entries is nonzero
+SPARSE_FILL_THRESHOLD = 0.25
+
+
+def _sparse_or_dense(index, data, size):
+    '''
+    Build the result of a trace operation, switching to a dense array past the fill threshold
+
+    Input:
+    index - np.array, sorted indices of the nonzero entries
+    data - np.array, values of the nonzero entries
+    size - int, number of variables
+
+    Output:
+    A SparseTrace object, or a dense np.array if the trace is filled above SPARSE_FILL_THRESHOLD
+
+    '''
+    if len(index) > SPARSE_FILL_THRESHOLD * size:
+        trace = np.zeros(size, dtype=data.dtype)
+        trace[index] = data
+        return trace
+    return SparseTrace._make(index, data, size)
+
+
+def _merge(index1, data1, index2, data2):
+    '''
+    Add two sets of sorted (index, value) entries
+
+    Input:
+    index1, index2 - np.array, sorted indices of the nonzero entries
+    data1, data2 - np.array, values of the nonzero entries
+
+    Output:
+    A tuple of the sorted indices and the summed values of the union of the entries
+
+    Examples:
+    >>> _merge(np.array([0, 3]), np.array([1.0, 2.0]), np.array([3]), np.array([4.0]))
+    (array([0, 3]), array([1., 6.]))
+
+    '''
+    dtype = np.result_type(data1, data2)
+    if len(index1) == len(index2) and np.array_equal(index1, index2):
+        return index1, data1 + data2
+    if len(index1) + len(index2) <= 64:
+        # for a handful of entries a dictionary merge is much cheaper than NumPy set operations
+        merged = dict(zip(index1.tolist(), data1.tolist()))
+        for i, value in zip(index2.tolist(), data2.tolist()):
+            merged[i] = merged.get(i, 0) + value
+        index = sorted(merged)
+        return np.array(index, dtype=np.int64), np.array([merged[i] for i in index], dtype=dtype)
+    index = np.concatenate((index1, index2))
+    data = np.concatenate((data1, data2)).astype(dtype, copy=False)
+    order = np.argsort(index, kind='stable')
+    index, data = index[order], data[order]
+    starts = np.flatnonzero(np.concatenate(([True], index[1:] != index[:-1])))
+    return index[starts], np.add.reduceat(data, starts)
+
+
+class SparseTrace():
+    __slots__ = ('index', 'data', 'size')
+    # make NumPy defer to the reflected operators below instead of broadcasting over this object
+    __array_ufunc__ = None
+
+    def __init__(self, index, data, size):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a SparseTrace object
+        index - list/np.array, indices of the nonzero derivatives
+        data - list/np.array, values of the nonzero derivatives
+        size - int, number of variables
+
+        Output:
+        a SparseTrace object, storing only the nonzero entries of a ForwardNode trace
+
+        Example:
+        >>> SparseTrace([2], [1.0], 1000)
+        SparseTrace Size: 1000, Index: [2], Data: [1.]
+
+        '''
+        index = np.asarray(index, dtype=np.int64)
+        data = np.asarray(data, dtype=np.float64) if not isinstance(data, np.ndarray) else data
+        if index.ndim != 1 or data.shape != index.shape:
+            raise ValueError("Invalid Input: index and data must be 1-D arrays of the same length!")
+        if not isinstance(size, (int, np.integer)) or np.any(index < 0) or np.any(index >= size):
+            raise ValueError("Invalid Input: index out of range!")
+        order = np.argsort(index, kind='stable')
+        self.index = index[order]
+        self.data = data[order]
+        self.size = int(size)
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def shape(self):
+        return (self.size,)
+
+    @property
+    def nnz(self):
+        return len(self.index)
+
+    def toarray(self):
+        '''
+        Convert the trace into a dense array
+
+        Input:
+        self - a SparseTrace object
+
+        Output:
+        np.array of shape (size,)
+
+        Examples:
+        >>> SparseTrace([1], [2.0], 3).toarray()
+        array([0., 2., 0.])
+
+        '''
+        trace = np.zeros(self.size, dtype=self.data.dtype)
+        trace[self.index] = self.data
+        return trace
+
+    def __array__(self, dtype=None, copy=None):
+        trace = self.toarray()
+        return trace if dtype is None else trace.astype(dtype)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            key = key + self.size if key < 0 else key
+            pos = np.searchsorted(self.index, key)
+            if pos < len(self.index) and self.index[pos] == key:
+                return self.data[pos]
+            return self.data.dtype.type(0)
+        return self.toarray()[key]
+
+    def __add__(self, other):
+        '''
+        Add another trace, merging the nonzero entries of two sparse traces
+
+        Input:
+        self - a SparseTrace object
+        other - a SparseTrace object / a dense np.array trace
+
+        Output:
+        a SparseTrace object or a dense np.array, containing the sum of the traces
+
+        Examples:
+        >>> SparseTrace([0], [1.0], 10) + SparseTrace([3], [2.0], 10)
+        SparseTrace Size: 10, Index: [0 3], Data: [1. 2.]
+
+        '''
+        if isinstance(other, SparseTrace):
+            if other.size != self.size:
+                raise ValueError("Invalid Input: traces have different sizes!")
+            index, data = _merge(self.index, self.data, other.index, other.data)
+            return _sparse_or_dense(index, data, self.size)
+        elif isinstance(other, np.ndarray):
+            if other.shape[-1] != self.size:
+                raise ValueError("Invalid Input: traces have different sizes!")
+            trace = other.astype(np.result_type(self.data, other), copy=True)
+            trace[..., self.index] += self.data
+            return trace
+        return NotImplemented
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __neg__(self):
+        return SparseTrace._make(self.index, -self.data, self.size)
+
+    def __sub__(self, other):
+        if isinstance(other, (SparseTrace, np.ndarray)):
+            return self.__add__(-other)
+        return NotImplemented
+
+    def __rsub__(self, other):
+        return (-self).__add__(other)
+
+    def __mul__(self, other):
+        '''
+        Scale the trace by a scalar local derivative
+
+        Input:
+        self - a SparseTrace object
+        other - int/float, the local derivative
+
+        Output:
+        a SparseTrace object, with the same nonzero pattern
+
+        Examples:
+        >>> SparseTrace([3], [2.0], 10) * 1.5
+        SparseTrace Size: 10, Index: [3], Data: [3.]
+
+        '''
+        if np.ndim(other) == 0 and not isinstance(other, (SparseTrace, str)):
+            return SparseTrace._make(self.index, self.data * other, self.size)
+        return NotImplemented
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        if np.ndim(other) == 0 and not isinstance(other, (SparseTrace, str)):
+            return SparseTrace._make(self.index, self.data / other, self.size)
+        return NotImplemented
+
+    @classmethod
+    def _make(cls, index, data, size):
+        '''
+        Trusted constructor for results of operations, with index already sorted
+        '''
+        trace = object.__new__(cls)
+        trace.index = index
+        trace.data = data
+        trace.size = size
+        return trace
+
+    def __repr__(self):
+        return f'SparseTrace Size: {self.size}, Index: {self.index}, Data: {self.data}'
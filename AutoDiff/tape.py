@@ -0,0 +1,256 @@
+import contextlib
+import numpy as np
+from AutoDiff.dtypes import resolve_dtype
+
+# stack of the tapes that are currently recording, the innermost tape is the last one
+_active_tapes = []
+
+
+def active_tape():
+    '''
+    Get the tape that new ReverseNode objects should be recorded on
+
+    Output:
+    The innermost active Tape object, or None when no tape is recording
+
+    Examples:
+    >>> active_tape() is None
+    True
+    >>> with Tape() as tape:
+    ...     active_tape() is tape
+    True
+
+    '''
+    return _active_tapes[-1] if _active_tapes else None
+
+
+@contextlib.contextmanager
+def no_tape():
+    '''
+    Suspend the active tapes, so that the ReverseNode objects created inside the block keep their own lists of
+    children, for graphs that are swept node by node or whose values can not be stored on a tape
+
+    Examples:
+    >>> with Tape():
+    ...     with no_tape():
+    ...         ReverseNode(1.0).tape is None
+    True
+
+    '''
+    suspended = _active_tapes[:]
+    del _active_tapes[:]
+    try:
+        yield
+    finally:
+        _active_tapes[:] = suspended
+
+
+class Tape():
+    def __init__(self, capacity=1024, dtype=None, record_ops=False):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a Tape object
+        capacity - int, number of edges to preallocate, the arrays grow automatically when full
+        dtype - str/type/np.dtype, floating point type of the partials and adjoints, default to None,
+                which uses the default dtype
+        record_ops - bool, also record the value of every node and the rule of every operation, so that the
+                     tape can be replayed at new inputs, default to False, which only records the edges
+
+        Output:
+        a Tape object, recording every ReverseNode operation as (parent index, child index, local partial)
+        in contiguous NumPy arrays instead of per-node lists of children
+
+        Example:
+        >>> with Tape() as tape:
+        ...     x1 = ReverseNode(2)
+        ...     x2 = ReverseNode(3)
+        ...     y = x1 * x2 + sin(x1)
+        >>> tape.gradient(y, [x1, x2])
+        array([2.58385316, 2.        ])
+
+        '''
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("Invalid capacity: capacity must be a positive integer")
+        self.parents = np.empty(capacity, dtype=np.int64)
+        self.children = np.empty(capacity, dtype=np.int64)
+        self.partials = np.empty(capacity, dtype=resolve_dtype(dtype))
+        self.n_nodes = 0
+        self.n_edges = 0
+        # recorded value of every node, and (node index, rule, operand indices, first edge) of every operation,
+        # only filled in with record_ops since they take several times the memory of the edges
+        self.record_ops = record_ops
+        self.values = []
+        self.ops = []
+        # number of comparisons made on recorded nodes, a tape with comparisons can not be replayed safely
+        self.comparisons = 0
+
+    def __enter__(self):
+        _active_tapes.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_tapes.remove(self)
+        return False
+
+    def add_node(self, value=0.0):
+        '''
+        Reserve the index of a new node on the tape
+
+        Input:
+        self - a Tape object
+        value - int/float, the value of the new node
+
+        Output:
+        int, the index of the new node
+
+        '''
+        if self.record_ops:
+            self.values.append(value)
+        self.n_nodes += 1
+        return self.n_nodes - 1
+
+    def add_op(self, index, rule, operands):
+        '''
+        Record the operation that created a node, after its edges have been added
+
+        Input:
+        self - a Tape object
+        index - int, index of the result node
+        rule - function, mapping the operand values to the result value and the local partials
+        operands - list, indices of the operand nodes, in the order of the edges
+
+        '''
+        self.ops.append((index, rule, operands, self.n_edges - len(operands)))
+
+    def add_edge(self, parent, child, partial):
+        '''
+        Record the local partial derivative d(child)/d(parent) on the tape
+
+        Input:
+        self - a Tape object
+        parent - int, index of the operand node
+        child - int, index of the result node
+        partial - int/float, local partial derivative of the child with respect to the parent
+
+        '''
+        if self.n_edges == len(self.parents):
+            capacity = 2 * len(self.parents)
+            self.parents = np.resize(self.parents, capacity)
+            self.children = np.resize(self.children, capacity)
+            self.partials = np.resize(self.partials, capacity)
+        self.parents[self.n_edges] = parent
+        self.children[self.n_edges] = child
+        self.partials[self.n_edges] = partial
+        self.n_edges += 1
+
+    def adjoints(self, seeds=None):
+        '''
+        Compute the adjoints of every recorded node with a single reverse loop over the edges
+
+        Input:
+        self - a Tape object
+        seeds - dict, node index and seed adjoint pairs, default to None, which seeds every node
+                without recorded children with 1.0 like ReverseNode.gradient()
+
+        Output:
+        np.ndarray, the adjoint of every node on the tape, indexed by node index
+
+        Examples:
+        >>> with Tape() as tape:
+        ...     x = ReverseNode(3)
+        ...     y = x * x
+        >>> tape.adjoints()
+        array([6., 1.])
+
+        '''
+        n = self.n_edges
+        if seeds is None:
+            sinks = np.ones(self.n_nodes, dtype=bool)
+            sinks[self.parents[:n]] = False
+            adjoint = sinks.astype(self.partials.dtype).tolist()
+        else:
+            adjoint = [0.0] * self.n_nodes
+            for index, seed in seeds.items():
+                adjoint[index] += seed
+        parents = self.parents[:n].tolist()
+        children = self.children[:n].tolist()
+        partials = self.partials[:n].tolist()
+        # every node is created after its operands, so walking the edges backwards visits
+        # all edges leaving a node before the edges entering it
+        for e in range(n - 1, -1, -1):
+            adjoint[parents[e]] += partials[e] * adjoint[children[e]]
+        return np.array(adjoint, dtype=self.partials.dtype)
+
+    def replay(self, inputs):
+        '''
+        Re-evaluate the recorded operations at new input values without creating any ReverseNode objects,
+        updating the node values and local partials so that adjoints() gives the derivatives at the new point
+
+        Input:
+        self - a Tape object
+        inputs - dict, node index and new value pairs for the input nodes, other inputs keep their values
+
+        Output:
+        np.ndarray, the value of every node on the tape, indexed by node index
+
+        Examples:
+        >>> with Tape(record_ops=True) as tape:
+        ...     x = ReverseNode(3)
+        ...     y = x * x
+        >>> tape.replay({x.index: 5})
+        array([ 5, 25])
+        >>> tape.adjoints()
+        array([10.,  1.])
+
+        '''
+        if not self.record_ops:
+            raise ValueError("Invalid replay: operations are only recorded on a Tape(record_ops=True)")
+        if self.comparisons:
+            raise ValueError("Invalid replay: comparisons were recorded on this tape, so the operations "
+                             "may depend on the input values. Record the function again at the new inputs")
+        values = list(self.values)
+        for index, value in inputs.items():
+            values[index] = value
+        partials = self.partials[:self.n_edges].tolist()
+        # operations are recorded in the order they were executed, so operands are always up to date
+        for index, rule, operands, edge in self.ops:
+            values[index], ders = rule(*[values[i] for i in operands])
+            partials[edge:edge + len(ders)] = ders
+        self.partials[:self.n_edges] = partials
+        self.values = values
+        return np.array(values)
+
+    def gradient(self, output, inputs):
+        '''
+        Calculate the derivatives of one recorded output with respect to recorded inputs
+
+        Input:
+        self - a Tape object
+        output - ReverseNode, the output node recorded on this tape
+        inputs - list, ReverseNode objects recorded on this tape
+
+        Output:
+        np.ndarray, the derivative of the output with respect to each input
+
+        Examples:
+        >>> with Tape() as tape:
+        ...     x1 = ReverseNode(2)
+        ...     x2 = ReverseNode(3)
+        ...     y = x1 * x2
+        >>> tape.gradient(y, [x1, x2])
+        array([3., 2.])
+
+        '''
+        for node in [output] + list(inputs):
+            if getattr(node, 'tape', None) is not self:
+                raise ValueError("Invalid input: all nodes must be recorded on this tape")
+        adjoint = self.adjoints({output.index: 1.0})
+        return adjoint[[node.index for node in inputs]]
+
+    def __len__(self):
+        return self.n_edges
+
+    def __repr__(self):
+        return f'Tape Nodes: {self.n_nodes}, Edges: {self.n_edges}'
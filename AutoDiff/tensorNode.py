@@ -0,0 +1,436 @@
+import numpy as np
+from AutoDiff.dtypes import SCALAR_TYPES
+from AutoDiff.reverseNode import _topological_order
+
+
+def _unbroadcast(grad, shape):
+    '''
+    Sum a gradient over the axes that NumPy broadcasting added or stretched, so that it matches the operand shape
+
+    Input:
+    grad - np.ndarray, gradient with the shape of the operation result
+    shape - tuple, shape of the operand
+
+    Output:
+    np.ndarray of the given shape
+
+    Examples:
+    >>> _unbroadcast(np.ones((4, 3)), (3,))
+    array([4., 4., 4.])
+
+    '''
+    grad = np.asarray(grad)
+    if grad.shape == shape:
+        return grad
+    grad = grad.sum(axis=tuple(range(grad.ndim - len(shape))))
+    axes = tuple(i for i, n in enumerate(shape) if n == 1 and grad.shape[i] != 1)
+    if axes:
+        grad = grad.sum(axis=axes, keepdims=True)
+    return grad.reshape(shape)
+
+
+def _matmul_vjp(a, b):
+    '''
+    Build the vector-Jacobian products of a @ b with respect to a and b
+
+    Input:
+    a, b - np.ndarray, the operands of the matrix product
+
+    Output:
+    A tuple of two functions, mapping the gradient of a @ b to the gradients of a and b
+
+    '''
+    # promote vectors to matrices the same way np.matmul does, so one rule covers every case
+    a2 = a[np.newaxis, :] if a.ndim == 1 else a
+    b2 = b[:, np.newaxis] if b.ndim == 1 else b
+    shape = np.broadcast_shapes(a2.shape[:-2], b2.shape[:-2]) + (a2.shape[-2], b2.shape[-1])
+
+    def vjp_a(grad):
+        grad = np.reshape(grad, shape)
+        return _unbroadcast(grad @ np.swapaxes(b2, -1, -2), a2.shape).reshape(a.shape)
+
+    def vjp_b(grad):
+        grad = np.reshape(grad, shape)
+        return _unbroadcast(np.swapaxes(a2, -1, -2) @ grad, b2.shape).reshape(b.shape)
+
+    return vjp_a, vjp_b
+
+
+class TensorNode():
+    __slots__ = ('value', 'children', 'adjoint')
+    # make NumPy defer to the reflected operators below, so that array @ node records the operation
+    __array_ufunc__ = None
+
+    def __init__(self, value):
+        '''
+        Constructor
+        ===========
+        Input:
+        self - a TensorNode variable
+        value - int/float/list/np.ndarray, specifying the value of the current variable
+
+        Output:
+        a TensorNode object, a ReverseNode holding a whole array
+        Each operation records one vector-Jacobian product for the whole array instead of one edge per entry
+
+        Example:
+        >>> X = TensorNode(np.ones((3, 2)))
+        >>> w = TensorNode([1.0, 2.0])
+        >>> loss = ((X @ w - 1) ** 2).sum()
+        >>> loss.value
+        array(12.)
+
+        '''
+        if isinstance(value, SCALAR_TYPES + (list, np.ndarray)):
+            value = np.asarray(value)
+            if not np.issubdtype(value.dtype, np.number):
+                raise TypeError("Invalid Input: value must be numeric!")
+            self.value = value if np.issubdtype(value.dtype, np.floating) else value.astype(np.float64)
+        else:
+            raise TypeError("Invalid Input: value must be a number or an array!")
+        self.children = []
+        self.adjoint = None
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def ndim(self):
+        return self.value.ndim
+
+    def gradient(self):
+        '''
+        Compute the adjoint of the current variable with a single reverse sweep over the graph
+
+        Input:
+        self - a TensorNode variable
+
+        Output:
+        np.ndarray with the shape of the variable, the derivative of the sum of the output node(s)
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> y = (x * x).sum()
+        >>> x.gradient()
+        array([2., 4.])
+
+        '''
+        for node in _topological_order([self]):
+            if len(node.children) > 0:
+                node.adjoint = sum(vjp(child.adjoint) for vjp, child in node.children)
+            else:
+                node.adjoint = np.ones_like(node.value)
+        return self.adjoint
+
+    def _link(self, vjp, new):
+        '''
+        Record the vector-Jacobian product of an operation
+
+        Input:
+        self - a TensorNode variable, operand of the operation
+        vjp - function, mapping the adjoint of the result to the adjoint contribution of self
+        new - a TensorNode variable, result of the operation
+
+        '''
+        self.children.append((vjp, new))
+
+    def _elementwise(self, value, der):
+        '''
+        Record an elementwise function, used by the functions in utils
+
+        Input:
+        self - a TensorNode variable
+        value - np.ndarray, the function applied to every entry
+        der - np.ndarray, the derivative of the function at every entry
+
+        Output:
+        a TensorNode object containing the new value
+
+        '''
+        new = TensorNode(value)
+        self._link(lambda grad: grad * der, new)
+        return new
+
+    def __add__(self, other):
+        '''
+        Dunder method to add another TensorNode variable or constant, with broadcasting
+
+        Input:
+        self - a TensorNode variable
+        other - a constant number or array / a TensorNode object representing a variable
+
+        Output:
+        a TensorNode object containing new value after addition
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> (x + np.ones((2, 2))).value
+        array([[2., 3.],
+               [2., 3.]])
+
+        '''
+        if isinstance(other, TensorNode):
+            new = TensorNode(self.value + other.value)
+            self._link(lambda grad: _unbroadcast(grad, self.shape), new)
+            other._link(lambda grad: _unbroadcast(grad, other.shape), new)
+            return new
+        elif isinstance(other, SCALAR_TYPES + (np.ndarray,)):
+            new = TensorNode(self.value + other)
+            self._link(lambda grad: _unbroadcast(grad, self.shape), new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        '''
+        Dunder method to subtract another TensorNode variable or constant, with broadcasting
+
+        Input:
+        self - a TensorNode variable
+        other - a constant number or array / a TensorNode object representing a variable
+
+        Output:
+        a TensorNode object containing new value after subtraction
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> (x - 1).value
+        array([0., 1.])
+
+        '''
+        if isinstance(other, TensorNode):
+            new = TensorNode(self.value - other.value)
+            self._link(lambda grad: _unbroadcast(grad, self.shape), new)
+            other._link(lambda grad: -_unbroadcast(grad, other.shape), new)
+            return new
+        elif isinstance(other, SCALAR_TYPES + (np.ndarray,)):
+            new = TensorNode(self.value - other)
+            self._link(lambda grad: _unbroadcast(grad, self.shape), new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __rsub__(self, other):
+        if isinstance(other, SCALAR_TYPES + (np.ndarray,)):
+            new = TensorNode(other - self.value)
+            self._link(lambda grad: -_unbroadcast(grad, self.shape), new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __mul__(self, other):
+        '''
+        Dunder method to multiply by another TensorNode variable or constant elementwise, with broadcasting
+
+        Input:
+        self - a TensorNode variable
+        other - a constant number or array / a TensorNode object representing a variable
+
+        Output:
+        a TensorNode object containing new value after multiplication
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> (x * x).value
+        array([1., 4.])
+
+        '''
+        if isinstance(other, TensorNode):
+            new = TensorNode(self.value * other.value)
+            self._link(lambda grad: _unbroadcast(grad * other.value, self.shape), new)
+            other._link(lambda grad: _unbroadcast(grad * self.value, other.shape), new)
+            return new
+        elif isinstance(other, SCALAR_TYPES + (np.ndarray,)):
+            new = TensorNode(self.value * other)
+            self._link(lambda grad: _unbroadcast(grad * other, self.shape), new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        '''
+        Dunder method to divide by another TensorNode variable or constant elementwise, with broadcasting
+
+        Input:
+        self - a TensorNode variable
+        other - a constant number or array / a TensorNode object representing a variable
+
+        Output:
+        a TensorNode object containing new value after division
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> (x / 2).value
+        array([0.5, 1. ])
+
+        '''
+        if isinstance(other, TensorNode):
+            new = TensorNode(self.value / other.value)
+            self._link(lambda grad: _unbroadcast(grad / other.value, self.shape), new)
+            other._link(lambda grad: _unbroadcast(-grad * self.value / other.value ** 2, other.shape), new)
+            return new
+        elif isinstance(other, SCALAR_TYPES + (np.ndarray,)):
+            new = TensorNode(self.value / other)
+            self._link(lambda grad: _unbroadcast(grad / other, self.shape), new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __rtruediv__(self, other):
+        if isinstance(other, SCALAR_TYPES + (np.ndarray,)):
+            new = TensorNode(other / self.value)
+            self._link(lambda grad: _unbroadcast(-grad * other / self.value ** 2, self.shape), new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __pow__(self, other):
+        '''
+        Dunder method to compute the elementwise power of a TensorNode variable subject to a constant
+
+        Input:
+        self - a TensorNode variable
+        other - a constant of integers or decimals
+
+        Output:
+        a TensorNode object containing new value after taking the power
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> (x ** 2).value
+        array([1., 4.])
+
+        '''
+        if isinstance(other, SCALAR_TYPES):
+            if np.any(self.value < 0) and abs(other) < 1:
+                raise ValueError("Derivatives of variables with negative values to a power between -1 and 1 are not supported!")
+            return self._elementwise(self.value ** other, other * self.value ** (other - 1))
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __neg__(self):
+        new = TensorNode(-self.value)
+        self._link(lambda grad: -grad, new)
+        return new
+
+    def __matmul__(self, other):
+        '''
+        Dunder method to compute the matrix product with another TensorNode variable or constant array
+
+        Input:
+        self - a TensorNode variable
+        other - a constant array / a TensorNode object representing a variable
+
+        Output:
+        a TensorNode object containing the matrix product
+
+        Examples:
+        >>> A = TensorNode(np.arange(6.0).reshape(2, 3))
+        >>> (A @ np.ones(3)).value
+        array([ 3., 12.])
+
+        '''
+        if isinstance(other, TensorNode):
+            new = TensorNode(self.value @ other.value)
+            vjp_self, vjp_other = _matmul_vjp(self.value, other.value)
+            self._link(vjp_self, new)
+            other._link(vjp_other, new)
+            return new
+        elif isinstance(other, (list, np.ndarray)):
+            other = np.asarray(other)
+            new = TensorNode(self.value @ other)
+            self._link(_matmul_vjp(self.value, other)[0], new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def __rmatmul__(self, other):
+        if isinstance(other, (list, np.ndarray)):
+            other = np.asarray(other)
+            new = TensorNode(other @ self.value)
+            self._link(_matmul_vjp(other, self.value)[1], new)
+            return new
+        else:
+            raise AttributeError("Invalid Input!")
+
+    def dot(self, other):
+        '''
+        Compute the dot product with another TensorNode variable or constant array, same as @ for vectors and matrices
+
+        Input:
+        self - a TensorNode variable
+        other - a constant array / a TensorNode object representing a variable
+
+        Output:
+        a TensorNode object containing the dot product
+
+        Examples:
+        >>> x = TensorNode([1.0, 2.0])
+        >>> x.dot(x).value
+        array(5.)
+
+        '''
+        return self.__matmul__(other)
+
+    def sum(self, axis=None):
+        '''
+        Sum the entries of a TensorNode variable
+
+        Input:
+        self - a TensorNode variable
+        axis - int/tuple, the axis or axes to sum over, default to None which sums all entries
+
+        Output:
+        a TensorNode object containing the sum
+
+        Examples:
+        >>> x = TensorNode(np.ones((2, 3)))
+        >>> x.sum(axis=0).value
+        array([2., 2., 2.])
+
+        '''
+        new = TensorNode(self.value.sum(axis=axis))
+        shape = self.shape
+        if axis is None:
+            self._link(lambda grad: np.broadcast_to(grad, shape), new)
+        else:
+            self._link(lambda grad: np.broadcast_to(np.expand_dims(grad, axis), shape), new)
+        return new
+
+    def __repr__(self):
+        return f'TensorNode Variable Value: {self.value}, Adjoint: {self.adjoint}'
+
+
+def tensor_gradient(output, inputs):
+    '''
+    Calculate the derivatives of a scalar TensorNode output with respect to TensorNode inputs
+
+    Input:
+    output - TensorNode, a scalar output such as a loss
+    inputs - list, TensorNode objects for the input variables
+
+    Output:
+    A list with one np.ndarray per input, with the shape of the input
+
+    Examples:
+    >>> X = TensorNode(np.eye(2))
+    >>> w = TensorNode([1.0, 2.0])
+    >>> tensor_gradient(((X @ w) ** 2).sum(), [w])
+    [array([2., 4.])]
+
+    '''
+    if not isinstance(output, TensorNode) or output.value.size != 1:
+        raise ValueError("Invalid Input: output must be a scalar TensorNode!")
+    # seed only this output, so other outputs sharing the graph contribute nothing
+    for node in _topological_order(inputs):
+        node.adjoint = np.ones_like(node.value) if node is output else np.zeros_like(node.value)
+        for vjp, child in node.children:
+            node.adjoint = node.adjoint + vjp(child.adjoint)
+    return [x.adjoint for x in inputs]
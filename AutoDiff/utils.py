@@ -1,11 +1,22 @@
 import numpy as np
-from AutoDiff.forwardNode import ForwardNode
-from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.dtypes import SCALAR_TYPES
+from AutoDiff.primitive import elementary, domain
 
 __all__ = ['sin', 'cos', 'log', 'exp', 'sqrt', 'tan', 'cot', 'sec', 'csc',
            'arctan', 'arcsin', 'arccos', 'tanh', 'sinh', 'cosh', 'log_base']
 
 
+def _odd_half_pi(a):
+    # odd multiples of pi / 2, where tangent and secant do not exist
+    return (a % (np.pi / 2) == 0) & (a % np.pi != 0)
+
+
+def _multiple_pi(a):
+    # multiples of pi, where cotangent and cosecant do not exist
+    return a % np.pi == 0
+
+
+@elementary(derivative=lambda a, value: value)
 def exp(node):
     '''
     Compute the exponent of the ForwardNode object
@@ -22,18 +33,11 @@ def exp(node):
     ForwardNode Variable: ['x'],  Value: 20.085536923187668, Trace: [20.08553692]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.exp(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.exp(node.value), node.trace * np.exp(node.value), node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.exp(node.value))
-        node.children.append((np.exp(node.value), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.exp(node)
 
 
+@elementary(derivative=lambda a, value: 1 / a,
+            domain=domain(lambda a: a <= 0, "Invalid inpput: cannot take log for value <= 0"))
 def log(node):
     '''
     Compute the log of the ForwardNode object
@@ -50,24 +54,11 @@ def log(node):
     ForwardNode Variable: ['x'],  Value: 1.0986122886681098, Trace: [0.33333333]
 
     '''
-    if isinstance(node, (int, float)):
-        if node <= 0:
-            raise ValueError("Invalid inpput: cannot take log for value <= 0")
-        return np.log(node)
-    elif isinstance(node, ForwardNode):
-        if node.value <= 0:
-            raise ValueError("Invalid inpput: cannot take log for value <= 0")
-        return ForwardNode(np.log(node.value), node.trace / node.value, node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value <= 0:
-            raise ValueError("Invalid inpput: cannot take log for value <= 0")
-        new = ReverseNode(np.log(node.value))
-        node.children.append((1/node.value, new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.log(node)
 
 
+@elementary(derivative=lambda a, value: 0.5 / value,
+            domain=domain(lambda a: a < 0, "Invalid Value: cannot calculate square root of {0}."))
 def sqrt(node):
     '''
     Compute the square root of the ForwardNode object
@@ -84,27 +75,10 @@ def sqrt(node):
     ForwardNode Variable: ['x'],  Value: 2.0, Trace: [0.25]
 
     '''
-    if isinstance(node, (int, float)):
-        if node < 0:
-            raise ValueError(f"Invalid Value: cannot calculate square root of {node}.")
-        else:
-            return np.sqrt(node)
-    elif isinstance(node, ForwardNode):
-        if node.value < 0:
-            raise ValueError(f"Invalid Value: cannot calculate square root of {node.value}.")
-        else:
-            return ForwardNode(node.value ** 0.5, node.trace * 0.5 * node.value ** (-0.5), node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value < 0:
-            raise ValueError(f"Invalid Value: cannot calculate square root of {node.value}.")
-        else:
-            new = ReverseNode(node.value ** 0.5)
-            node.children.append((0.5 * node.value ** (-0.5), new))
-            return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.sqrt(node)
 
 
+@elementary(derivative=lambda a, value: cos(a))
 def sin(node):
     '''
     Compute the sine of the ForwardNode object
@@ -121,18 +95,10 @@ def sin(node):
     ForwardNode Variable: ['x'],  Value: 1.2246467991473532e-16, Trace: [-1.]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.sin(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.sin(node.value), node.trace * np.cos(node.value), node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.sin(node.value))
-        node.children.append((np.cos(node.value), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.sin(node)
 
 
+@elementary(derivative=lambda a, value: -sin(a))
 def cos(node):
     '''
     Compute the cosine of the ForwardNode object
@@ -149,18 +115,11 @@ def cos(node):
     ForwardNode Variable: ['x'],  Value: 1.0, Trace: [-0.]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.cos(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.cos(node.value), -1.0 * node.trace * np.sin(node.value), node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.cos(node.value))
-        node.children.append((-np.sin(node.value), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.cos(node)
 
 
+@elementary(derivative=lambda a, value: 1 + value ** 2,
+            domain=domain(_odd_half_pi, "Invalid input: derivative for tangent of {0} doesn't exist"))
 def tan(node):
     '''
     Compute the tangent of the ForwardNode object
@@ -177,24 +136,11 @@ def tan(node):
     ForwardNode Variable: ['x'],  Value: 0.0, Trace: [1.]
 
     '''
-    if isinstance(node, (int, float)):
-        if node % (np.pi / 2) == 0 and node % np.pi != 0:
-            raise ValueError(f"Invalid input: derivative for tangent of {node} doesn't exist")
-        return np.tan(node)
-    elif isinstance(node, ForwardNode):
-        if node.value % (np.pi / 2) == 0 and node.value % np.pi != 0:
-            raise ValueError(f"Invalid input: derivative for tangent of {node.value} doesn't exist")
-        return ForwardNode(np.tan(node.value), node.trace / np.cos(node.value) ** 2, node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value % (np.pi / 2) == 0 and node.value % np.pi != 0:
-            raise ValueError(f"Invalid input: derivative for tangent of {node.value} doesn't exist")
-        new = ReverseNode(np.tan(node.value))
-        node.children.append((1.0 / np.cos(node.value) ** 2, new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.tan(node)
 
 
+@elementary(derivative=lambda a, value: -(1 + value ** 2),
+            domain=domain(_multiple_pi, "Invalid Value: cotangent of {0} does not exist."))
 def cot(node):
     '''
     Compute the cotangent of the ForwardNode object
@@ -211,24 +157,11 @@ def cot(node):
     ForwardNode Variable: ['x'],  Value: 6.123233995736766e-17, Trace: [-1.]
 
     '''
-    if isinstance(node, (int, float)):
-        if node % np.pi == 0:
-            raise ValueError(f"Invalid Value: cotangent of {node} does not exist.")
-        return 1 / np.tan(node)
-    elif isinstance(node, ForwardNode):
-        if node.value % np.pi == 0:
-            raise ValueError(f"Invalid Value: cotangent of {node.value} does not exist.")
-        return ForwardNode(1 / np.tan(node.value), node.trace * (-1.0) / np.sin(node.value) ** 2, node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value % np.pi == 0:
-            raise ValueError(f"Invalid Value: cotangent of {node.value} does not exist.")
-        new = ReverseNode(1 / np.tan(node.value))
-        node.children.append((-1.0 / np.sin(node.value) ** 2, new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return 1 / np.tan(node)
 
 
+@elementary(derivative=lambda a, value: sin(a) * value ** 2,
+            domain=domain(_odd_half_pi, "Invalid Value: secant of {0} does not exist."))
 def sec(node):
     '''
     Compute the secant of the ForwardNode object
@@ -245,24 +178,11 @@ def sec(node):
     ForwardNode Variable: ['x'],  Value: 1.0, Trace: [0.]
 
     '''
-    if isinstance(node, (int, float)):
-        if node % (np.pi / 2) == 0 and node % np.pi != 0:
-            raise ValueError(f"Invalid Value: secant of {node} does not exist.")
-        return 1 / np.cos(node)
-    elif isinstance(node, ForwardNode):
-        if node.value % (np.pi / 2) == 0 and node.value % np.pi != 0:
-            raise ValueError(f"Invalid Value: secant of {node.value} does not exist.")
-        return ForwardNode(1 / np.cos(node.value), node.trace * np.sin(node.value) / np.cos(node.value) ** 2, node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value % (np.pi / 2) == 0 and node.value % np.pi != 0:
-            raise ValueError(f"Invalid Value: secant of {node.value} does not exist.")
-        new = ReverseNode(1 / np.cos(node.value))
-        node.children.append((np.sin(node.value) / np.cos(node.value) ** 2, new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return 1 / np.cos(node)
 
 
+@elementary(derivative=lambda a, value: -cos(a) * value ** 2,
+            domain=domain(_multiple_pi, "Invalid Value: cosecant of {0} does not exist."))
 def csc(node):
     '''
     Compute the cosecant of the ForwardNode object
@@ -279,25 +199,12 @@ def csc(node):
     ForwardNode Variable: ['x'],  Value: 1.0, Trace: [-6.123234e-17]
 
     '''
-    if isinstance(node, (int, float)):
-        if node % np.pi == 0:
-            raise ValueError(f"Invalid Value: cosecant of {node} does not exist.")
-        return 1 / np.sin(node)
-    elif isinstance(node, ForwardNode):
-        if node.value % np.pi == 0:
-            raise ValueError(f"Invalid Value: cosecant of {node.value} does not exist.")
-        return ForwardNode(1 / np.sin(node.value), node.trace * (-1.0) * np.cos(node.value) / np.sin(node.value) ** 2,
-                           node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value % np.pi == 0:
-            raise ValueError(f"Invalid Value: cosecant of {node.value} does not exist.")
-        new = ReverseNode(1 / np.sin(node.value))
-        node.children.append((-1.0 * np.cos(node.value) / np.sin(node.value) ** 2, new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return 1 / np.sin(node)
 
 
+@elementary(derivative=lambda a, value: 1 / sqrt(1 - a ** 2),
+            domain=domain(lambda a: np.abs(a) > 1, "Invalid Value: arcsin of {0} does not exist."),
+            derivative_domain=domain(lambda a: np.abs(a) >= 1, "Invalid Value: derivative of arcsin of {0} does not exist."))
 def arcsin(node):
     '''
     Compute the arcsine of the ForwardNode object
@@ -314,24 +221,12 @@ def arcsin(node):
     ForwardNode Variable: ['x'],  Value: 0.0, Trace: [1.]
 
     '''
-    if isinstance(node, (int, float)):
-        if np.abs(node) > 1:
-            raise ValueError(f"Invalid Value: arcsin of {node} does not exist.")
-        return np.arcsin(node)
-    elif isinstance(node, ForwardNode):
-        if np.abs(node.value) >= 1:
-            raise ValueError(f"Invalid Value: derivative of arcsin of {node.value} does not exist.")
-        return ForwardNode(np.arcsin(node.value), node.trace / np.sqrt(1 - node.value ** 2), node.var)
-    elif isinstance(node, ReverseNode):
-        if np.abs(node.value) >= 1:
-            raise ValueError(f"Invalid Value: derivative of arcsin of {node.value} does not exist.")
-        new = ReverseNode(np.arcsin(node.value))
-        node.children.append((1.0 / np.sqrt(1 - node.value ** 2), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.arcsin(node)
 
 
+@elementary(derivative=lambda a, value: -1 / sqrt(1 - a ** 2),
+            domain=domain(lambda a: np.abs(a) > 1, "Invalid Value: arccos of {0} does not exist."),
+            derivative_domain=domain(lambda a: np.abs(a) > 1, "Invalid Value: derivative of arccos of {0} does not exist."))
 def arccos(node):
     '''
     Compute the arccosine of the ForwardNode object
@@ -348,24 +243,10 @@ def arccos(node):
     ForwardNode Variable: ['x'],  Value: 1.5707963267948966, Trace: [-1.]
 
     '''
-    if isinstance(node, (int, float)):
-        if np.abs(node) > 1:
-            raise ValueError(f"Invalid Value: arccos of {node} does not exist.")
-        return np.arccos(node)
-    elif isinstance(node, ForwardNode):
-        if np.abs(node.value) > 1:
-            raise ValueError(f"Invalid Value: derivative of arccos of {node.value} does not exist.")
-        return ForwardNode(np.arccos(node.value), node.trace * (-1.0) / np.sqrt(1 - node.value ** 2), node.var)
-    elif isinstance(node, ReverseNode):
-        if np.abs(node.value) > 1:
-            raise ValueError(f"Invalid Value: derivative of arccos of {node.value} does not exist.")
-        new = ReverseNode(np.arccos(node.value))
-        node.children.append((-1.0 / np.sqrt(1 - node.value ** 2), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.arccos(node)
 
 
+@elementary(derivative=lambda a, value: 1 / (1 + a ** 2))
 def arctan(node):
     '''
     Compute the arctangent of the ForwardNode object
@@ -382,18 +263,10 @@ def arctan(node):
     ForwardNode Variable: ['x'],  Value: 0.0, Trace: [1.]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.arctan(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.arctan(node.value), node.trace / (1 + node.value ** 2), node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.arctan(node.value))
-        node.children.append((1.0 / (1 + node.value ** 2), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.arctan(node)
 
 
+@elementary(derivative=lambda a, value: cosh(a))
 def sinh(node):
     '''
     Compute the sinh of the ForwardNode object
@@ -410,18 +283,10 @@ def sinh(node):
     ForwardNode Variable: ['x'],  Value: 0.0, Trace: [1.]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.sinh(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.sinh(node.value), node.trace * np.cosh(node.value), node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.sinh(node.value))
-        node.children.append((np.cosh(node.value), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.sinh(node)
 
 
+@elementary(derivative=lambda a, value: sinh(a))
 def cosh(node):
     '''
     Compute the cosh of the ForwardNode object
@@ -438,18 +303,10 @@ def cosh(node):
     ForwardNode Variable: ['x'],  Value: 1.0, Trace: [0.]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.cosh(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.cosh(node.value), node.trace * np.sinh(node.value), node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.cosh(node.value))
-        node.children.append((np.sinh(node.value), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.cosh(node)
 
 
+@elementary(derivative=lambda a, value: 1 - value ** 2)
 def tanh(node):
     '''
     Compute the tanh of the ForwardNode object
@@ -466,16 +323,13 @@ def tanh(node):
     ForwardNode Variable: ['x'],  Value: 0.0, Trace: [1.]
 
     '''
-    if isinstance(node, (int, float)):
-        return np.tanh(node)
-    elif isinstance(node, ForwardNode):
-        return ForwardNode(np.tanh(node.value), node.trace / np.cosh(node.value) ** 2, node.var)
-    elif isinstance(node, ReverseNode):
-        new = ReverseNode(np.tanh(node.value))
-        node.children.append((1 / np.cosh(node.value) ** 2, new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    return np.tanh(node)
+
+
+@elementary(derivative=lambda a, value, base, log_b: 1 / (a * log_b),
+            domain=domain(lambda a, base, log_b: a < 0, "Invalid input: base-{1} log of {0} does not exist."))
+def _log_base(node, base, log_b):
+    return np.log(node) / log_b
 
 
 def log_base(node, base=10):
@@ -495,21 +349,7 @@ def log_base(node, base=10):
     ForwardNode Variable: ['x1'],  Value: 3.0, Trace: [0.04978707]
 
     '''
-    if (not isinstance(base, (int, float))) or base <= 0:
+    if (not isinstance(base, SCALAR_TYPES)) or base <= 0:
         raise ValueError("Invalid input: base must be a positive number")
-    if isinstance(node, (int, float)):
-        if node < 0:
-            raise ValueError(f"Invalid input: base-{base} log of {node} does not exist.")
-        return np.log(node) / np.log(base)
-    elif isinstance(node, ForwardNode):
-        if node.value < 0:
-            raise ValueError(f"Invalid input: base-{base} log of {node.value} does not exist.")
-        return ForwardNode(np.log(node.value) / np.log(base), node.trace / (node.value * np.log(base)), node.var)
-    elif isinstance(node, ReverseNode):
-        if node.value < 0:
-            raise ValueError(f"Invalid input: base-{base} log of {node.value} does not exist.")
-        new = ReverseNode(np.log(node.value) / np.log(base))
-        node.children.append((1.0 / (node.value * np.log(base)), new))
-        return new
-    else:
-        raise AttributeError("Invalid Input!")
+    # a Python number, so that it does not widen float32 values
+    return _log_base(node, base, float(np.log(base)))
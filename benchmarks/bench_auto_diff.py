@@ -0,0 +1,29 @@
+'''
+Overhead of the auto_diff entry points: compiling string functions, evaluating them, and the cached paths
+'''
+from common import time_per_call
+from AutoDiff.expression import Expression, _compile, _compile_all
+from AutoDiff.ad import auto_diff, jacobian
+
+FUNCTIONS = ["x1 * x2 + sin(x1)", "exp(x2) / x1 - log(x3)", "x1 ** 2 + sqrt(x3)"]
+VAR_DICT = {"x1": 0.5, "x2": 1.5, "x3": 2.5}
+
+
+def compile_uncached():
+    _compile.cache_clear()
+    _compile_all.cache_clear()
+    return Expression(FUNCTIONS, list(VAR_DICT))
+
+
+def benchmarks():
+    expression = Expression(FUNCTIONS, list(VAR_DICT))
+    values = expression.values(VAR_DICT)
+    return {
+        'auto_diff.compile.uncached': time_per_call(compile_uncached),
+        'auto_diff.compile.cached': time_per_call(lambda: Expression(FUNCTIONS, list(VAR_DICT))),
+        'auto_diff.evaluate': time_per_call(lambda: expression(*values)),
+        'auto_diff.forward': time_per_call(lambda: auto_diff(FUNCTIONS, VAR_DICT, mode="forward")),
+        'auto_diff.reverse': time_per_call(lambda: auto_diff(FUNCTIONS, VAR_DICT, mode="reverse")),
+        'auto_diff.lambda': time_per_call(lambda: auto_diff(lambda x1, x2, x3: x1 * x2 + x3, VAR_DICT)),
+        'auto_diff.jacobian.expression': time_per_call(lambda: jacobian(expression, VAR_DICT)),
+    }
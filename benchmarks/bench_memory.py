@@ -0,0 +1,58 @@
+'''
+Memory per node, measured with tracemalloc over a graph of many nodes
+'''
+import contextlib
+import tracemalloc
+import numpy as np
+import common  # makes AutoDiff importable from a source checkout
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tape import Tape
+from AutoDiff.sparseTrace import SparseTrace
+
+N_NODES = 10000
+N_VARIABLES = 100
+
+
+def bytes_per_node(build):
+    '''
+    Measure the memory held by the nodes that build() returns, divided by N_NODES
+    '''
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del nodes
+    return (after - before) / N_NODES
+
+
+def forward(trace):
+    def build():
+        x = ForwardNode(0.5, trace, [f"x{i}" for i in range(N_VARIABLES)])
+        nodes = [x]
+        for _ in range(N_NODES - 1):
+            nodes.append(nodes[-1] * 1.0001)
+        return nodes
+    return build
+
+
+def reverse(tape=False):
+    def build():
+        with Tape(capacity=N_NODES) if tape else contextlib.nullcontext():
+            nodes = [ReverseNode(0.5)]
+            for _ in range(N_NODES - 1):
+                nodes.append(nodes[-1] * 1.0001)
+        return nodes
+    return build
+
+
+def benchmarks():
+    return {
+        'memory.forward.dense': bytes_per_node(forward(np.identity(N_VARIABLES)[0])),
+        'memory.forward.sparse': bytes_per_node(forward(SparseTrace([0], [1.0], N_VARIABLES))),
+        'memory.reverse': bytes_per_node(reverse()),
+        'memory.reverse.tape': bytes_per_node(reverse(tape=True)),
+    }
@@ -0,0 +1,66 @@
+'''
+Cost of the parts of jacobian() that select_mode() weighs against each other, mostly measured as the difference
+between two jacobian() calls: seeding a variable and each of its targets, one operation in each mode,
+carrying one more target through an operation in forward mode, and sweeping over an operation for one more
+output in reverse mode
+Every result is in seconds, the constants in AutoDiff.ad are these costs relative to mode.forward.op
+'''
+import numpy as np
+from common import time_per_call
+from AutoDiff.ad import jacobian
+from AutoDiff.expression import Expression
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.utils import sin
+
+# operations of the timed graphs, variables and outputs of the wide runs, and trace width of the wide operations
+DEPTH = 300
+N_VARIABLES = 200
+N_OUTPUTS = 10
+WIDTH = 2000
+
+
+def graph(depth, n_outputs=1):
+    '''
+    A function of x0 with depth operations, 3 per step, returned n_outputs times so that the graph is shared
+    '''
+    def f(*x):
+        y = x[0]
+        for _ in range(depth // 3):
+            y = sin(y * x[0] + y)
+        return [y] * n_outputs
+    return f
+
+
+def trace_timing(width):
+    '''
+    Seconds per operation of the graph on a ForwardNode with a trace of the given width
+    '''
+    x = ForwardNode(0.5, np.identity(width)[0], [f"x{i}" for i in range(width)])
+    return time_per_call(lambda: graph(DEPTH)(x), repeat=3) / DEPTH
+
+
+def timing(mode, depth=0, n=1, k=1, m=1):
+    '''
+    Seconds per jacobian() call of a graph with n variables, k of them targets, and m outputs
+    '''
+    variables = [f"x{i}" for i in range(n)]
+    expression = Expression(graph(depth, m), variables)
+    var_dict = {var: 0.5 for var in variables}
+    return time_per_call(lambda: jacobian(expression, var_dict, variables[:k], mode=mode), repeat=3)
+
+
+def benchmarks():
+    res = {}
+    n = N_VARIABLES + 1
+    for mode in ["forward", "reverse"]:
+        base = timing(mode)
+        res[f'mode.{mode}.variable'] = (timing(mode, n=n) - base) / N_VARIABLES
+        res[f'mode.{mode}.op'] = (timing(mode, DEPTH) - base) / DEPTH
+    # forward mode carries one tangent per target through every variable and every operation
+    wide = timing("forward", n=n, k=n)
+    res['mode.forward.seed'] = (wide - timing("forward", n=n)) / (n * N_VARIABLES)
+    # the trace entries only cost more than the NumPy call overhead at widths of thousands
+    res['mode.forward.target'] = (trace_timing(WIDTH) - trace_timing(1)) / (WIDTH - 1)
+    # reverse mode sweeps the whole graph once per output
+    res['mode.reverse.sweep'] = (timing("reverse", DEPTH, m=N_OUTPUTS + 1) - timing("reverse", DEPTH)) / (N_OUTPUTS * DEPTH)
+    return res
@@ -0,0 +1,51 @@
+'''
+Time per call of every ForwardNode / ReverseNode dunder method and every utils primitive,
+reverse mode timings include creating the operands
+'''
+import numpy as np
+from common import time_per_call
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff import utils
+
+N_VARIABLES = 10
+
+DUNDERS = {
+    '__add__': lambda x, y: x + y,
+    '__radd__': lambda x, y: 2.0 + x,
+    '__sub__': lambda x, y: x - y,
+    '__rsub__': lambda x, y: 2.0 - x,
+    '__mul__': lambda x, y: x * y,
+    '__rmul__': lambda x, y: 2.0 * x,
+    '__truediv__': lambda x, y: x / y,
+    '__rtruediv__': lambda x, y: 2.0 / x,
+    '__pow__': lambda x, y: x ** 2.0,
+    '__rpow__': lambda x, y: 2.0 ** x,
+    '__neg__': lambda x, y: -x,
+}
+
+# arguments inside the domain of every primitive
+ARGUMENTS = {'log_base': 0.5, 'arcsin': 0.5, 'arccos': 0.5}
+
+
+def forward_nodes():
+    trace = np.identity(N_VARIABLES)
+    variables = [f"x{i}" for i in range(N_VARIABLES)]
+    return ForwardNode(0.5, trace[0], variables), ForwardNode(0.7, trace[1], variables)
+
+
+def benchmarks():
+    res = {}
+    for name, op in DUNDERS.items():
+        x, y = forward_nodes()
+        res[f'primitives.forward.{name}'] = time_per_call(lambda: op(x, y))
+        # fresh operands every call, so the children lists do not grow without bound
+        res[f'primitives.reverse.{name}'] = time_per_call(lambda: op(ReverseNode(0.5), ReverseNode(0.7)))
+    for name in utils.__all__:
+        function = getattr(utils, name)
+        value = ARGUMENTS.get(name, 0.5)
+        x, _ = forward_nodes()
+        x.value = value
+        res[f'primitives.forward.{name}'] = time_per_call(lambda: function(x))
+        res[f'primitives.reverse.{name}'] = time_per_call(lambda: function(ReverseNode(value)))
+    return res
@@ -0,0 +1,57 @@
+'''
+Gradient time against the number of variables, the depth of the graph and its fan-out
+'''
+import contextlib
+from common import time_per_call
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tape import Tape
+from AutoDiff.utils import sin
+from AutoDiff.ad import jacobian
+
+SIZES = [10, 100, 1000]
+
+
+def sum_of_products(n):
+    return " + ".join([f"x{i} * x{(i + 1) % n}" for i in range(n)])
+
+
+def chain(depth, tape=False):
+    '''
+    Build y = sin(sin(...sin(x))) and compute dy/dx
+    '''
+    def run():
+        with Tape() if tape else contextlib.nullcontext():
+            x = ReverseNode(0.5)
+            y = x
+            for _ in range(depth):
+                y = sin(y)
+        return x.gradient()
+    return run
+
+
+def fan_out(width):
+    '''
+    Build y = sum of x * c over width terms and compute dy/dx, so that x has width children
+    '''
+    def run():
+        x = ReverseNode(0.5)
+        y = x * 1.0
+        for i in range(width):
+            y = y + x * float(i)
+        return x.gradient()
+    return run
+
+
+def benchmarks():
+    res = {}
+    for n in SIZES:
+        function = sum_of_products(n)
+        var_dict = {f"x{i}": 0.1 * i for i in range(n)}
+        for mode in ["forward", "reverse"]:
+            res[f'scaling.variables.{mode}.n={n}'] = time_per_call(lambda: jacobian(function, var_dict, mode=mode), repeat=3)
+    for depth in SIZES:
+        res[f'scaling.depth.n={depth}'] = time_per_call(chain(depth), repeat=3)
+        res[f'scaling.depth.tape.n={depth}'] = time_per_call(chain(depth, tape=True), repeat=3)
+    for width in SIZES:
+        res[f'scaling.fan_out.n={width}'] = time_per_call(fan_out(width), repeat=3)
+    return res
@@ -0,0 +1,29 @@
+import os
+import sys
+import timeit
+
+# make the AutoDiff package importable when the benchmarks are run from a source checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# minimum total time of one timing run, the number of calls per run is scaled up to reach it
+MIN_RUN_TIME = 0.05
+REPEAT = 5
+
+
+def time_per_call(function, repeat=REPEAT):
+    '''
+    Time a function with no arguments
+
+    Input:
+    function - function, the code to time
+    repeat - int, number of timing runs, the fastest one is kept
+
+    Output:
+    float, seconds per call in the fastest run
+
+    '''
+    timer = timeit.Timer(function)
+    # calibrate with a few calls, then scale the number of calls so that one run takes about MIN_RUN_TIME
+    elapsed = timer.timeit(number=3) / 3
+    number = max(1, int(MIN_RUN_TIME / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
@@ -0,0 +1,109 @@
+'''
+Run the AutoDiff benchmarks, write the results to JSON, and optionally compare them against a baseline
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --output results.json --baseline baseline.json --threshold 0.25
+    python benchmarks/run.py --only primitives scaling
+
+Every result is a cost, seconds per call or bytes per node, so lower is better. With --baseline the
+run fails with exit code 1 if any benchmark is slower than its baseline by more than the threshold.
+'''
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import bench_primitives
+import bench_scaling
+import bench_auto_diff
+import bench_memory
+import bench_mode
+
+SUITES = {
+    'primitives': bench_primitives,
+    'scaling': bench_scaling,
+    'auto_diff': bench_auto_diff,
+    'memory': bench_memory,
+    'mode': bench_mode,
+}
+
+
+def run(suites):
+    '''
+    Run the given suites
+
+    Input:
+    suites - list, names of the suites in SUITES to run
+
+    Output:
+    A dictionary with the environment and the result of every benchmark
+
+    '''
+    results = {}
+    for name in suites:
+        start = time.perf_counter()
+        results.update(SUITES[name].benchmarks())
+        print(f'{name}: done in {time.perf_counter() - start:.1f} s', file=sys.stderr)
+    return {'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(results, baseline, threshold):
+    '''
+    Compare results against a baseline
+
+    Input:
+    results - dict, benchmark name and result pairs of this run
+    baseline - dict, benchmark name and result pairs of the baseline run
+    threshold - float, allowed relative increase, such as 0.25 for 25%
+
+    Output:
+    A list of (name, baseline, result, ratio) for every benchmark above the threshold
+
+    '''
+    regressions = []
+    for name in sorted(set(results) & set(baseline)):
+        ratio = results[name] / baseline[name] if baseline[name] > 0 else 1.0
+        if ratio > 1 + threshold:
+            regressions.append((name, baseline[name], results[name], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the AutoDiff benchmarks')
+    parser.add_argument('--output', help='path of the JSON file to write the results to')
+    parser.add_argument('--baseline', help='path of a JSON results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown against the baseline, default to 0.25')
+    parser.add_argument('--only', nargs='+', choices=list(SUITES), default=list(SUITES),
+                        help='suites to run, default to all of them')
+    args = parser.parse_args(argv)
+
+    report = run(args.only)
+    for name, value in sorted(report['results'].items()):
+        unit = 'bytes' if name.startswith('memory.') else 's'
+        print(f'{name:<45} {value:>12.4g} {unit}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(report['results'], baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f'REGRESSION {name}: {before:.4g} -> {after:.4g} ({ratio:.2f}x)')
+        if regressions:
+            return 1
+        print(f'No regressions above {args.threshold:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
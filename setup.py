@@ -23,5 +23,5 @@ setup(
         'Programming Language :: Python :: 3',
     ],
     setup_requires=['wheel'],
-    python_requires = '>=3.6',
+    python_requires = '>=3.8',
 )
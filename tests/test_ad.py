@@ -0,0 +1,255 @@
+import io
+import os
+import tempfile
+import contextlib
+import multiprocessing
+import unittest
+import warnings
+import numpy as np
+
+from AutoDiff.utils import *
+from AutoDiff.tape import Tape
+from AutoDiff.ad import select_mode, auto_diff, compile_functions, jacobian, hessian, hvp, jvp, vjp, TapedFunction, auto_diff_batch
+from AutoDiff.ad import auto_diff_stream, auto_diff_to_file, SparseJacobian, sparse_jacobian
+
+class AutoDiffTests(unittest.TestCase):
+
+  def test_select_mode(self):
+    var_dict = {f"x{i}": i for i in range(3)}
+    assert select_mode("x0 * x1 + sin(x2)", var_dict) == "reverse"
+    assert select_mode(["x0 * x1"] * 50, var_dict) == "forward"
+    assert select_mode(compile_functions(["x0 * x1"] * 50, list(var_dict)), var_dict) == "forward"
+    wide = {f"x{i}": i for i in range(10000)}
+    assert select_mode(["x0 * x1"] * 50, wide) == "reverse"
+    # a few outputs of one to three variables are cheaper in forward mode
+    for m, n in [(9, 1), (5, 2), (8, 3)]:
+      assert select_mode([" + ".join(f"sin(x{i})" for i in range(n))] * m, {f"x{i}": i for i in range(n)}) == "forward"
+
+  def test_select_mode_probe(self):
+    var_dict = {f"x{i}": i for i in range(30)}
+    # without probing, 20 functions are assumed to be 20 separate graphs, while they share a single operation
+    assert select_mode(["x0 * x1"] * 20, var_dict) == "forward"
+    assert select_mode(["x0 * x1"] * 20, var_dict, probe=True) == "reverse"
+    assert select_mode(lambda *x: [x[0] * x[1]] * 20, var_dict, probe=True) == "reverse"
+
+  def test_auto_mode(self):
+    functions = ["tanh(x1) + cosh(x2 * 3) - sec(x3)", "x1 / x2 * cos(x3)", "sin(x1 / 2) + x2 * x3"]
+    var_dict = {"x1": np.pi / 2, "x2": 1, "x3": 0}
+    res = auto_diff(functions, var_dict, mode="auto")
+    assert np.allclose(res, auto_diff(functions, var_dict, mode="forward"))
+    res = auto_diff(functions, var_dict, ["x2"], mode="auto")
+    assert np.allclose(res, auto_diff(functions, var_dict, ["x2"], mode="reverse"))
+
+  def test_invalid_mode(self):
+    with self.assertRaises(ValueError):
+      auto_diff("x1", {"x1": 1}, mode="sideways")
+
+  def test_jacobian(self):
+    functions = ["x1 + sin(x2) * 5", "exp(x1) - log(2 * x2)", "3"]
+    var_dict = {"x1": 5, "x2": 2}
+    expected = np.array([[5 * np.cos(2), 1], [-0.5, np.exp(5)], [0, 0]])
+    for mode in ["forward", "reverse", "auto"]:
+      res = jacobian(functions, var_dict, ["x2", "x1"], mode=mode)
+      assert res.jacobian.shape == (3, 2)
+      assert np.allclose(res.jacobian, expected)
+      assert np.allclose(res.value, [5 + np.sin(2) * 5, np.exp(5) - np.log(4), 3])
+      assert res.mode in ["forward", "reverse"]
+    res = jacobian(functions, var_dict, "x1", mode="forward")
+    assert np.allclose(res.jacobian, expected[:, 1:])
+    with self.assertRaises(ValueError):
+      jacobian(functions, var_dict, ["x3"])
+    with self.assertRaises(ValueError):
+      jacobian(functions, var_dict, mode="sideways")
+
+  def test_quiet(self):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+      jacobian("x1 * x2", {"x1": 1, "x2": 2})
+      auto_diff("x1 * x2", {"x1": 1, "x2": 2}, mode="auto")
+      auto_diff("x1 * x2", {"x1": 1, "x2": 2}, ["x1"], mode="reverse")
+    assert out.getvalue() == ""
+    with contextlib.redirect_stdout(out):
+      auto_diff("x1 * x2", {"x1": 1, "x2": 2}, ["x1"], mode="auto", verbose=True)
+    assert "Mode: auto" in out.getvalue()
+    assert "Partial derivative with respect to x1" in out.getvalue()
+    with contextlib.redirect_stdout(out):
+      auto_diff(lambda x1, x2: x1 * x2, {"x1": 1, "x2": 2}, verbose=True)
+    assert "Functions: lambda x1, x2: x1 * x2\n" in out.getvalue()
+    def product(x1, x2):
+      return x1 * x2
+    with contextlib.redirect_stdout(out):
+      auto_diff(product, {"x1": 1, "x2": 2}, mode="reverse", verbose=True)
+    assert "Functions: AutoDiffTests.test_quiet.<locals>.product(x1, x2)\n" in out.getvalue()
+
+  def test_hessian(self):
+    var_dict = {"x1": 0.7, "x2": 1.3, "x3": 2.1}
+    f = "x1 ** 2 * x2 + sin(x1 * x2) + log(x3) * exp(x1) + 4"
+    x1, x2, x3 = var_dict.values()
+    expected = np.array([
+      [2 * x2 - x2 ** 2 * np.sin(x1 * x2) + np.log(x3) * np.exp(x1),
+       2 * x1 + np.cos(x1 * x2) - x1 * x2 * np.sin(x1 * x2), np.exp(x1) / x3],
+      [2 * x1 + np.cos(x1 * x2) - x1 * x2 * np.sin(x1 * x2), -x1 ** 2 * np.sin(x1 * x2), 0],
+      [np.exp(x1) / x3, 0, -np.exp(x1) / x3 ** 2]])
+    assert np.allclose(hessian(f, var_dict), expected)
+    assert np.allclose(hessian("x1 + 3", var_dict), np.zeros((3, 3)))
+    with Tape():
+      assert np.allclose(hessian(f, var_dict), expected)
+      assert np.allclose(hvp(f, var_dict, [1, 0, 0]), expected[:, 0])
+    with self.assertRaises(ValueError):
+      hessian(["x1", "x2"], var_dict)
+
+  def test_hvp(self):
+    var_dict = {"x1": 0.7, "x2": 1.3}
+    f = "x1 ** x2 + cos(x1) / x2"
+    v = np.array([0.5, -2.0])
+    assert np.allclose(hvp(f, var_dict, v), hessian(f, var_dict) @ v)
+    assert np.allclose(hvp(f, var_dict, {"x2": 1}), hessian(f, var_dict)[:, 1])
+    with self.assertRaises(ValueError):
+      hvp(f, var_dict, [1, 2, 3])
+
+  def test_jvp(self):
+    functions = ["x1 * x2 + sin(x3)", "exp(x1) / x2", "x3", "3"]
+    var_dict = {"x1": 0.5, "x2": 2.0, "x3": -1.0}
+    J = jacobian(functions, var_dict).jacobian
+    V = np.array([[1.0, 0.0], [2.0, -1.0], [0.5, 3.0]])
+    assert np.allclose(jvp(functions, var_dict, V), J @ V)
+    assert jvp(functions, var_dict, V[:, 0]).shape == (4,)
+    assert np.allclose(jvp(functions, var_dict, V[:, 0]), J @ V[:, 0])
+    with self.assertRaises(ValueError):
+      jvp(functions, var_dict, np.ones((2, 2)))
+
+  def test_vjp(self):
+    functions = ["x1 * x2 + sin(x3)", "exp(x1) / x2", "x3", "3", "x1 * x2 + sin(x3)"]
+    var_dict = {"x1": 0.5, "x2": 2.0, "x3": -1.0}
+    J = jacobian(functions, var_dict).jacobian
+    U = np.array([[1.0, 0.0, 2.0], [2.0, -1.0, 0.0], [0.5, 3.0, 1.0], [1.0, 1.0, 1.0], [-1.0, 0.5, 0.0]])
+    assert np.allclose(vjp(functions, var_dict, U), U.T @ J)
+    assert vjp(functions, var_dict, U[:, 0]).shape == (3,)
+    assert np.allclose(vjp(functions, var_dict, U[:, 0]), U[:, 0] @ J)
+    with Tape():
+      assert np.allclose(vjp(functions, var_dict, U), U.T @ J)
+    with self.assertRaises(ValueError):
+      vjp(functions, var_dict, np.ones((3, 2)))
+
+  def test_taped_function(self):
+    functions = ["x1 * x2 + sin(x1) ** 2", "exp(x1) / x2", "3"]
+    f = TapedFunction(functions, {"x1": 1.0, "x2": 2.0})
+    for point in [{"x1": 0.0, "x2": 3.0}, {"x1": -1.5, "x2": 0.5}]:
+      res = f(point)
+      expected = jacobian(functions, point, mode="reverse")
+      assert np.allclose(res.value, expected.value)
+      assert np.allclose(res.jacobian, expected.jacobian)
+    with warnings.catch_warnings(record=True) as caught:
+      warnings.simplefilter("always")
+      g = TapedFunction("x1 if x1 > 0 else -x1", {"x1": 1.0})
+    assert len(caught) == 1
+    assert np.allclose(g({"x1": -2.0}).jacobian, [[-1.0]])
+
+  def test_sparse_jacobian(self):
+    n = 30
+    functions = [f"x{i - 1} - 2 * x{i} + x{i + 1} + sin(x{i}) * x{i + 1}" for i in range(1, n - 1)]
+    functions += ["x0 ** 2", "exp(x0) * x1 * 0", "3"]
+    var_dict = {f"x{i}": 0.1 * i for i in range(n)}
+    expected = jacobian(functions, var_dict).jacobian
+    for mode in ["forward", "reverse", "auto"]:
+      f = SparseJacobian(functions, var_dict, mode=mode)
+      assert f.n_colors == 3 and f.mode in ("forward", "reverse")
+      # the pattern is structural, so the derivatives that are zero at this point are kept
+      assert len(f.rows) == 3 * (n - 2) + 3
+      res = f(var_dict)
+      assert res.format == "csr" and res.shape == (n + 1, n)
+      assert np.allclose(res.toarray(), expected)
+      point = {f"x{i}": np.cos(i) for i in range(n)}
+      assert np.allclose(f(point, format="coo").toarray(), jacobian(functions, point).jacobian)
+    assert np.allclose(sparse_jacobian("x1 * x2", {"x1": 2, "x2": 3}).toarray(), [[3, 2]])
+    with self.assertRaises(ValueError):
+      SparseJacobian("x1", {"x1": 1}, mode="sideways")
+    with self.assertRaises(ValueError):
+      sparse_jacobian("x1", {"x1": 1}, format="dense")
+
+  def test_auto_diff_batch(self):
+    functions = ["x1 * x2 + sin(x1)", "exp(x2) / x1", "3"]
+    rows = np.array([[0.5, 2.0], [1.0, -1.0], [2.0, 0.0]])
+    expected = np.array([jacobian(functions, {"x1": x1, "x2": x2}).jacobian for x1, x2 in rows])
+    res = auto_diff_batch(functions, rows, variables=["x1", "x2"])
+    assert res.shape == (3, 3, 2)
+    assert np.allclose(res, expected)
+    assert np.allclose(auto_diff_batch(functions, {"x1": rows[:, 0], "x2": rows[:, 1]}), expected)
+    points = [{"x1": x1, "x2": x2} for x1, x2 in rows]
+    assert np.allclose(auto_diff_batch(functions, points, ["x2"]), expected[:, :, 1:])
+    f = lambda x1, x2: x1 * x2
+    res = auto_diff_batch(f, points)
+    assert np.allclose(res[:, 0, :], rows[:, ::-1])
+    for mode in ["reverse", "auto"]:
+      assert np.allclose(auto_diff_batch(functions, rows, variables=["x1", "x2"], mode=mode), expected)
+      assert np.allclose(auto_diff_batch(functions, points, ["x2"], mode=mode), expected[:, :, 1:])
+    with self.assertRaises(ValueError):
+      auto_diff_batch(functions, points, mode="sideways")
+    with self.assertRaises(ValueError):
+      auto_diff_batch(functions, rows)
+    with self.assertRaises(ValueError):
+      auto_diff_batch(functions, [{"x1": 1, "x2": 2}, {"x1": 1}])
+    with self.assertRaises(ValueError):
+      auto_diff_batch(functions, points, ["x3"])
+
+  def test_auto_diff_batch_workers(self):
+    functions = ["x1 * x2 + sin(x1)", "exp(x2) / x1"]
+    rows = np.random.default_rng(0).uniform(0.5, 2.0, size=(50, 2))
+    expected = auto_diff_batch(functions, rows, variables=["x1", "x2"])
+    res = auto_diff_batch(functions, rows, ["x2"], variables=["x1", "x2"], n_workers=2)
+    assert np.allclose(res, expected[:, :, 1:])
+    res = auto_diff_batch(functions, rows, variables=["x1", "x2"], n_workers=2, mode="reverse")
+    assert np.allclose(res, expected)
+    with self.assertRaises(ValueError):
+      auto_diff_batch(functions, rows, variables=["x1", "x2"], n_workers=0)
+    method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force=True)
+    try:
+      with self.assertWarns(RuntimeWarning):
+        res = auto_diff_batch(lambda x1, x2: [x1 * x2 + sin(x1), exp(x2) / x1], rows, variables=["x1", "x2"], n_workers=2)
+    finally:
+      multiprocessing.set_start_method(method, force=True)
+    assert np.allclose(res, expected)
+
+  def test_auto_diff_stream(self):
+    functions = ["x1 * x2 + sin(x1)", "exp(x2) / x1"]
+    rows = np.random.default_rng(0).uniform(0.5, 2.0, size=(25, 2))
+    expected = auto_diff_batch(functions, rows, variables=["x1", "x2"])
+    with tempfile.TemporaryDirectory() as folder:
+      npy, csv, out = [os.path.join(folder, name) for name in ["points.npy", "points.csv", "out.npy"]]
+      np.save(npy, rows)
+      np.savetxt(csv, rows, delimiter=",", header="x1,x2", comments="")
+      chunks = list(auto_diff_stream(functions, npy, variables=["x1", "x2"], chunk_size=10))
+      assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+      assert np.allclose(np.concatenate(chunks), expected)
+      chunks = list(auto_diff_stream(functions, csv, ["x2"], chunk_size=10, mode="reverse", n_workers=2, dtype=np.float32))
+      assert [len(chunk) for chunk in chunks] == [10, 10, 5] and chunks[0].dtype == np.float32
+      assert np.allclose(np.concatenate(chunks), expected[:, :, 1:], rtol=1e-5)
+      res = auto_diff_to_file(functions, csv, out, ["x2"], chunk_size=7)
+      assert res.shape == (25, 2, 1)
+      assert np.allclose(np.load(out), expected[:, :, 1:])
+      del res
+      res = auto_diff_to_file(functions, npy, out, variables=["x1", "x2"], chunk_size=7, mode="reverse", dtype="float32")
+      assert res.dtype == np.float32 and np.load(out).dtype == np.float32
+      assert np.allclose(np.load(out), expected, rtol=1e-5)
+      del res
+
+  def test_python_functions(self):
+    def f(x1, x2):
+      y = x1 * x2
+      return [y + sin(x1),
+              exp(x2) / x1, 3]
+    var_dict = {"x1": 0.5, "x2": 2.0}
+    expected = jacobian(["x1 * x2 + sin(x1)", "exp(x2) / x1", "3"], var_dict)
+    for mode in ["forward", "reverse", "auto"]:
+      res = jacobian(f, var_dict, mode=mode)
+      assert np.allclose(res.jacobian, expected.jacobian)
+      assert np.allclose(res.value, expected.value)
+    # functions without source code, such as ones built at run time, are supported too
+    g = eval("lambda x1, x2: x1 * x2", {})
+    assert np.allclose(auto_diff(g, var_dict, mode="reverse"), [[2.0, 0.5]])
+    assert np.allclose(hessian(g, var_dict), [[0, 1], [1, 0]])
+    assert np.allclose(auto_diff_batch(f, {"x1": [0.5, 1.0], "x2": [2.0, 1.0]})[0], expected.jacobian)
+
+if __name__ == "__main__":
+  unittest.main()
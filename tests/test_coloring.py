@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tape import Tape
+from AutoDiff.coloring import sparsity_pattern, color_columns, color_rows
+from AutoDiff.utils import *
+
+class ColoringTests(unittest.TestCase):
+
+  def test_sparsity_pattern(self):
+    with Tape(record_ops=True) as tape:
+      x = [ReverseNode(1.0) for _ in range(4)]
+      y = [x[0] * x[1], sin(x[2] * 0), 2.0, x[3], x[0] + x[0] ** 2]
+    rows, cols = sparsity_pattern(y, x, tape)
+    assert rows.tolist() == [0, 0, 1, 3, 4] and cols.tolist() == [0, 1, 2, 3, 0]
+    rows, cols = sparsity_pattern([2.0], x, tape)
+    assert len(rows) == 0 and len(cols) == 0
+
+  def test_color_columns(self):
+    # tridiagonal pattern needs 3 colors whatever its size
+    n = 50
+    rows = np.array([i for i in range(n) for j in range(max(i - 1, 0), min(i + 2, n))])
+    cols = np.array([j for i in range(n) for j in range(max(i - 1, 0), min(i + 2, n))])
+    colors = color_columns(rows, cols, (n, n))
+    assert colors.max() + 1 == 3
+    for i in range(n):
+      row = cols[rows == i]
+      assert len(set(colors[row].tolist())) == len(row)
+    assert color_columns(np.array([0, 0]), np.array([0, 1]), (1, 2)).tolist() in ([0, 1], [1, 0])
+    assert color_columns(np.array([], dtype=int), np.array([], dtype=int), (2, 3)).tolist() == [0, 0, 0]
+
+  def test_color_rows(self):
+    rows, cols = np.array([0, 1, 2, 2]), np.array([0, 1, 0, 2])
+    colors = color_rows(rows, cols, (3, 3))
+    assert colors[0] != colors[2] and colors.max() + 1 == 2
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode, reverse_jacobian
+from AutoDiff.sparseTrace import SparseTrace
+from AutoDiff.tape import Tape
+from AutoDiff.dtypes import resolve_dtype, get_default_dtype, set_default_dtype
+from AutoDiff.ad import init_trace, create_node, jacobian, auto_diff_batch, jvp, vjp, hessian, hvp
+from AutoDiff.utils import *
+
+# NumPy 1 widens float32 scalars combined with Python floats, NumPy 2 keeps them (NEP 50)
+SCALARS_KEEP_DTYPE = isinstance(np.float32(1.0) * 2.5, np.float32)
+
+class DtypeTests(unittest.TestCase):
+
+  def test_resolve_dtype(self):
+    assert resolve_dtype(None) == get_default_dtype() == np.float64
+    assert resolve_dtype("float32") == np.float32 and resolve_dtype(np.float32) == np.float32
+    for dtype in [np.int64, "int32", "not a type"]:
+      with self.assertRaises(TypeError):
+        resolve_dtype(dtype)
+
+  def test_set_default_dtype(self):
+    previous = set_default_dtype("float32")
+    try:
+      assert init_trace("x1", ["x1", "x2"]).dtype == np.float32
+      assert init_trace("x1", ["x1", "x2"], sparse=True).data.dtype == np.float32
+      assert Tape().partials.dtype == np.float32
+      assert jacobian("x1 * exp(x2)", {"x1": 1, "x2": 0}).jacobian.dtype == np.float32
+      var_dict = {"x1": 1, "x2": 0}
+      assert jvp("x1 * exp(x2)", var_dict, [1, 0]).dtype == vjp("x1 * exp(x2)", var_dict, [1]).dtype == np.float32
+      assert hessian("x1 * exp(x2)", var_dict).dtype == hvp("x1 * exp(x2)", var_dict, [1, 0]).dtype == np.float32
+    finally:
+      set_default_dtype(previous)
+    assert init_trace("x1", ["x1", "x2"]).dtype == np.float64
+
+  def test_nodes(self):
+    x = ForwardNode(2, [1, 0], ["x1", "x2"], dtype=np.float32)
+    assert isinstance(x.value, np.float32) and x.trace.dtype == np.float32
+    y = sin(x) * 3 + x ** 2 / 2.5 - log_base(x, 10)
+    assert y.trace.dtype == np.float32
+    assert isinstance(y.value, np.float32) or not SCALARS_KEEP_DTYPE
+    # mixing float32 with float64 widens to float64, Python numbers do not
+    z = x * ForwardNode(np.float64(3.0), [0.0, 1.0], ["x1", "x2"])
+    assert z.trace.dtype == np.float64
+    x = ForwardNode(np.array([1.0, 2.0]), np.array([1.0, 0.0]), ["x1", "x2"], dtype="float32")
+    assert (exp(x) * 2 ** x).trace.dtype == np.float32
+    s = ForwardNode(1.0, SparseTrace([0], [1.0], 5), ["x1"], dtype=np.float32)
+    assert s.trace.data.dtype == np.float32
+    r = ReverseNode(2, dtype=np.float32)
+    out = sqrt(r) * r + 3 ** r
+    assert isinstance(out.value, np.float32) or not SCALARS_KEEP_DTYPE
+    assert reverse_jacobian([out], [r], dtype=np.float32).dtype == np.float32
+    assert isinstance(create_node("x1", 1, ["x1"], dtype=np.float32).value, np.float32)
+
+  def test_float32_results(self):
+    functions = ["x1 * x2 + sin(x1)", "exp(x2) / x1", "3"]
+    var_dict = {"x1": 0.5, "x2": 2.0}
+    for mode in ["forward", "reverse"]:
+      res = jacobian(functions, var_dict, mode=mode, dtype=np.float32)
+      assert res.value.dtype == np.float32 and res.jacobian.dtype == np.float32
+      assert np.allclose(res.jacobian, jacobian(functions, var_dict, mode=mode).jacobian, rtol=1e-6)
+    points = {"x1": [0.5, 1.0, 2.0], "x2": [2.0, -1.0, 0.0]}
+    res = auto_diff_batch(functions, points, dtype=np.float32)
+    assert res.dtype == np.float32
+    assert np.allclose(res, auto_diff_batch(functions, points), rtol=1e-6)
+    assert auto_diff_batch(functions, points, n_workers=2, dtype=np.float32).dtype == np.float32
+    V, U = np.array([[1.0, 0.0], [2.0, -1.0]]), np.array([[1.0], [2.0], [0.5]])
+    for product, seeds in [(jvp, V), (vjp, U)]:
+      res = product(functions, var_dict, seeds, dtype=np.float32)
+      assert res.dtype == np.float32 and np.allclose(res, product(functions, var_dict, seeds), rtol=1e-6)
+    res = hessian("x1 ** 2 * exp(x2)", var_dict, dtype=np.float32)
+    assert res.dtype == np.float32 and np.allclose(res, hessian("x1 ** 2 * exp(x2)", var_dict), rtol=1e-6)
+
+if __name__ == "__main__":
+  unittest.main()
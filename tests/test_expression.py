@@ -0,0 +1,144 @@
+import unittest
+import numpy as np
+
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode
+import ast
+from AutoDiff.expression import Expression, _compile, _compile_all, _parse
+from AutoDiff.ad import compile_functions, gradientR, forward_auto_diff, reverse_auto_diff, auto_diff
+from AutoDiff.profiler import profile
+
+class ExpressionTests(unittest.TestCase):
+
+  def test_init(self):
+    f = Expression("x1 * x2", ["x1", "x2"])
+    assert f.functions == ["x1 * x2"]
+    assert f.variables == ["x1", "x2"]
+    assert len(f.compiled) == 1
+
+  def test_init_fail(self):
+    with self.assertRaises(TypeError):
+      Expression([1, "x1"], ["x1"])
+    with self.assertRaises(TypeError):
+      Expression("x1", ["not a name"])
+
+  def test_cache(self):
+    _compile.cache_clear()
+    _compile_all.cache_clear()
+    Expression(["x1 * x2", "exp(x1)"], ["x1", "x2"])
+    f = Expression(["x1 * x2", "exp(x1)"], ["x1", "x2"])
+    info = _compile_all.cache_info()
+    assert info.misses == 1 and info.hits == 1
+    # the functions are only compiled one by one on demand
+    assert _compile.cache_info().misses == 0
+    assert len(f.compiled) == 2 and f.compiled is f.compiled
+    Expression(["x1 * x2", "exp(x1)"], ["x1", "x2"]).compiled
+    info = _compile.cache_info()
+    assert info.misses == 2 and info.hits == 2
+    # the variable order is part of the key
+    f = Expression("x1 - x2", ["x2", "x1"])
+    assert f(1, 5) == [4]
+    assert _compile_all.cache_info().misses == 2
+
+  def test_evaluate(self):
+    f = Expression(["x1 + sin(x2) * 5", "exp(x1) - log(2 * x2)"], ["x1", "x2"])
+    res = f.evaluate({"x1": 5, "x2": 2})
+    assert [round(r, 4) for r in res] == [9.5465, 147.0269]
+    res = f.evaluate({"x1": 0, "x2": 0.5})
+    assert [round(r, 4) for r in res] == [2.3971, 1.0]
+    with self.assertRaises(ValueError):
+      f.evaluate({"x1": 0})
+
+  def test_forward(self):
+    f = Expression(["x1 * x2", "np.pi * x1"], ["x1", "x2"])
+    y1, y2 = f.forward({"x1": 3, "x2": 4})
+    assert isinstance(y1, ForwardNode)
+    assert y1.value == 12 and all(y1.trace == [4, 3]) and y1.var == ["x1", "x2"]
+    assert all(y2.trace == [np.pi, 0])
+
+  def test_call_reverse(self):
+    f = Expression("x1 * x2", ["x1", "x2"])
+    x1, x2 = ReverseNode(3), ReverseNode(4)
+    y = f(x1, x2)[0]
+    assert y.value == 12 and x1.gradient() == 4 and x2.gradient() == 3
+
+  def test_compile_functions(self):
+    f = compile_functions("x1 * x2", ["x1", "x2"])
+    assert compile_functions(f, ["x1", "x2"]) is f
+    g = compile_functions(f, ["x2", "x1"])
+    assert g is not f and g.variables == ["x2", "x1"]
+
+  def test_reuse(self):
+    f = compile_functions(["x1 * x2", "exp(x1) * x2"], ["x1", "x2"])
+    for x1, x2 in [(1, 2), (0.5, -1)]:
+      var_dict = {"x1": x1, "x2": x2}
+      jcb = [[x2, x1], [np.exp(x1) * x2, np.exp(x1)]]
+      assert np.allclose(gradientR(f, var_dict), jcb)
+      assert np.allclose(forward_auto_diff(f, var_dict), jcb)
+      assert np.allclose(reverse_auto_diff(f, var_dict), jcb)
+      assert np.allclose(auto_diff(f, var_dict, mode="reverse"), jcb)
+
+  def test_shared_subexpressions(self):
+    f = compile_functions(["exp(x1) + x2", "exp(x1) * x2", "sin(x1 * x2) - x1 * x2"], ["x1", "x2"])
+    var_dict = {"x1": 0.5, "x2": 2}
+    jcb = [[np.exp(0.5), 1], [2 * np.exp(0.5), np.exp(0.5)], [2 * np.cos(1) - 2, 0.5 * np.cos(1) - 0.5]]
+    with profile() as p:
+      assert np.allclose(forward_auto_diff(f, var_dict), jcb)
+    assert p.calls["exp"] == 1 and p.calls["sin"] == 1 and p.calls["ForwardNode.__mul__"] == 2
+    with profile() as p:
+      assert np.allclose(reverse_auto_diff(f, var_dict), jcb)
+    assert p.calls["exp"] == 1 and p.calls["ReverseNode.__mul__"] == 2
+    assert f.evaluate(var_dict) == [f_i(0.5, 2) for f_i in f.compiled]
+
+  def test_shared_subexpressions_conditional(self):
+    f = Expression(["log(x1) if x1 > 0 else x1", "x1 * 2 if x1 > 0 else log(-x1)"], ["x1"])
+    assert f.evaluate({"x1": 1}) == [0, 2]
+    assert f.evaluate({"x1": -1}) == [-1, 0]
+    g = Expression(["_cse0 * exp(x1)", "exp(x1)"], ["x1", "_cse0"])
+    assert g.evaluate({"x1": 0, "_cse0": 3}) == [3, 1]
+
+  def test_shared_subexpressions_impure(self):
+    # calls of anything but the package functions and primitives are evaluated every time they appear
+    f = _compile_all(("np.random.rand() - np.random.rand()",), ("x1",))
+    assert any([f(1.0) != [0.0] for _ in range(10)])
+    g = _compile_all(("np.random.rand() * x1", "np.random.rand() * x1", "exp(x1)", "exp(x1) + 1"), ("x1",))
+    values = g(1.0)
+    assert values[0] != values[1] and values[3] == values[2] + 1
+
+  def test_long_expression(self):
+    n = 2000
+    variables = [f"x{i}" for i in range(n)]
+    function = " + ".join([f"x{i} * x{(i + 1) % n} * 1" for i in range(n)])
+    f = Expression([function, function + " + 0"], variables)
+    values = dict(zip(variables, np.linspace(0, 1, n)))
+    expected = sum([values[f"x{i}"] * values[f"x{(i + 1) % n}"] for i in range(n)])
+    assert np.allclose(f.evaluate(values), [expected, expected])
+    x = [ReverseNode(values[var]) for var in variables]
+    y = f(*x)[0]
+    assert np.isclose(y.value, expected) and np.isclose(x[1].gradient(), values["x0"] + values["x2"])
+
+  def test_simplify(self):
+    cases = {"np.pi / 2 * 3": repr(np.pi / 2 * 3), "x1 * 1 + 0": "x1", "1.0 * x1 - 0 * 1": "x1", "0 - x1 ** 1": "-x1",
+             "x1 * (2 + 3)": "x1 * 5", "--x1 / +x2": "x1 / x2", "exp(0) * sin(x1)": "sin(x1)", "x1 * 0": "x1 * 0",
+             "x1 / 0": "x1 / 0"}
+    for function, simplified in cases.items():
+      assert ast.dump(_parse(function, ("x1", "x2"))) == ast.dump(ast.parse(simplified, mode="eval").body)
+    assert ast.dump(_parse("np.pi * 2", ("np",))) == ast.dump(ast.parse("np.pi * 2", mode="eval").body)
+    # the sign of -1 is folded into the constant, but the call raising an error is kept
+    folded = _parse("log(-1) + x1", ("x1",))
+    assert isinstance(folded.left, ast.Call) and folded.left.func.id == "log" and folded.left.args[0].value == -1
+    with self.assertRaises(ValueError):
+      Expression("log(-1) + x1", ["x1"]).evaluate({"x1": 1})
+
+  def test_simplify_derivatives(self):
+    f = compile_functions(["x1 * 1 + 0", "np.pi / 2 * x2 ** 1", "np.e ** 2"], ["x1", "x2"])
+    var_dict = {"x1": 2, "x2": 3}
+    jcb = [[1, 0], [0, np.pi / 2], [0, 0]]
+    assert np.allclose(f.evaluate(var_dict), [2, np.pi * 1.5, np.e ** 2])
+    with profile() as p:
+      assert np.allclose(forward_auto_diff(f, var_dict), jcb)
+    assert p.calls == {"ForwardNode.__rmul__": 1}
+    assert np.allclose(reverse_auto_diff(f, var_dict), jcb)
+
+if __name__ == "__main__":
+  unittest.main()
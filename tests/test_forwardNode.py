@@ -38,6 +38,32 @@ class ForwardNodeTests(unittest.TestCase):
       ForwardNode(2, trace=1, var=1)
     self.assertRaises(TypeError, init_var_nonstring)
 
+  def test_init_float32(self):
+    func = ForwardNode(2.0, trace=np.array([1.0, 0.0], dtype=np.float32), var=["x1", "x2"])
+    assert func.trace.dtype == np.float32
+    with self.assertRaises(TypeError):
+      ForwardNode(2.0, trace=np.array(["a", "b"]), var=["x1", "x2"])
+
+  def test_make(self):
+    func = ForwardNode._make(2.0, np.array([1.0, 0.0]), ["x1", "x2"])
+    assert func.value == 2.0 and all(func.trace == [1.0, 0.0]) and func.var == ["x1", "x2"]
+    assert not hasattr(func, "__dict__")
+    y = func * func + 1
+    assert type(y) is ForwardNode and y.value == 5.0 and all(y.trace == [4.0, 0.0])
+
+  def test_init_batch(self):
+    value = np.array([1.0, 2.0, 3.0])
+    func = ForwardNode(value, trace=np.array([1.0, 0.0]), var=["x1", "x2"])
+    assert func.trace.shape == (3, 2) and all(func.trace[:, 0] == 1) and all(func.trace[:, 1] == 0)
+    func = ForwardNode(value, trace=np.ones((3, 2)), var=["x1", "x2"])
+    assert func.trace.shape == (3, 2)
+    with self.assertRaises(ValueError):
+      ForwardNode(value, trace=np.ones((2, 2)), var=["x1", "x2"])
+    with self.assertRaises(TypeError):
+      ForwardNode(value, trace=[1.0, 0.0], var=["x1", "x2"])
+    with self.assertRaises(TypeError):
+      ForwardNode(np.ones((2, 2)), trace=np.ones(2), var=["x1", "x2"])
+
   def test_add(self):
     value = 5.0
     trace = [1.0, 1.0, 0.0]
@@ -539,6 +565,36 @@ class ForwardNodeTests(unittest.TestCase):
 
     assert [[round(r, 4) for r in row] for row in jcb] == [[3, 6, -54.5982], [3.5431, 34.4572, -0.9894]]
 
+  def test_batch(self):
+    variables = ['x1', 'x2']
+    points = np.array([[0.5, 1.5], [0.2, 2.0], [0.9, 0.3], [0.1, 4.0]])
+
+    def f(x1, x2):
+      return [sin(2 * x1) / cos(x2 / 7) + x1 ** 3 - 2 ** x2 + x1 ** x2,
+              exp(x1) * sqrt(x2) + tan(x1) - log(x2) / x1 + 1 / x2,
+              arcsin(x1) + arccos(x1) * arctan(x2) + sinh(x2) - cosh(x1) * tanh(x2),
+              sec(x1) + csc(x2) + cot(x2) - log_base(x2, 2) + (-x1) - 3 + x2]
+
+    x1 = create_node('x1', points[:, 0], variables)
+    x2 = create_node('x2', points[:, 1], variables)
+    jcb = gradientF(f(x1, x2), variables)
+    assert jcb.shape == (4, 4, 2)
+    for b, (v1, v2) in enumerate(points):
+      y = f(create_node('x1', v1, variables), create_node('x2', v2, variables))
+      assert np.allclose(jcb[b], gradientF(y, variables))
+    grad = gradientF(f(x1, x2)[0], variables)
+    assert grad.shape == (4, 2) and np.allclose(grad, jcb[:, 0, :])
+    assert np.allclose(gradientF(f(x1, x2)[1], variables, target='x2'), jcb[:, 1, 1])
+
+  def test_batch_domain_error(self):
+    x = create_node('x1', np.array([1.0, -1.0]), ['x1'])
+    with self.assertRaises(ValueError):
+      log(x)
+    with self.assertRaises(ValueError):
+      sqrt(x)
+    with self.assertRaises(ValueError):
+      x ** 0.5
+
   def test_forward_auto_diff(self):
     functions = ["x1 + sin(x2) * 5", "exp(x1) - log(2 * x2)"]
     var_dict = {"x1": 5, "x2": 2}
@@ -0,0 +1,129 @@
+import pickle
+import unittest
+import numpy as np
+
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tensorNode import TensorNode, tensor_gradient
+from AutoDiff.tape import Tape
+from AutoDiff.primitive import Primitive, evaluate, elementary, domain, primitive
+from AutoDiff.ad import hessian, auto_diff, jacobian
+from AutoDiff.utils import *
+
+@primitive(derivative=lambda x, y, value: (x / value, y / value))
+def hypot(x, y):
+  return np.hypot(x, y)
+
+class PrimitiveTests(unittest.TestCase):
+
+  def test_input_types(self):
+    calls = []
+
+    @elementary(derivative=lambda a, value: 3 * value / a, domain=domain(lambda a: a < 0, "negative {0}"))
+    def cube(a):
+      calls.append(a)
+      return a ** 3
+
+    assert cube(2.0) == 8.0 and np.allclose(cube(np.array([1.0, 2.0])), [1, 8])
+    x = cube(ForwardNode(2.0, [1.0, 0.0], ["x1", "x2"]))
+    assert x.value == 8.0 and all(x.trace == [12.0, 0.0])
+    r = ReverseNode(2.0)
+    y = cube(r)
+    assert y.value == 8.0 and r.gradient() == 12.0
+    t = TensorNode(np.array([1.0, 2.0]))
+    dt, = tensor_gradient(cube(t).sum(), [t])
+    assert np.allclose(dt, [3, 12])
+    # the value is computed once per evaluation and shared with the derivative
+    calls.clear()
+    cube(ForwardNode(1.5, 1.0, "x"))
+    assert len(calls) == 1
+    with self.assertRaises(ValueError):
+      cube(ReverseNode(-1.0))
+    with self.assertRaises(AttributeError):
+      cube("x")
+
+  def test_register_type(self):
+    class Interval():
+      def __init__(self, low, high):
+        self.low, self.high = low, high
+
+    @evaluate.register(Interval)
+    def _(node, primitive, params):
+      # monotonic primitives only, enough for this test
+      return Interval(primitive(node.low, *params), primitive(node.high, *params))
+
+    res = exp(Interval(0.0, 1.0))
+    assert res.low == 1.0 and res.high == np.e
+    assert log_base(Interval(1.0, 100.0), 10).high == 2.0
+
+  def test_derivative_domain(self):
+    assert arcsin(1.0) == np.pi / 2
+    with self.assertRaises(ValueError):
+      arcsin(ForwardNode(1.0, 1.0, "x"))
+    with self.assertRaises(ValueError):
+      arcsin(1.5)
+
+  def test_tape_replay(self):
+    with Tape(record_ops=True) as tape:
+      x = ReverseNode(0.5)
+      y = tan(x) * sec(x) + log_base(x, 2)
+    tape.replay({x.index: 0.25})
+    expected = (1 + np.tan(0.25) ** 2) / np.cos(0.25) + np.tan(0.25) * np.tan(0.25) / np.cos(0.25) + 1 / (0.25 * np.log(2))
+    assert np.isclose(tape.adjoints()[x.index], expected)
+
+  def test_second_derivatives(self):
+    # the derivative rules are written with the primitives, so they also hold for dual numbers
+    for function, second in [("tanh(x1)", lambda a: -2 * np.tanh(a) / np.cosh(a) ** 2),
+                             ("cot(x1)", lambda a: 2 * np.cos(a) / np.sin(a) ** 3),
+                             ("sqrt(x1)", lambda a: -0.25 * a ** -1.5)]:
+      assert np.isclose(hessian(function, {"x1": 0.7})[0, 0], second(0.7))
+
+  def test_pickle(self):
+    assert pickle.loads(pickle.dumps(sin)) is sin
+    assert repr(sin) == "Primitive sin" and sin.__name__ == "sin" and "sin" in sin.__doc__
+
+  def test_custom_primitive(self):
+    x = hypot(ForwardNode(3.0, [1.0, 0.0], ["x1", "x2"]), ForwardNode(4.0, [0.0, 1.0], ["x1", "x2"]))
+    assert x.value == 5.0 and np.allclose(x.trace, [0.6, 0.8])
+    assert np.allclose(hypot(ForwardNode(3.0, 1.0, "x"), 4.0).trace, [0.6])
+    with Tape(record_ops=True) as tape:
+      r = ReverseNode(4.0)
+      y = hypot(3.0, r)
+    assert y.value == 5.0 and len(tape.ops) == 1
+    assert np.allclose(tape.adjoints({y.index: 1.0})[r.index], 0.8)
+    a, b = TensorNode(np.array([3.0, 5.0])), TensorNode(np.array([4.0, 12.0]))
+    da, db = tensor_gradient(hypot(a, b).sum(), [a, b])
+    assert np.allclose(da, [0.6, 5 / 13]) and np.allclose(db, [0.8, 12 / 13])
+    with self.assertRaises(AttributeError):
+      hypot(ForwardNode(3.0, 1.0, "x"), ReverseNode(4.0))
+    with self.assertRaises(ValueError):
+      primitive()(np.hypot)
+
+  def test_custom_rules(self):
+    @primitive(jvp=lambda x, y, value, dx, dy: (x * dx + y * dy) / value)
+    def hypot_jvp(x, y):
+      return np.hypot(x, y)
+
+    @primitive(vjp=lambda x, y, value, grad: (grad * x / value, grad * y / value))
+    def hypot_vjp(x, y):
+      return np.hypot(x, y)
+
+    var_dict = {"x1": 3.0, "x2": 4.0}
+    for function in ["hypot_jvp(x1, x2)", "hypot_vjp(x1, x2)"]:
+      for mode in ["forward", "reverse"]:
+        assert np.allclose(auto_diff(function, var_dict, mode=mode), [[0.6, 0.8]])
+    a, b = TensorNode(np.array([3.0, 5.0])), TensorNode(np.array([4.0, 12.0]))
+    assert np.allclose(tensor_gradient(hypot_vjp(a, b).sum(), [a, b])[1], [0.8, 12 / 13])
+
+  def test_custom_strings(self):
+    var_dict = {"x1": 3.0, "x2": 4.0}
+    assert np.allclose(auto_diff("hypot(x1, x2) * x1", var_dict, mode="reverse"), [[5 + 1.8, 2.4]])
+    assert np.allclose(jacobian(["hypot(x1, 4)", "hypot(x2, x1)"], var_dict).jacobian, [[0.6, 0], [0.6, 0.8]])
+    assert np.allclose(hessian("hypot(x1, x2)", var_dict), np.array([[16, -12], [-12, 9]]) / 125)
+    with self.assertRaises(ValueError):
+      @primitive(derivative=lambda a, value: cos(a))
+      def sin(a):
+        return np.sin(a)
+
+if __name__ == "__main__":
+  unittest.main()
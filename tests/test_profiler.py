@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tensorNode import TensorNode, tensor_gradient
+from AutoDiff.profiler import profile
+from AutoDiff.utils import *
+from AutoDiff.ad import auto_diff, jacobian
+
+class ProfilerTests(unittest.TestCase):
+
+  def test_counts(self):
+    with profile() as p:
+      x = ReverseNode(2.0)
+      y = sin(x) * x + x
+      x.gradient()
+    assert p.calls == {'sin': 1, 'ReverseNode.__mul__': 1, 'ReverseNode.__add__': 1}
+    assert p.nodes == 4
+    assert p.edges == 5
+    assert p.peak_live_nodes == 4
+    assert p.backward_time > 0 and p.forward_time > 0
+    res = p.as_dict()
+    assert res['primitives']['sin']['calls'] == 1
+    assert res["edges"] == 5
+
+  def test_string_functions(self):
+    with profile() as p:
+      jacobian(["x1 * x2 + exp(x1)", "x1 / x2"], {"x1": 1.0, "x2": 2.0}, mode="forward")
+      jacobian(["x1 * x2"], {"x1": 1.0, "x2": 2.0}, mode="reverse")
+    assert p.calls['exp'] == 1
+    assert p.calls['ForwardNode.__mul__'] == 1
+    assert p.calls['ForwardNode.__truediv__'] == 1
+    assert p.calls['ReverseNode.__mul__'] == 1
+    assert p.backward_time > 0
+
+  def test_tensor(self):
+    with profile() as p:
+      w = TensorNode(np.ones(3))
+      loss = ((np.ones((5, 3)) @ w) ** 2).sum()
+      tensor_gradient(loss, [w])
+    assert p.calls == {'TensorNode.__rmatmul__': 1, 'TensorNode.__pow__': 1, 'TensorNode.sum': 1}
+    assert p.nodes == 4 and p.edges == 3
+
+  def test_restore(self):
+    mul, original_sin = ReverseNode.__mul__, sin
+    with profile() as p:
+      assert ReverseNode.__mul__ is not mul
+      with self.assertRaises(RuntimeError):
+        with profile():
+          pass
+    assert ReverseNode.__mul__ is mul
+    assert sin is original_sin
+    assert '__del__' not in ReverseNode.__dict__
+    x = ReverseNode(1.0)
+    x * 2
+    assert p.nodes == 0
+
+  def test_table(self):
+    with profile() as p:
+      x = ForwardNode(1.0)
+      cos(x) + sin(x) * sin(x)
+    table = p.table(sort='calls')
+    assert table.splitlines()[3].split()[0] == '2'
+    assert table.splitlines()[3].split()[-1] == 'sin'
+    with self.assertRaises(ValueError):
+      p.table(sort='name')
+
+if __name__ == "__main__":
+  unittest.main()
@@ -6,7 +6,7 @@ import numpy as np
 #sys.path.append('../AutoDiff')
 #sys.path.append('AutoDiff')
 
-from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.reverseNode import ReverseNode, reverse_jacobian
 from AutoDiff.utils import *
 from AutoDiff.ad import gradientR, reverse_auto_diff, auto_diff, translate
 
@@ -420,6 +420,29 @@ class ReverseNodeTests(unittest.TestCase):
     assert round(x.gradient(), 4) == 16.4427
     assert y1 > y2
 
+  def test_gradient_reset_zero(self):
+    x = ReverseNode(1.0)
+    x.gradient_reset(0)
+    assert x.value == 0
+    y = x * 3 + exp(x)
+    assert x.gradient() == 4.0
+
+  def test_gradient_shared_subterms(self):
+    x = ReverseNode(1.0)
+    y = x
+    # 2 ** 200 distinct paths from x to the output
+    for _ in range(200):
+      y = y + y
+    assert x.gradient() == 2.0 ** 200
+
+  def test_gradient_deep_graph(self):
+    x = ReverseNode(0.5)
+    y = x
+    for _ in range(20000):
+      y = y * 1.0 + 0.0
+    assert y.value == 0.5
+    assert x.gradient() == 1.0
+
   def test_derivative(self):
     var_dict = {"x1": 2}
     functions = "3 * x1 + x1 ** 2 - exp(x1)"
@@ -452,6 +475,33 @@ class ReverseNodeTests(unittest.TestCase):
 
     assert [[round(r, 4) for r in row] for row in res] == [[3, 6, -54.5982], [3.5431, 34.4572, -0.9894]]
 
+  def test_reverse_jacobian(self):
+    x1 = ReverseNode(2)
+    x2 = ReverseNode(3)
+    shared = x1 * x2
+    y1 = shared + sin(shared)
+    y2 = exp(shared) * x1
+    jcb = reverse_jacobian([y1, y2, 5.0, x2], [x1, x2])
+    d1 = 1 + np.cos(6)
+    assert np.allclose(jcb, [[3 * d1, 2 * d1], [np.exp(6) * (3 * 2 + 1), np.exp(6) * 4], [0, 0], [0, 1]])
+
+  def test_gradient_unused_variable(self):
+    var_dict = {'x1': 1, 'x2': 2}
+    res = gradientR(["x1 * x2", "exp(x1)"], var_dict)
+    assert np.allclose(res, [[2, 1], [np.e, 0]])
+
+  def test_gradient_tape(self):
+    var_dict = {'x1': 2, 'x2': 3, 'x3': 4}
+    functions = ["3 * x1 + x2 ** 2 - exp(x3)", "log(x1) / sin(x2) + cos(x3) ** 2"]
+    res = gradientR(functions, var_dict, target=["x1", "x3"], tape=True)
+    assert np.allclose(res, gradientR(functions, var_dict)[:, [0, 2]])
+
+  def test_reverse_auto_diff_targets(self):
+    functions = ["x1 * x2 * x3", "x1 + 2 * x2 + 3 * x3"]
+    var_dict = {"x1": 2, "x2": 3, "x3": 4}
+    res = reverse_auto_diff(functions, var_dict, ["x3", "x1"])
+    assert [list(r) for r in res] == [[6.0, 3.0], [12.0, 1.0]]
+
   def test_reverse_auto_diff(self):
     functions = ["x1 + sin(x2) * 5", "exp(x1) - log(2 * x2)"]
     var_dict = {"x1": 5, "x2": 2}
@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+
+from AutoDiff.forwardNode import ForwardNode
+from AutoDiff.sparseTrace import SparseTrace, SPARSE_FILL_THRESHOLD
+from AutoDiff.utils import *
+from AutoDiff.ad import init_trace, create_node, gradientF
+from AutoDiff.expression import Expression
+
+try:
+  import scipy.sparse
+  HAS_SCIPY = True
+except ImportError:
+  HAS_SCIPY = False
+
+class SparseTraceTests(unittest.TestCase):
+
+  def test_init(self):
+    trace = SparseTrace([5, 1], [2.0, 3.0], 10)
+    assert list(trace.index) == [1, 5] and list(trace.data) == [3.0, 2.0]
+    assert trace.size == 10 and trace.nnz == 2 and trace.ndim == 1 and trace.shape == (10,)
+    assert trace[5] == 2.0 and trace[0] == 0.0 and trace[-5] == 2.0
+    assert all(trace.toarray() == np.array([0, 3, 0, 0, 0, 2, 0, 0, 0, 0]))
+    assert all(np.asarray(trace) == trace.toarray())
+
+  def test_init_fail(self):
+    with self.assertRaises(ValueError):
+      SparseTrace([10], [1.0], 10)
+    with self.assertRaises(ValueError):
+      SparseTrace([1, 2], [1.0], 10)
+
+  def test_arithmetic(self):
+    a = SparseTrace([0, 3], [1.0, 2.0], 100)
+    b = SparseTrace([3, 7], [4.0, 5.0], 100)
+    dense = np.arange(100.0)
+    assert isinstance(a + b, SparseTrace)
+    assert all((a + b).toarray() == a.toarray() + b.toarray())
+    assert all((a - b).toarray() == a.toarray() - b.toarray())
+    assert all((-a).toarray() == -a.toarray())
+    assert all((a * 3).toarray() == a.toarray() * 3)
+    assert all((np.float64(3) * a).toarray() == a.toarray() * 3)
+    assert all((a / 2).toarray() == a.toarray() / 2)
+    assert all((a + dense) == a.toarray() + dense)
+    assert all((dense - a) == dense - a.toarray())
+    assert all((a - dense) == a.toarray() - dense)
+    with self.assertRaises(TypeError):
+      a * np.ones(3)
+
+  def test_densify(self):
+    n = 8
+    traces = [SparseTrace([i], [1.0], n) for i in range(n)]
+    total = traces[0]
+    for i in range(1, n):
+      total = total + traces[i]
+      if i + 1 > SPARSE_FILL_THRESHOLD * n:
+        assert isinstance(total, np.ndarray)
+      else:
+        assert isinstance(total, SparseTrace)
+    assert all(total == np.ones(n))
+
+  def test_init_trace(self):
+    trace = init_trace("x2", ["x1", "x2", "x3"], sparse=True)
+    assert isinstance(trace, SparseTrace) and all(trace.toarray() == [0, 1, 0])
+
+  def test_forward(self):
+    variables = [f"x{i}" for i in range(50)]
+    values = np.linspace(0.5, 1.5, 50)
+    def f(x):
+      return [sin(x[0] * x[1]) + exp(x[2]) / x[3], x[10] ** 2 - sqrt(x[11]) * log(x[12]) + 2 ** x[13], 3 - x[49] / 2]
+    dense = f([create_node(v, values[i], variables) for i, v in enumerate(variables)])
+    sparse = f([create_node(v, values[i], variables, sparse=True) for i, v in enumerate(variables)])
+    assert all([isinstance(y.trace, SparseTrace) for y in sparse])
+    assert sparse[0].trace.nnz == 4
+    assert [y.value for y in sparse] == [y.value for y in dense]
+    assert np.allclose(gradientF(sparse, variables), gradientF(dense, variables))
+    assert gradientF(sparse[1], variables, target="x11") == gradientF(dense[1], variables, target="x11")
+
+  def test_expression(self):
+    f = Expression(["x1 * x2", "exp(x3)"], ["x1", "x2", "x3", "x4", "x5"])
+    var_dict = {"x1": 1, "x2": 2, "x3": 3, "x4": 4, "x5": 5}
+    y = f.forward(var_dict, sparse=True)
+    assert isinstance(y[1].trace, SparseTrace)
+    assert np.allclose(gradientF(y, f.variables), gradientF(f.forward(var_dict), f.variables))
+
+  @unittest.skipIf(not HAS_SCIPY, "scipy is not installed")
+  def test_sparse_output(self):
+    variables = [f"x{i}" for i in range(20)]
+    x = [create_node(v, 1.0 + i, variables, sparse=True) for i, v in enumerate(variables)]
+    y = [x[0] * x[1], sin(x[5]), x[19] + 0]
+    jcb = gradientF(y, variables, sparse=True)
+    assert scipy.sparse.issparse(jcb) and jcb.shape == (3, 20) and jcb.nnz == 4
+    assert np.allclose(jcb.toarray(), gradientF(y, variables))
+    x0 = create_node("x0", 2.0, variables)
+    grad = gradientF(x0 * x0, variables, sparse=True)
+    assert grad.shape == (1, 20) and grad[0, 0] == 4.0
+
+if __name__ == "__main__":
+  unittest.main()
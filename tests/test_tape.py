@@ -0,0 +1,130 @@
+import unittest
+import numpy as np
+
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.tape import Tape, active_tape
+from AutoDiff.utils import *
+
+class TapeTests(unittest.TestCase):
+
+  def test_init(self):
+    tape = Tape(capacity=4)
+    assert tape.n_nodes == 0 and tape.n_edges == 0
+    assert len(tape.parents) == 4
+    with self.assertRaises(ValueError):
+      Tape(capacity=0)
+
+  def test_context(self):
+    assert active_tape() is None
+    with Tape() as outer:
+      assert active_tape() is outer
+      with Tape() as inner:
+        assert active_tape() is inner
+      assert active_tape() is outer
+    assert active_tape() is None
+
+  def test_record(self):
+    with Tape() as tape:
+      x1 = ReverseNode(2)
+      x2 = ReverseNode(3)
+      y = x1 * x2
+    assert x1.index == 0 and x2.index == 1 and y.index == 2
+    assert x1.children == () and x1.tape is tape
+    assert list(tape.parents[:2]) == [0, 1]
+    assert list(tape.children[:2]) == [2, 2]
+    assert list(tape.partials[:2]) == [3.0, 2.0]
+    assert len(tape) == 2
+
+  def test_grow(self):
+    with Tape(capacity=2) as tape:
+      x = ReverseNode(1.0)
+      y = x
+      for _ in range(10):
+        y = y * 2
+    assert tape.n_edges == 10 and len(tape.parents) >= 10
+    assert tape.gradient(y, [x])[0] == 2.0 ** 10
+
+  def test_gradient(self):
+    with Tape() as tape:
+      x1 = ReverseNode(2)
+      x2 = ReverseNode(3)
+      y = x1 * x2 + sin(x1) - exp(x2) / x1
+    grad = tape.gradient(y, [x1, x2])
+    assert round(grad[0], 4) == round(3 + np.cos(2) + np.exp(3) / 4, 4)
+    assert round(grad[1], 4) == round(2 - np.exp(3) / 2, 4)
+
+  def test_node_gradient(self):
+    with Tape():
+      x = ReverseNode(1.0)
+      y1 = sin(2 * x) / cos(x / 7) + x ** 5
+    assert round(x.gradient(), 4) == 4.1780
+    assert x.adjoint == x.gradient()
+
+  def test_adjoints_seeds(self):
+    with Tape() as tape:
+      x = ReverseNode(3)
+      y1 = x * x
+      y2 = 2 * x
+    assert list(tape.adjoints()) == [8.0, 1.0, 1.0]
+    assert list(tape.adjoints({y1.index: 1.0})) == [6.0, 1.0, 0.0]
+    assert list(tape.adjoints({y2.index: 1.0})) == [2.0, 0.0, 1.0]
+
+  def test_mixed_tapes(self):
+    x = ReverseNode(1.0)
+    with Tape() as tape:
+      with self.assertRaises(ValueError):
+        x + 1
+      y = ReverseNode(2.0)
+    with self.assertRaises(ValueError):
+      tape.gradient(y, [x])
+
+  def test_matches_graph(self):
+    def f(x1, x2):
+      return log(x1) / sin(x2) + cos(x1 * x2) ** 2 - sqrt(x1) * tanh(x2)
+    x1 = ReverseNode(2.0)
+    x2 = ReverseNode(3.0)
+    y = f(x1, x2)
+    expected = [x1.gradient(), x2.gradient()]
+    with Tape() as tape:
+      t1 = ReverseNode(2.0)
+      t2 = ReverseNode(3.0)
+      z = f(t1, t2)
+    assert z.value == y.value
+    assert np.allclose(tape.gradient(z, [t1, t2]), expected)
+
+  def test_replay(self):
+    with Tape(record_ops=True) as tape:
+      x1 = ReverseNode(2.0)
+      x2 = ReverseNode(3.0)
+      y = sin(x1) * x2 ** 2 / (1 + exp(x1 - x2))
+    values = tape.replay({x1.index: 0.5, x2.index: 1.5})
+    with Tape() as fresh:
+      z1 = ReverseNode(0.5)
+      z2 = ReverseNode(1.5)
+      z = sin(z1) * z2 ** 2 / (1 + exp(z1 - z2))
+    assert np.isclose(values[y.index], z.value)
+    assert np.allclose(tape.gradient(y, [x1, x2]), fresh.gradient(z, [z1, z2]))
+    with Tape(record_ops=True) as tape:
+      x = ReverseNode(4.0)
+      y = sqrt(x)
+    with self.assertRaises(ValueError):
+      tape.replay({x.index: -1.0})
+
+  def test_replay_not_recorded(self):
+    with Tape() as tape:
+      x = ReverseNode(2.0)
+      y = sin(x) * x
+    assert tape.ops == [] and tape.values == [] and np.isclose(tape.gradient(y, [x])[0], np.sin(2) + 2 * np.cos(2))
+    with self.assertRaises(ValueError):
+      tape.replay({x.index: 1.0})
+
+  def test_replay_comparison(self):
+    with Tape(record_ops=True) as tape:
+      x = ReverseNode(2.0)
+      y = x * 2 if x > 0 else -x
+    assert tape.comparisons == 1
+    with self.assertRaises(ValueError):
+      tape.replay({x.index: -1.0})
+
+if __name__ == "__main__":
+  unittest.main()
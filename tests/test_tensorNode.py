@@ -0,0 +1,75 @@
+import unittest
+import numpy as np
+
+from AutoDiff.tensorNode import TensorNode, tensor_gradient, _unbroadcast
+from AutoDiff.reverseNode import ReverseNode
+from AutoDiff.utils import *
+
+class TensorNodeTests(unittest.TestCase):
+
+  def test_init(self):
+    x = TensorNode([1, 2])
+    assert x.value.dtype == np.float64
+    assert x.shape == (2,)
+    assert x.children == []
+    assert TensorNode(np.ones(2, dtype=np.float32)).value.dtype == np.float32
+    with self.assertRaises(TypeError):
+      TensorNode("x")
+
+  def test_unbroadcast(self):
+    assert np.array_equal(_unbroadcast(np.ones((4, 3)), (3,)), [4, 4, 4])
+    assert np.array_equal(_unbroadcast(np.ones((4, 3)), (4, 1)), 3 * np.ones((4, 1)))
+    assert _unbroadcast(np.ones((4, 3)), ()).shape == ()
+
+  def test_broadcasting(self):
+    x = TensorNode([1.0, 2.0, 3.0])
+    b = TensorNode(np.ones((2, 1)))
+    y = ((x * b + 2) / (1 + b) - x).sum()
+    assert np.allclose(y.value, 2 * np.sum((np.array([1, 2, 3]) + 2) / 2 - np.array([1, 2, 3])))
+    dx, db = tensor_gradient(y, [x, b])
+    assert np.allclose(dx, [-1, -1, -1])
+    assert np.allclose(db, [[np.sum(np.array([1, 2, 3]) / 2 - (np.array([1, 2, 3]) + 2) / 4)]] * 2)
+    assert db.shape == (2, 1)
+
+  def test_matmul(self):
+    rng = np.random.default_rng(0)
+    A_value, B_value, v_value = rng.normal(size=(3, 4)), rng.normal(size=(4, 2)), rng.normal(size=4)
+    A, B, v = TensorNode(A_value), TensorNode(B_value), TensorNode(v_value)
+    dA, dB = tensor_gradient((A @ B).sum(), [A, B])
+    assert np.allclose(dA, np.ones((3, 2)) @ B_value.T)
+    assert np.allclose(dB, A_value.T @ np.ones((3, 2)))
+    dA, dv = tensor_gradient((A @ v).sum(), [A, v])
+    assert np.allclose(dA, np.outer(np.ones(3), v_value))
+    assert np.allclose(dv, A_value.T @ np.ones(3))
+    dv, = tensor_gradient(v.dot(v), [v])
+    assert np.allclose(dv, 2 * v_value)
+    dv, = tensor_gradient((A_value @ v).sum(), [v])
+    assert np.allclose(dv, A_value.sum(axis=0))
+
+  def test_sum_axis(self):
+    x = TensorNode(np.arange(6.0).reshape(2, 3))
+    y = (x.sum(axis=0) * np.array([1.0, 2.0, 3.0])).sum()
+    assert np.allclose(tensor_gradient(y, [x])[0], [[1, 2, 3], [1, 2, 3]])
+
+  def test_least_squares(self):
+    rng = np.random.default_rng(1)
+    X, y = rng.normal(size=(1000, 10)), rng.normal(size=1000)
+    w = TensorNode(np.zeros(10))
+    loss = ((X @ w - y) ** 2).sum()
+    assert np.allclose(w.gradient(), 2 * X.T @ (X @ np.zeros(10) - y))
+
+  def test_elementwise(self):
+    value = np.array([0.2, 0.5])
+    functions = [exp, log, sqrt, sin, cos, tan, cot, sec, csc, arcsin, arccos, arctan, sinh, cosh, tanh, log_base]
+    for f in functions:
+      x = TensorNode(value)
+      y = f(x).sum()
+      for i in range(2):
+        r = ReverseNode(float(value[i]))
+        assert np.isclose(f(r).value, f(x).value[i])
+        assert np.isclose(tensor_gradient(y, [x])[0][i], r.gradient())
+    with self.assertRaises(ValueError):
+      log(TensorNode([1.0, -1.0]))
+
+if __name__ == "__main__":
+  unittest.main()